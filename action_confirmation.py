@@ -0,0 +1,67 @@
+"""播放/暂停操作的结果确认
+
+发送快捷键后不再固定等待，而是持续观察播放器的音量峰值和窗口标题：
+状态真的切换了就立即判定成功，超过时限仍未切换则判定超时，交给重试逻辑处理。
+确认进行中不会发送新的快捷键，避免确认太慢导致第二次按键把音乐又暂停掉。
+"""
+from player_tracking import TITLE_PAUSED, TITLE_PLAYING
+
+# 确认结果
+CONFIRMED = 'confirmed'
+TIMED_OUT = 'timeout'
+
+
+class ActionConfirmation:
+    """一次播放/暂停操作的确认过程
+
+    play：播放器峰值达到 on_threshold，或窗口标题从非播放状态变为播放中；
+    pause：窗口标题从非暂停状态变为暂停中，或峰值持续不高于 off_threshold 至少 min_silent 秒。
+    """
+    __slots__ = ('action', 'started', 'deadline', 'baseline_title_state', 'on_threshold', 'off_threshold',
+                 'min_silent', '_silent_since', 'result', 'finished')
+
+    def __init__(self, action, started, timeout, baseline_title_state, on_threshold, off_threshold, min_silent=0.0):
+        self.action = action
+        self.started = started
+        self.deadline = started + timeout
+        self.baseline_title_state = baseline_title_state
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.min_silent = min_silent
+        self._silent_since = None
+        self.result = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        """从发送操作到得出结果的时间（秒），还没有结果时返回None"""
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def update(self, peak, title_state, now):
+        """加入一次观察，返回 CONFIRMED / TIMED_OUT，仍需继续观察时返回None"""
+        if self.result is not None:
+            return self.result
+        if self._is_confirmed(peak, title_state, now):
+            self.result = CONFIRMED
+        elif now >= self.deadline:
+            self.result = TIMED_OUT
+        else:
+            return None
+        self.finished = now
+        return self.result
+
+    def _is_confirmed(self, peak, title_state, now):
+        if self.action == 'play':
+            if peak >= self.on_threshold:
+                return True
+            return title_state == TITLE_PLAYING and self.baseline_title_state != TITLE_PLAYING
+        if title_state == TITLE_PAUSED and self.baseline_title_state != TITLE_PAUSED:
+            return True
+        if peak > self.off_threshold:
+            self._silent_since = None
+            return False
+        if self._silent_since is None:
+            self._silent_since = now
+        return now - self._silent_since >= self.min_silent
@@ -0,0 +1,242 @@
+"""音频活动记录文件
+
+记录每次检测看到的会话峰值、播放器标题以及做出的判断和操作，用于离线回放（trace_replay.py）。
+文件只追加写入，由定长的 48 字节记录组成，可以直接 mmap 后按下标读取：
+
+    <B 类型> <B 标志> <H 附加> <I 引用> <d 时间> <d 数值> <q a> <q b>
+
+字符串（进程名、窗口标题等）只在第一次出现时写入一条或多条 STRING 记录并分配编号，
+之后的记录只保存编号；编号 0 表示没有值（None），编号 1 固定为空字符串。
+
+每次打开文件写入（包括追加到已有的文件）都以一条 SEGMENT 记录开始：不同次运行的调度器时钟互不相关，
+回放时每一段用新的引擎从头开始。段开始时还会写入一条 CONFIG 记录，保存当时的检测参数和程序规则。
+"""
+import json
+import mmap
+import os
+import struct
+
+TRACE_MAGIC = b'MAPTRACE'
+TRACE_VERSION = 1
+
+RECORD = struct.Struct('<BBHIddqq')
+RECORD_SIZE = 48  # 40 字节数据 + 8 字节保留
+_RECORD_PADDING = bytes(RECORD_SIZE - RECORD.size)
+STRING_RECORD = struct.Struct('<BBHI40s')
+STRING_CHUNK = 40
+
+# 记录类型
+REC_HEADER = 0  # 文件头：引用=版本，字符串数据为魔数
+REC_STRING = 1  # 字符串片段：引用=编号，附加=本片段字节数，标志=1 表示还有后续片段
+REC_TICK = 2  # 一次检测开始：时间=调度器时间，a=检测类型（TICK_*）
+REC_SESSION = 3  # 会话快照：引用=进程名，数值=峰值，a=pid，b=状态 | 路径编号 << 8 | 显示名称编号 << 36
+REC_PLAYER = 4  # 播放器观察：引用=进程名，a=标题编号，b=进程是否在运行
+REC_DECISION = 5  # 判断结果：引用=播放器，a=其他程序是否在播放，b=播放器是否在播放
+REC_ACTION = 6  # 控制操作：引用=播放器，a=ACTION_CODES，b=是否发送成功，数值=发送耗时（秒）
+REC_CONFIRM = 7  # 确认结果：引用=播放器，a=1 成功 / 2 超时，数值=确认耗时（秒）
+REC_PLAYER_CONFIG = 8  # 播放器配置：引用=进程名，a=恢复方式编号，b=序号（0 为主播放器），标志=1 表示音量闪避模式
+REC_SEGMENT = 9  # 一段记录开始（一次运行打开文件写入），之后的时间与之前的段无关
+REC_CONFIG = 10  # 检测参数和程序规则：引用=JSON 文本编号 {"detection": {...}, "session_rules": [...]}
+
+# 检测类型
+TICK_FULL = 0
+TICK_CONFIRM = 1
+
+ACTION_CODES = {'play': 1, 'pause': 2, 'duck': 3, 'restore': 4}
+ACTION_NAMES = {code: name for name, code in ACTION_CODES.items()}
+
+NONE_ID = 0
+EMPTY_ID = 1
+
+
+class TraceRecord:
+    """解码后的一条记录，字符串编号已经替换为字符串"""
+    __slots__ = ('kind', 'flags', 'ref', 'time', 'value', 'a', 'b')
+
+    def __init__(self, kind, flags, ref, time, value, a, b):
+        self.kind = kind
+        self.flags = flags
+        self.ref = ref
+        self.time = time
+        self.value = value
+        self.a = a
+        self.b = b
+
+    def __repr__(self):
+        return (f"TraceRecord({self.kind}, ref={self.ref!r}, time={self.time:.3f}, value={self.value}, "
+                f"a={self.a!r}, b={self.b!r})")
+
+
+class TraceWriter:
+    """追加写入记录文件；已有的文件会读取其中的字符串表后继续追加，并开始新的一段"""
+
+    def __init__(self, path):
+        self.path = path
+        self._strings = {None: NONE_ID, '': EMPTY_ID}
+        self._next_id = EMPTY_ID + 1
+        self._buffer = bytearray()
+        self.records = 0
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with TraceReader(path) as reader:
+                for string_id, text in reader.strings().items():
+                    self._strings[text] = string_id
+                    self._next_id = max(self._next_id, string_id + 1)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        if not exists:
+            self._buffer += STRING_RECORD.pack(REC_HEADER, 0, len(TRACE_MAGIC), TRACE_VERSION, TRACE_MAGIC)
+        self._append(REC_SEGMENT)
+        self.flush()
+
+    def intern(self, text):
+        """返回字符串编号，第一次出现时写入字符串记录"""
+        string_id = self._strings.get(text)
+        if string_id is not None:
+            return string_id
+        string_id = self._next_id
+        self._next_id += 1
+        self._strings[text] = string_id
+        data = text.encode('utf-8')
+        chunks = [data[i:i + STRING_CHUNK] for i in range(0, len(data), STRING_CHUNK)]
+        for i, chunk in enumerate(chunks):
+            more = 1 if i < len(chunks) - 1 else 0
+            self._buffer += STRING_RECORD.pack(REC_STRING, more, len(chunk), string_id, chunk)
+        self.records += len(chunks)
+        return string_id
+
+    def _append(self, kind, ref=0, time=0.0, value=0.0, a=0, b=0, extra=0, flags=0):
+        self._buffer += RECORD.pack(kind, flags, extra, ref, time, value, a, b)
+        self._buffer += _RECORD_PADDING
+        self.records += 1
+
+    def player_config(self, process_name, resume, index, duck=False):
+        self._append(REC_PLAYER_CONFIG, self.intern(process_name), a=self.intern(resume), b=index,
+                     flags=1 if duck else 0)
+
+    def config(self, config):
+        """config: {"detection": {参数名: 值}, "session_rules": [规则文本]}"""
+        self._append(REC_CONFIG, self.intern(json.dumps(config, ensure_ascii=False, sort_keys=True)))
+
+    def tick(self, now, kind=TICK_FULL):
+        self._append(REC_TICK, time=now, a=kind)
+
+    def sessions(self, sessions):
+        for session in sessions:
+            packed = (session.state & 0xFF) | (self.intern(session.exe_path) << 8) \
+                | (self.intern(session.display_name) << 36)
+            self._append(REC_SESSION, self.intern(session.process_name), value=session.peak, a=session.pid, b=packed)
+
+    def player(self, process_name, running, title):
+        self._append(REC_PLAYER, self.intern(process_name), a=self.intern(title), b=1 if running else 0)
+
+    def decision(self, now, process_name, other_playing, playing):
+        self._append(REC_DECISION, self.intern(process_name), time=now, a=int(other_playing), b=int(playing))
+
+    def action(self, now, process_name, action, sent, elapsed):
+        self._append(REC_ACTION, self.intern(process_name), time=now, value=elapsed,
+                     a=ACTION_CODES.get(action, 0), b=int(sent))
+
+    def confirm(self, now, process_name, confirmed, elapsed):
+        self._append(REC_CONFIRM, self.intern(process_name), time=now, value=elapsed, a=1 if confirmed else 2)
+
+    def flush(self):
+        """把缓冲的记录写入文件"""
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """按下标读取记录文件（mmap）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        # 写入中断时最后一条记录可能不完整，忽略它
+        self._count = size // RECORD_SIZE
+        if self._count:
+            kind, _, length, version, magic = STRING_RECORD.unpack_from(self._map, 0)
+            if kind != REC_HEADER or magic[:length] != TRACE_MAGIC:
+                self.close()
+                raise ValueError(f"{path} 不是音频活动记录文件")
+            if version != TRACE_VERSION:
+                self.close()
+                raise ValueError(f"不支持的记录文件版本: {version}")
+        self._strings = None
+
+    def __len__(self):
+        return self._count
+
+    def raw(self, index):
+        """第 index 条记录的原始字段 (类型, 标志, 附加, 引用, 时间, 数值, a, b)"""
+        return RECORD.unpack_from(self._map, index * RECORD_SIZE)
+
+    def strings(self):
+        """{编号: 字符串}"""
+        if self._strings is None:
+            parts = {}
+            for index in range(1, self._count):
+                offset = index * RECORD_SIZE
+                if self._map[offset] != REC_STRING:
+                    continue
+                _, _, length, string_id, chunk = STRING_RECORD.unpack_from(self._map, offset)
+                parts.setdefault(string_id, bytearray()).extend(chunk[:length])
+            self._strings = {string_id: data.decode('utf-8', errors='replace') for string_id, data in parts.items()}
+            self._strings[EMPTY_ID] = ''
+        return self._strings
+
+    def string(self, string_id):
+        if string_id == NONE_ID:
+            return None
+        return self.strings().get(string_id, '')
+
+    def __iter__(self):
+        """按顺序返回 TraceRecord（不包括文件头和字符串记录）"""
+        string = self.string
+        for index in range(1, self._count):
+            kind, flags, extra, ref, time, value, a, b = self.raw(index)
+            if kind == REC_STRING:
+                continue
+            if kind == REC_SESSION:
+                b = (b & 0xFF, string((b >> 8) & 0xFFFFFFF), string(b >> 36))
+                yield TraceRecord(kind, flags, string(ref), time, value, a, b)
+            elif kind == REC_PLAYER:
+                yield TraceRecord(kind, flags, string(ref), time, value, string(a), b)
+            elif kind == REC_PLAYER_CONFIG:
+                yield TraceRecord(kind, flags, string(ref), time, value, string(a), b)
+            elif kind == REC_CONFIG:
+                try:
+                    config = json.loads(string(ref))
+                except ValueError:
+                    raise ValueError(f"{self.path} 第 {index} 条记录的配置无效") from None
+                yield TraceRecord(kind, flags, config, time, value, a, b)
+            elif kind in (REC_DECISION, REC_ACTION, REC_CONFIRM):
+                yield TraceRecord(kind, flags, string(ref), time, value, a, b)
+            else:
+                yield TraceRecord(kind, flags, ref, time, value, a, b)
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
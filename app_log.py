@@ -0,0 +1,114 @@
+"""运行日志
+
+日志统一走标准库 logging：
+- LogRing: 保存最近的日志记录（有上限），界面按批读取，不会无限增长
+- 调试日志使用 %s 占位参数，未开启调试级别时不会被格式化
+- 日志文件由 QueueListener 在后台线程写入，按大小自动轮转
+"""
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+
+APP_NAME = "音乐一直放"
+LOGGER_NAME = "music_always_play"
+
+_ring = None
+_listener = None
+
+
+def app_data_dir():
+    """程序数据目录（日志、配置等）"""
+    base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, APP_NAME)
+
+
+DEFAULT_LOG_FILE = os.path.join(app_data_dir(), "logs", "monitor.log")
+
+
+def get_logger():
+    return logging.getLogger(LOGGER_NAME)
+
+
+class LogRing(logging.Handler):
+    """保存最近日志记录的环形缓冲区
+
+    只保存记录对象，读取时才格式化，没有界面读取的记录不会被格式化。
+    """
+
+    def __init__(self, capacity=2000):
+        super().__init__()
+        self._records = collections.deque(maxlen=capacity)
+        self._seq = 0
+
+    @property
+    def capacity(self):
+        return self._records.maxlen
+
+    def emit(self, record):
+        self._seq += 1
+        self._records.append((self._seq, record))
+
+    def lines_since(self, seq=0, limit=None):
+        """返回 (最新序号, 序号大于 seq 的日志行)，limit 限制最多返回的行数（取最新的）"""
+        self.acquire()
+        try:
+            records = [record for record_seq, record in self._records if record_seq > seq]
+            latest = self._seq
+        finally:
+            self.release()
+        if limit is not None and len(records) > limit:
+            records = records[-limit:]
+        return latest, [self.format(record) for record in records]
+
+
+def setup_logging(level=logging.INFO, capacity=2000, log_file=None, max_bytes=1024 * 1024, backup_count=3,
+                  console=False):
+    """初始化日志，返回 LogRing；重复调用时返回已有的 LogRing
+
+    console 为 True 时同时输出到标准错误（无界面模式使用）。
+    """
+    global _ring, _listener
+    logger = get_logger()
+    logger.setLevel(level)
+    if _ring is not None:
+        return _ring
+    logger.propagate = False
+
+    _ring = LogRing(capacity)
+    _ring.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", "%H:%M:%S"))
+    logger.addHandler(_ring)
+
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(console_handler)
+
+    if log_file:
+        try:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            log_queue = queue.SimpleQueue()
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            _listener = logging.handlers.QueueListener(log_queue, file_handler)
+            _listener.start()
+        except OSError as e:
+            print(f"无法写入日志文件 {log_file}: {e}")
+    return _ring
+
+
+def set_log_level(level):
+    get_logger().setLevel(level)
+
+
+def shutdown_logging():
+    """停止后台写日志线程，写完队列中剩余的记录"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,474 @@
+"""音频会话后端
+
+检测逻辑只通过这里的接口读取音频会话，不直接依赖 pycaw：
+- WindowsAudioSessionBackend: 基于 pycaw，支持会话通知（新建会话 / 状态变化 / 会话断开）
+- PulseAudioSessionBackend（pulse_audio.py）: Linux 上的 PulseAudio / PipeWire，支持服务器事件订阅
+- FakeAudioSessionBackend: 纯Python实现，可以按脚本发出会话事件，便于在Linux上测试
+"""
+import sys
+import threading
+import time
+
+# 会话事件类型
+SESSION_CREATED = 'created'
+SESSION_STATE_CHANGED = 'state_changed'
+SESSION_DISCONNECTED = 'disconnected'
+
+# 会话状态（与 Windows 的 AudioSessionState 取值一致）
+STATE_INACTIVE = 0
+STATE_ACTIVE = 1
+STATE_EXPIRED = 2
+
+
+class AudioSessionInfo:
+    """一个音频会话在某一时刻的状态"""
+    __slots__ = ('pid', 'process_name', 'state', 'peak', 'exe_path', 'display_name', 'device')
+
+    def __init__(self, pid, process_name, state=STATE_ACTIVE, peak=0.0, exe_path='', display_name='', device=''):
+        self.pid = pid
+        self.process_name = process_name  # 小写进程名，系统声音会话为空字符串
+        self.state = state
+        self.peak = peak
+        self.exe_path = exe_path  # 可执行文件路径，无法获取时为空字符串
+        self.display_name = display_name  # 会话显示名称，多数程序不设置
+        self.device = device  # 输出设备（端点ID或设备名），无法获取时为空字符串
+
+    def __repr__(self):
+        return f"AudioSessionInfo({self.pid}, {self.process_name!r}, state={self.state}, peak={self.peak})"
+
+
+class SessionEvent:
+    """音频会话事件"""
+    __slots__ = ('kind', 'pid', 'process_name', 'state')
+
+    def __init__(self, kind, pid=0, process_name='', state=None):
+        self.kind = kind
+        self.pid = pid
+        self.process_name = process_name
+        self.state = state
+
+    def __repr__(self):
+        return f"SessionEvent({self.kind!r}, {self.pid}, {self.process_name!r}, state={self.state})"
+
+
+class AudioSessionBackend:
+    """音频会话后端接口
+
+    get_sessions() 返回当前所有会话；支持事件的后端在 start_events() 成功后，
+    会在会话新建、状态变化、断开时调用通过 add_listener() 注册的回调。
+    回调可能在后端自己的线程里被调用，调用方需要自行切换线程。
+    supports_volume 为 True 的后端可以读取和设置程序的会话音量（音量闪避模式使用）。
+    """
+    name = 'base'
+    supports_volume = False
+
+    def __init__(self):
+        self._listeners = []
+        self.events_active = False
+
+    def add_listener(self, callback):
+        """注册会话事件回调"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """移除会话事件回调"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, event):
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"处理音频会话事件时出错: {e}")
+
+    def start_events(self):
+        """开始监听会话事件，成功返回True；不支持时返回False，调用方应退回轮询"""
+        return False
+
+    def stop_events(self):
+        """停止监听会话事件"""
+        self.events_active = False
+
+    def get_sessions(self):
+        """返回当前所有音频会话（AudioSessionInfo 列表）"""
+        raise NotImplementedError
+
+    def get_process_volume(self, process_name):
+        """进程的会话音量（0.0-1.0，有多个会话时取第一个），没有会话时返回 None"""
+        raise NotImplementedError
+
+    def set_process_volume(self, process_name, volume):
+        """设置进程所有会话的音量，返回设置了几个会话"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端占用的资源（线程、系统连接），之后不再使用"""
+        self.stop_events()
+
+
+def session_endpoint(instance_id):
+    """会话实例ID中的输出端点ID
+
+    实例ID的格式为 "{端点ID}|{进程路径}%b{...}"，竖线之前就是会话所在设备的端点ID
+    （例如 "{0.0.0.00000000}.{guid}"），不需要再查询设备接口。
+    """
+    endpoint, separator, _ = (instance_id or '').partition('|')
+    return endpoint if separator else ''
+
+
+class _SessionEntry:
+    """会话注册表中的一项，缓存不会变化的接口和进程信息"""
+    __slots__ = ('session', 'meter', 'pid', 'process_name', 'exe_path', 'display_name', 'device', 'volume')
+
+    def __init__(self, session, meter, pid, process_name, exe_path='', display_name='', device=''):
+        self.session = session  # pycaw AudioSession
+        self.meter = meter  # IAudioMeterInformation
+        self.pid = pid
+        self.process_name = process_name
+        self.exe_path = exe_path
+        self.display_name = display_name
+        self.device = device  # 会话所在的输出端点ID
+        self.volume = None  # ISimpleAudioVolume，音量闪避时才查询
+
+
+class WindowsAudioSessionBackend(AudioSessionBackend):
+    """基于 pycaw 的 Windows 音频会话后端
+
+    会话按实例ID登记在注册表里，每个会话只查询一次峰值表接口和进程名。
+    会话断开、过期或从枚举结果中消失（进程退出时系统会让会话过期）时才移除对应的项。
+    启用事件后只在收到新会话通知时重新枚举，否则每次快照都枚举一次以发现新会话。
+
+    会话、峰值表和音量对象都只在创建后端的线程（音频 COM 线程，见 com_worker）中创建和使用；
+    系统的回调线程只修改注册表和发出事件，新会话留到下次快照时在 COM 线程中登记。
+    """
+    name = 'wasapi'
+    supports_volume = True
+
+    def __init__(self):
+        super().__init__()
+        from pycaw.pycaw import AudioUtilities, IAudioMeterInformation, IAudioSessionControl2
+        from pycaw.utils import AudioSession
+        self._AudioUtilities = AudioUtilities
+        self._IAudioMeterInformation = IAudioMeterInformation
+        self._IAudioSessionControl2 = IAudioSessionControl2
+        self._AudioSession = AudioSession
+        self._manager = None
+        self._session_notification = None
+        self._entries = {}  # 会话实例ID -> _SessionEntry
+        self._entries_dirty = True
+        self._lock = threading.RLock()
+
+    def get_sessions(self):
+        with self._lock:
+            if self._entries_dirty or not self.events_active:
+                self._refresh_entries()
+            result = []
+            for instance_id, entry in list(self._entries.items()):
+                try:
+                    state = entry.session._ctl.GetState()
+                    peak = entry.meter.GetPeakValue()
+                except Exception:
+                    # 会话已失效
+                    self._drop_entry(instance_id)
+                    continue
+                if state == STATE_EXPIRED:
+                    self._drop_entry(instance_id)
+                    continue
+                if not entry.process_name:
+                    continue
+                result.append(AudioSessionInfo(entry.pid, entry.process_name, state, peak,
+                                               entry.exe_path, entry.display_name, entry.device))
+            return result
+
+    def _process_entries(self, process_name):
+        entries = [entry for entry in self._entries.values() if entry.process_name == process_name]
+        if not entries and self._entries_dirty:
+            self._refresh_entries()
+            entries = [entry for entry in self._entries.values() if entry.process_name == process_name]
+        return entries
+
+    @staticmethod
+    def _volume(entry):
+        """会话的 ISimpleAudioVolume，第一次使用时查询并缓存"""
+        if entry.volume is None:
+            entry.volume = entry.session.SimpleAudioVolume
+        return entry.volume
+
+    def get_process_volume(self, process_name):
+        with self._lock:
+            for entry in self._process_entries(process_name):
+                try:
+                    return self._volume(entry).GetMasterVolume()
+                except Exception:
+                    continue
+            return None
+
+    def set_process_volume(self, process_name, volume):
+        volume = min(max(volume, 0.0), 1.0)
+        with self._lock:
+            count = 0
+            for entry in self._process_entries(process_name):
+                try:
+                    self._volume(entry).SetMasterVolume(volume, None)
+                except Exception:
+                    # 会话已失效，下次快照时移除
+                    continue
+                count += 1
+            return count
+
+    def invalidate(self):
+        """清空注册表，下次快照时重新枚举（例如默认输出设备变化后）"""
+        with self._lock:
+            for instance_id in list(self._entries):
+                self._drop_entry(instance_id)
+            if not self.events_active:
+                self._manager = None
+            self._entries_dirty = True
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = self._AudioUtilities.GetAudioSessionManager()
+        return self._manager
+
+    def _refresh_entries(self):
+        """枚举会话，只为新出现的会话创建注册表项"""
+        try:
+            enumerator = self._get_manager().GetSessionEnumerator()
+            count = enumerator.GetCount()
+        except Exception:
+            # 设备可能已经变化，下次重新获取会话管理器
+            if not self.events_active:
+                self._manager = None
+            raise
+        seen = set()
+        for i in range(count):
+            try:
+                ctl = enumerator.GetSession(i).QueryInterface(self._IAudioSessionControl2)
+                instance_id = ctl.GetSessionInstanceIdentifier()
+            except Exception:
+                continue
+            seen.add(instance_id)
+            if instance_id not in self._entries:
+                self._add_entry(instance_id, ctl)
+        for instance_id in list(self._entries):
+            if instance_id not in seen:
+                self._drop_entry(instance_id)
+        self._entries_dirty = False
+
+    def _add_entry(self, instance_id, ctl):
+        import psutil
+        session = self._AudioSession(ctl)
+        pid = session.ProcessId
+        process_name = ''
+        exe_path = ''
+        if pid:
+            try:
+                process = psutil.Process(pid)
+                process_name = process.name().lower()
+                exe_path = process.exe()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        try:
+            display_name = ctl.GetDisplayName() or ''
+        except Exception:
+            display_name = ''
+        meter = ctl.QueryInterface(self._IAudioMeterInformation)
+        entry = _SessionEntry(session, meter, pid, process_name, exe_path, display_name, session_endpoint(instance_id))
+        self._entries[instance_id] = entry
+        if self.events_active or self._session_notification is not None:
+            self._watch_entry(instance_id, entry)
+        return entry
+
+    def _drop_entry(self, instance_id):
+        entry = self._entries.pop(instance_id, None)
+        if entry is not None and self.events_active:
+            try:
+                entry.session.unregister_notification()
+            except Exception:
+                pass
+
+    def start_events(self):
+        if self.events_active:
+            return True
+        try:
+            from pycaw.callbacks import AudioSessionNotification
+        except ImportError:
+            # 旧版 pycaw 没有回调接口
+            return False
+
+        backend = self
+
+        class _SessionNotification(AudioSessionNotification):
+            def on_session_created(self, new_session):
+                backend._on_session_created(new_session)
+
+        with self._lock:
+            try:
+                self._session_notification = _SessionNotification()
+                self._get_manager().RegisterSessionNotification(self._session_notification)
+                # 必须先枚举一次会话，系统才会开始发送新会话通知；已登记的会话在这里补注册事件
+                for instance_id, entry in list(self._entries.items()):
+                    self._watch_entry(instance_id, entry)
+                self._refresh_entries()
+            except Exception as e:
+                print(f"注册音频会话通知失败: {e}")
+                self.stop_events()
+                return False
+            self.events_active = True
+        return True
+
+    def stop_events(self):
+        with self._lock:
+            for entry in self._entries.values():
+                try:
+                    entry.session.unregister_notification()
+                except Exception:
+                    pass
+                # 取消注册后 pycaw 不会清掉旧回调，需要手动重置才能再次注册
+                entry.session._callback = None
+            if self._manager is not None and self._session_notification is not None:
+                try:
+                    self._manager.UnregisterSessionNotification(self._session_notification)
+                except Exception:
+                    pass
+            self._session_notification = None
+            self.events_active = False
+            self._entries_dirty = True
+
+    def _watch_entry(self, instance_id, entry):
+        """为一个会话注册状态变化 / 断开通知"""
+        from pycaw.callbacks import AudioSessionEvents
+        backend = self
+        pid = entry.pid
+        process_name = entry.process_name
+
+        class _SessionEvents(AudioSessionEvents):
+            def on_state_changed(self, new_state, new_state_id):
+                if new_state_id == STATE_EXPIRED:
+                    with backend._lock:
+                        backend._entries.pop(instance_id, None)
+                backend._emit(SessionEvent(SESSION_STATE_CHANGED, pid, process_name, new_state_id))
+
+            def on_session_disconnected(self, disconnect_reason, disconnect_reason_id):
+                with backend._lock:
+                    backend._entries.pop(instance_id, None)
+                backend._emit(SessionEvent(SESSION_DISCONNECTED, pid, process_name))
+
+        entry.session.register_notification(_SessionEvents())
+
+    def _on_session_created(self, new_session):
+        # 不在回调线程中查询新会话的接口，标记后由下次快照重新枚举登记
+        with self._lock:
+            self._entries_dirty = True
+        self._emit(SessionEvent(SESSION_CREATED, state=STATE_ACTIVE))
+
+
+class FakeAudioSessionBackend(AudioSessionBackend):
+    """脚本驱动的假后端，不依赖任何系统音频接口
+
+    峰值变化（set_peak）不会产生事件，与真实系统的行为一致；
+    新建、状态变化、移除会话会发出对应的会话事件。
+    """
+    name = 'fake'
+    supports_volume = True
+
+    def __init__(self, supports_events=True):
+        super().__init__()
+        self.supports_events = supports_events
+        self._sessions = {}  # pid -> AudioSessionInfo
+        self.volumes = {}  # pid -> 会话音量
+        self._next_pid = 1000
+        self._lock = threading.Lock()
+
+    def start_events(self):
+        self.events_active = self.supports_events
+        return self.events_active
+
+    def get_sessions(self):
+        with self._lock:
+            return [AudioSessionInfo(s.pid, s.process_name, s.state, s.peak, s.exe_path, s.display_name, s.device)
+                    for s in self._sessions.values()]
+
+    def add_session(self, process_name, peak=0.0, pid=None, state=STATE_ACTIVE, exe_path='', display_name='',
+                    device=''):
+        """添加一个会话，返回它的pid"""
+        with self._lock:
+            if pid is None:
+                pid = self._next_pid
+                self._next_pid += 1
+            self._sessions[pid] = AudioSessionInfo(pid, process_name.lower(), state, peak, exe_path, display_name,
+                                                   device)
+        if self.events_active:
+            self._emit(SessionEvent(SESSION_CREATED, pid, process_name.lower(), state))
+        return pid
+
+    def set_peak(self, pid, peak):
+        with self._lock:
+            self._sessions[pid].peak = peak
+
+    def get_process_volume(self, process_name):
+        with self._lock:
+            for pid, session in self._sessions.items():
+                if session.process_name == process_name:
+                    return self.volumes.get(pid, 1.0)
+            return None
+
+    def set_process_volume(self, process_name, volume):
+        with self._lock:
+            pids = [pid for pid, session in self._sessions.items() if session.process_name == process_name]
+            for pid in pids:
+                self.volumes[pid] = volume
+            return len(pids)
+
+    def set_state(self, pid, state):
+        with self._lock:
+            session = self._sessions[pid]
+            session.state = state
+        if self.events_active:
+            self._emit(SessionEvent(SESSION_STATE_CHANGED, pid, session.process_name, state))
+
+    def remove_session(self, pid):
+        with self._lock:
+            session = self._sessions.pop(pid)
+        if self.events_active:
+            self._emit(SessionEvent(SESSION_DISCONNECTED, pid, session.process_name))
+
+    def run_script(self, script):
+        """按顺序执行脚本，每一步为 (延迟秒数, 方法名, 参数...)"""
+        for delay, action, *args in script:
+            if delay:
+                time.sleep(delay)
+            getattr(self, action)(*args)
+
+    def start_script(self, script):
+        """在后台线程中执行脚本，事件会从该线程发出（模拟系统回调线程）"""
+        thread = threading.Thread(target=self.run_script, args=(script,), daemon=True)
+        thread.start()
+        return thread
+
+
+def init_com_thread():
+    """在当前线程初始化 COM（多线程套间），在音频 COM 线程开始时调用"""
+    if sys.platform == 'win32':
+        import comtypes
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+
+
+def uninit_com_thread():
+    """释放当前线程的 COM"""
+    if sys.platform == 'win32':
+        import comtypes
+        comtypes.CoUninitialize()
+
+
+def create_session_backend():
+    """创建当前平台的音频会话后端"""
+    if sys.platform == 'win32':
+        from com_worker import ComAudioSessionBackend
+        return ComAudioSessionBackend(WindowsAudioSessionBackend)
+    if sys.platform.startswith('linux'):
+        from pulse_audio import PulseAudioSessionBackend
+        return PulseAudioSessionBackend()
+    raise OSError(f"当前平台不支持音频会话检测: {sys.platform}")
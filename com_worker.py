@@ -0,0 +1,187 @@
+"""音频 COM 线程
+
+pycaw / comtypes 的对象属于创建它们的线程所在的 COM 套间，在其他线程使用需要封送，处理不当会崩溃。
+这里用一个专门的线程初始化一次 COM，在其中创建并持有所有的会话、峰值表、音量和设备对象；
+其他线程只能通过请求队列访问，拿回的都是普通的 Python 数据（AudioSessionInfo、浮点数、整数），
+COM 对象不会离开这个线程。
+
+队列中积压的请求在一次唤醒中依次处理（例如一次检测的会话快照和音量渐变的一步），
+同一批中对同一进程的多个音量设置只执行最后一个。
+"""
+import queue
+import threading
+
+from audio_sessions import AudioSessionBackend, init_com_thread, uninit_com_thread
+
+COM_CALL_TIMEOUT_SECONDS = 5  # 等待 COM 线程处理请求的最长时间
+
+
+class ComRequest:
+    """一个请求：在 COM 线程中调用目标对象的方法"""
+    __slots__ = ('method', 'args', 'coalesce', 'result', 'error', 'done')
+
+    def __init__(self, method, args, coalesce=None):
+        self.method = method
+        self.args = args
+        self.coalesce = coalesce  # 同一批中键相同的请求只执行最后一个
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class ComWorker:
+    """持有 COM 套间的工作线程
+
+    factory() 在线程中创建被访问的对象（创建失败时异常在构造函数中重新抛出），
+    call() 把方法调用放进队列并等待结果。
+    """
+
+    def __init__(self, factory, name="音频 COM 线程", timeout=COM_CALL_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self.requests = 0
+        self.batches = 0
+        self.coalesced = 0
+        self._queue = queue.SimpleQueue()
+        self._target = None
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(factory,), name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join(timeout)
+            raise self._error
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    @property
+    def pending(self):
+        """排队等待处理的请求数"""
+        return self._queue.qsize()
+
+    def in_worker_thread(self):
+        return self._thread is threading.current_thread()
+
+    def call(self, method, *args, coalesce=None):
+        """在 COM 线程中调用 target.method(*args) 并返回结果；超时或线程已结束时抛出 OSError"""
+        request = ComRequest(method, args, coalesce)
+        if self.in_worker_thread():
+            self._execute(request)
+        else:
+            if not self.alive:
+                raise OSError("音频 COM 线程已结束")
+            self._queue.put(request)
+            if not request.done.wait(self.timeout):
+                raise OSError(f"音频 COM 线程 {self.timeout} 秒内没有响应 ({method})")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def stop(self):
+        """处理完已经排队的请求后结束线程，释放所有 COM 对象"""
+        if not self.alive:
+            return
+        self._queue.put(None)
+        if not self.in_worker_thread():
+            self._thread.join(self.timeout)
+
+    def _run(self, factory):
+        init_com_thread()
+        try:
+            try:
+                self._target = factory()
+            except Exception as e:
+                self._error = e
+                return
+            finally:
+                self._ready.set()
+            while self._serve_batch():
+                pass
+        finally:
+            # COM 对象必须在 CoUninitialize 之前释放
+            self._target = None
+            uninit_com_thread()
+
+    def _serve_batch(self):
+        """取出队列中所有的请求一起处理，收到结束请求时返回 False"""
+        batch = [self._queue.get()]
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self.batches += 1
+        running = True
+        latest = {}
+        for request in batch:
+            if request is None:
+                running = False
+            elif request.coalesce is not None:
+                latest[request.coalesce] = request
+        for request in batch:
+            if request is None:
+                continue
+            self.requests += 1
+            if request.coalesce is not None and latest[request.coalesce] is not request:
+                # 被同一批中后面的请求覆盖，使用后面那个请求的结果
+                self.coalesced += 1
+                continue
+            self._execute(request)
+        for request in batch:
+            if request is not None and not request.done.is_set():
+                replacement = latest[request.coalesce]
+                request.result, request.error = replacement.result, replacement.error
+                request.done.set()
+        return running
+
+    def _execute(self, request):
+        try:
+            request.result = getattr(self._target, request.method)(*request.args)
+        except Exception as e:
+            request.error = e
+        request.done.set()
+
+
+class ComAudioSessionBackend(AudioSessionBackend):
+    """在音频 COM 线程中运行的会话后端（backend_class 的实例只在这个线程中创建和使用）
+
+    会话事件由后端在系统的回调线程中发出，原样转发给这里的监听者。
+    """
+
+    def __init__(self, backend_class, timeout=COM_CALL_TIMEOUT_SECONDS):
+        super().__init__()
+        self.name = backend_class.name
+        self.supports_volume = backend_class.supports_volume
+        self.worker = ComWorker(lambda: self._create(backend_class), timeout=timeout)
+
+    def _create(self, backend_class):
+        backend = backend_class()
+        backend.add_listener(self._emit)
+        return backend
+
+    def start_events(self):
+        self.events_active = self.worker.call('start_events')
+        return self.events_active
+
+    def stop_events(self):
+        self.events_active = False
+        if self.worker.alive:
+            self.worker.call('stop_events')
+
+    def get_sessions(self):
+        return self.worker.call('get_sessions')
+
+    def invalidate(self):
+        self.worker.call('invalidate')
+
+    def get_process_volume(self, process_name):
+        return self.worker.call('get_process_volume', process_name)
+
+    def set_process_volume(self, process_name, volume):
+        return self.worker.call('set_process_volume', process_name, volume, coalesce=('volume', process_name))
+
+    def close(self):
+        self.stop_events()
+        self.worker.stop()
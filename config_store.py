@@ -0,0 +1,326 @@
+"""程序配置的保存、校验和热加载
+
+配置（播放器、快捷键、控制方式、程序规则、检测阈值和间隔、主题等）保存在一个小的 JSON 文件里。
+所有修改都先完整校验再整体替换：界面上输入到一半的进程名不会被检测逻辑使用。
+文件在外部被修改（例如批量下发配置）时，监视线程会重新加载并通知使用者，不需要重启程序；
+自己写入的内容不会再触发一次重新加载。
+"""
+import json
+import os
+import threading
+
+from app_log import app_data_dir, get_logger
+from media_control import CONTROL_BACKENDS, CONTROL_KEYS, virtual_key
+from monitor_engine import (ACTION_COOLDOWN_SECONDS, AUTO_CALIBRATE, CONTROL_BACKEND, DEFAULT_HOTKEY,
+                            DEFAULT_MUSIC_PLAYER, MAX_POLL_INTERVAL_MS, MIN_ACTIVE_SECONDS, MIN_POLL_INTERVAL_MS,
+                            MIN_SILENT_SECONDS, PEAK_OFF_THRESHOLD, PEAK_THRESHOLD, SESSION_RULES)
+from player_profiles import RESUME_IF_PAUSED, RESUME_MODES
+from session_rules import parse_rule
+from volume_ducking import DUCK_CURVE, DUCK_CURVES, DUCK_DOWN_MS, DUCK_LEVEL, DUCK_UP_MS
+
+CONFIG_FILE = os.path.join(app_data_dir(), "config.json")  # 配置文件
+CONFIG_VERSION = 1
+CONFIG_WATCH_SECONDS = 1.0  # 检查配置文件是否被外部修改的间隔
+THEMES = ('dark', 'light')
+
+
+class AppConfig:
+    """一份完整的配置；不要原地修改，用 replace() 得到修改后的副本"""
+    __slots__ = ('music_player', 'hotkey', 'control', 'duck', 'players', 'session_rules', 'duck_level',
+                 'duck_curve', 'duck_down_ms', 'duck_up_ms', 'peak_threshold', 'peak_off_threshold',
+                 'min_active_seconds', 'min_silent_seconds', 'action_cooldown_seconds', 'min_poll_interval_ms',
+                 'max_poll_interval_ms', 'auto_calibrate', 'theme', 'auto_start', 'tray_mode')
+
+    def __init__(self, music_player=DEFAULT_MUSIC_PLAYER, hotkey=None, control=CONTROL_BACKEND, duck=False, players=(),
+                 session_rules=SESSION_RULES, duck_level=DUCK_LEVEL, duck_curve=DUCK_CURVE, duck_down_ms=DUCK_DOWN_MS,
+                 duck_up_ms=DUCK_UP_MS, peak_threshold=PEAK_THRESHOLD, peak_off_threshold=PEAK_OFF_THRESHOLD,
+                 min_active_seconds=MIN_ACTIVE_SECONDS, min_silent_seconds=MIN_SILENT_SECONDS,
+                 action_cooldown_seconds=ACTION_COOLDOWN_SECONDS, min_poll_interval_ms=MIN_POLL_INTERVAL_MS,
+                 max_poll_interval_ms=MAX_POLL_INTERVAL_MS, auto_calibrate=AUTO_CALIBRATE, theme='dark',
+                 auto_start=True, tray_mode=False):
+        self.music_player = music_player
+        self.hotkey = list(hotkey or DEFAULT_HOTKEY)
+        self.control = control
+        self.duck = duck  # 主播放器用音量闪避代替快捷键暂停
+        self.players = [dict(spec) for spec in players]  # 其他播放器：{process_name, hotkey, control, resume, duck}
+        self.session_rules = list(session_rules)
+        self.duck_level = duck_level
+        self.duck_curve = duck_curve
+        self.duck_down_ms = duck_down_ms
+        self.duck_up_ms = duck_up_ms
+        self.peak_threshold = peak_threshold
+        self.peak_off_threshold = peak_off_threshold
+        self.min_active_seconds = min_active_seconds
+        self.min_silent_seconds = min_silent_seconds
+        self.action_cooldown_seconds = action_cooldown_seconds
+        self.min_poll_interval_ms = min_poll_interval_ms
+        self.max_poll_interval_ms = max_poll_interval_ms
+        self.auto_calibrate = auto_calibrate
+        self.theme = theme
+        self.auto_start = auto_start
+        self.tray_mode = tray_mode  # 关闭或最小化窗口时销毁窗口、缩小到托盘（只用于图形界面）
+
+    def __eq__(self, other):
+        return isinstance(other, AppConfig) and self.to_json() == other.to_json()
+
+    def __repr__(self):
+        return f"AppConfig({self.music_player!r}, {'+'.join(self.hotkey)!r}, players={len(self.players)})"
+
+    def to_json(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data['version'] = CONFIG_VERSION
+        return data
+
+    def replace(self, **changes):
+        """返回修改了部分字段并通过校验的副本，无效时抛出 ValueError"""
+        return validate_config(dict(self.to_json(), **changes))
+
+
+def parse_hotkey(text):
+    """"ctrl+alt+p" 转换为按键列表"""
+    return [key.strip().lower() for key in text.split('+') if key.strip()]
+
+
+def _check_process_name(name, errors, label="音乐播放器进程名"):
+    if not isinstance(name, str) or not name.strip():
+        errors.append(f"{label}不能为空")
+    elif any(c in name for c in '/\\:*?"<>|') or len(name) > 255:
+        errors.append(f"{label}无效: {name}")
+
+
+def _check_hotkey(keys, errors, control, label="快捷键"):
+    """批量注入（keys）只支持有虚拟键码的按键；其他控制方式的按键名交给 pyautogui，只检查不为空"""
+    if isinstance(keys, str):
+        keys = parse_hotkey(keys)
+    if not isinstance(keys, list) or not keys:
+        errors.append(f"{label}不能为空")
+        return []
+    for key in keys:
+        if not isinstance(key, str) or not key.strip():
+            errors.append(f"{label}中有无效的按键: {key!r}")
+            continue
+        if control == CONTROL_KEYS:
+            try:
+                virtual_key(key)
+            except ValueError:
+                errors.append(f"{label}中有不支持的按键: {key}")
+    return [key.strip().lower() for key in keys if isinstance(key, str)]
+
+
+def _check_number(data, name, label, errors, low, high):
+    value = data.get(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+        errors.append(f"{label}应为 {low} 到 {high} 之间的数字: {value!r}")
+
+
+def validate_config(data):
+    """校验配置字典，返回 AppConfig；有错误时抛出 ValueError，消息列出全部错误"""
+    if not isinstance(data, dict):
+        raise ValueError("配置应为 JSON 对象")
+    defaults = AppConfig().to_json()
+    unknown = [name for name in data if name not in defaults]
+    data = dict(defaults, **{name: value for name, value in data.items() if name in defaults})
+    errors = [f"未知的配置项: {name}" for name in unknown]
+
+    _check_process_name(data['music_player'], errors)
+    data['hotkey'] = _check_hotkey(data['hotkey'], errors, data['control'])
+    if data['control'] not in CONTROL_BACKENDS:
+        errors.append(f"未知的控制方式: {data['control']}")
+
+    players = []
+    if not isinstance(data['players'], list):
+        errors.append("players 应为列表")
+    else:
+        for spec in data['players']:
+            if isinstance(spec, str):
+                spec = {'process_name': spec}
+            if not isinstance(spec, dict):
+                errors.append(f"无效的播放器配置: {spec!r}")
+                continue
+            name = spec.get('process_name', '')
+            _check_process_name(name, errors, "播放器进程名")
+            player = {'process_name': name, 'resume': spec.get('resume', RESUME_IF_PAUSED)}
+            if spec.get('hotkey'):
+                player['hotkey'] = _check_hotkey(spec['hotkey'], errors, spec.get('control') or data['control'],
+                                                 f"{name} 的快捷键")
+            if spec.get('control'):
+                if spec['control'] not in CONTROL_BACKENDS:
+                    errors.append(f"{name} 的控制方式未知: {spec['control']}")
+                player['control'] = spec['control']
+            if player['resume'] not in RESUME_MODES:
+                errors.append(f"{name} 的恢复方式未知: {player['resume']}")
+            duck = spec.get('duck', False)
+            if not isinstance(duck, bool):
+                errors.append(f"{name} 的 duck 应为 true 或 false")
+            elif duck:
+                player['duck'] = True
+            players.append(player)
+    data['players'] = players
+
+    if not isinstance(data['session_rules'], list):
+        errors.append("session_rules 应为列表")
+    else:
+        for rule in data['session_rules']:
+            try:
+                parse_rule(rule)
+            except (ValueError, AttributeError) as e:
+                errors.append(str(e))
+
+    _check_number(data, 'duck_level', "闪避音量", errors, 0.0, 1.0)
+    _check_number(data, 'duck_down_ms', "降低音量的渐变时长", errors, 0, 10000)
+    _check_number(data, 'duck_up_ms', "恢复音量的渐变时长", errors, 0, 10000)
+    if data['duck_curve'] not in DUCK_CURVES:
+        errors.append(f"未知的渐变曲线: {data['duck_curve']}")
+    _check_number(data, 'peak_threshold', "声音触发阈值", errors, 0.0, 1.0)
+    _check_number(data, 'peak_off_threshold', "声音停止阈值", errors, 0.0, 1.0)
+    _check_number(data, 'min_active_seconds', "最短发声时间", errors, 0.0, 60.0)
+    _check_number(data, 'min_silent_seconds', "最短安静时间", errors, 0.0, 600.0)
+    _check_number(data, 'action_cooldown_seconds', "操作冷却时间", errors, 0.0, 600.0)
+    _check_number(data, 'min_poll_interval_ms', "最短检测间隔", errors, 10, 60000)
+    _check_number(data, 'max_poll_interval_ms', "最长检测间隔", errors, 10, 600000)
+    if not errors:
+        if data['peak_off_threshold'] > data['peak_threshold']:
+            errors.append("声音停止阈值不能高于触发阈值")
+        if data['min_poll_interval_ms'] > data['max_poll_interval_ms']:
+            errors.append("最短检测间隔不能大于最长检测间隔")
+    if data['theme'] not in THEMES:
+        errors.append(f"未知的主题: {data['theme']}")
+    for name in ('duck', 'auto_calibrate', 'auto_start', 'tray_mode'):
+        if not isinstance(data[name], bool):
+            errors.append(f"{name} 应为 true 或 false")
+    if errors:
+        raise ValueError("；".join(errors))
+    data.pop('version', None)
+    return AppConfig(**data)
+
+
+class ConfigStore:
+    """配置文件
+
+    update() 校验并保存修改；start_watching() 启动监视线程，文件被外部修改后重新加载。
+    配置变化时调用 add_listener() 注册的回调 callback(config)（外部修改时在监视线程中调用）。
+    """
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.config = AppConfig()
+        self.logger = get_logger()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._saved_text = None  # 最近一次读到或写入的文件内容
+        self._stat = None
+        self._watch_thread = None
+        self._stop = threading.Event()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, config):
+        for callback in list(self._listeners):
+            try:
+                callback(config)
+            except Exception as e:
+                self.logger.error("应用配置时出错: %s", e)
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """读取配置文件；文件不存在时使用默认配置，文件无效时保留当前配置并记录警告"""
+        with self._lock:
+            self._stat = self._file_stat()
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    text = f.read()
+            except FileNotFoundError:
+                return self.config
+            except OSError as e:
+                self.logger.warning("无法读取配置文件 %s: %s", self.path, e)
+                return self.config
+            self._saved_text = text
+            try:
+                self.config = validate_config(json.loads(text))
+            except ValueError as e:
+                self.logger.warning("配置文件 %s 无效，使用当前配置: %s", self.path, e)
+            return self.config
+
+    def save(self, config):
+        """保存配置：先写临时文件再替换，读取方不会读到写了一半的文件"""
+        text = json.dumps(config.to_json(), ensure_ascii=False, indent=2)
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+            self.config = config
+            self._saved_text = text
+            self._stat = self._file_stat()
+
+    def update(self, **changes):
+        """校验并保存修改，返回新的配置；无效时抛出 ValueError，当前配置不变"""
+        config = self.config.replace(**changes)
+        if config == self.config:
+            return config
+        try:
+            self.save(config)
+        except OSError as e:
+            self.logger.warning("无法保存配置文件 %s: %s", self.path, e)
+            self.config = config
+        self._notify(config)
+        return config
+
+    def start_watching(self, interval=CONFIG_WATCH_SECONDS):
+        """启动监视线程"""
+        if self._watch_thread is not None:
+            return
+        self._stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch, args=(interval,), name="配置文件监视", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        if self._watch_thread is None:
+            return
+        self._stop.set()
+        self._watch_thread.join(CONFIG_WATCH_SECONDS * 2)
+        self._watch_thread = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                continue
+            self.check_reload()
+
+    def check_reload(self):
+        """文件被外部修改时重新加载，配置有变化时通知使用者并返回新配置，否则返回None"""
+        with self._lock:
+            self._stat = self._file_stat()
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                return None
+            if text == self._saved_text:
+                return None
+            self._saved_text = text
+            try:
+                config = validate_config(json.loads(text))
+            except ValueError as e:
+                self.logger.warning("配置文件 %s 已修改但无效，保留当前配置: %s", self.path, e)
+                return None
+            if config == self.config:
+                return None
+            self.config = config
+        self.logger.info("已重新加载配置文件 %s", self.path)
+        self._notify(config)
+        return config
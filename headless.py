@@ -0,0 +1,124 @@
+"""无界面运行音频监控
+
+不加载任何Qt组件，适合放在不需要看窗口的媒体电脑上长期运行：
+
+    python headless.py --player lx-music-desktop.exe --hotkey ctrl+alt+p
+
+设置从配置文件读取（与窗口模式共用，见 config_store.py），命令行参数覆盖文件中的对应设置；
+配置文件被修改后自动重新加载，命令行参数仍然优先。按 Ctrl+C（或向进程发送 SIGTERM）退出。
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from app_log import DEFAULT_LOG_FILE, setup_logging, shutdown_logging
+from config_store import CONFIG_FILE, ConfigStore, parse_hotkey
+from media_control import CONTROL_BACKENDS
+from monitor_engine import MonitorEngine
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="音乐一直放！（无界面模式）")
+    parser.add_argument("--config", default=CONFIG_FILE, help="配置文件路径")
+    parser.add_argument("--player", help="音乐播放器进程名")
+    parser.add_argument("--hotkey", help="播放/暂停快捷键，例如 ctrl+alt+p")
+    parser.add_argument("--control", choices=CONTROL_BACKENDS,
+                        help="控制播放/暂停的方式：keys 注入快捷键，media_key 系统媒体键，"
+                             "window_message 向播放器窗口发送消息，pyautogui 兼容方式，mpris 通过 D-Bus 控制（Linux）")
+    parser.add_argument("--duck", action="store_true", default=None,
+                        help="其他程序播放时渐变降低播放器的音量，代替快捷键暂停（渐变参数见配置文件）")
+    parser.add_argument("--add-player", action="append", metavar="进程名[,快捷键[,控制方式]]",
+                        help="同时监控的其他播放器，只恢复被本程序暂停的播放，可重复，"
+                             "例如 spotify.exe,playpause,media_key")
+    parser.add_argument("--rule", action="append", metavar="动作:匹配方式:模式[:阈值]",
+                        help="其他程序的处理规则，可重复，例如 ignore:glob:*chime* 或 threshold:process:discord.exe:0.2")
+    parser.add_argument("--calibrate", action="store_true", default=None,
+                        help="按程序和设备学习本底噪声，自动设置声音阈值")
+    parser.add_argument("--record", metavar="文件", help="把音频活动、判断和操作追加写入记录文件，"
+                                                         "可以用 trace_replay.py 回放")
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE, help="日志文件路径，传入空字符串则不写文件")
+    parser.add_argument("--quiet", action="store_true", help="不在控制台输出日志")
+    parser.add_argument("--debug", action="store_true", help="输出调试日志")
+    return parser.parse_args(argv)
+
+
+def config_overrides(args):
+    """命令行中指定的设置，覆盖配置文件中的对应设置"""
+    overrides = {}
+    if args.player is not None:
+        overrides['music_player'] = args.player
+    if args.hotkey is not None:
+        overrides['hotkey'] = parse_hotkey(args.hotkey)
+    if args.control is not None:
+        overrides['control'] = args.control
+    if args.duck:
+        overrides['duck'] = True
+    if args.add_player is not None:
+        players = []
+        for spec in args.add_player:
+            process_name, _, rest = spec.partition(',')
+            hotkey, _, control = rest.partition(',')
+            player = {'process_name': process_name}
+            if hotkey:
+                player['hotkey'] = parse_hotkey(hotkey)
+            if control:
+                player['control'] = control
+            players.append(player)
+        overrides['players'] = players
+    if args.rule is not None:
+        overrides['session_rules'] = args.rule
+    if args.calibrate:
+        overrides['auto_calibrate'] = True
+    return overrides
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(logging.DEBUG if args.debug else logging.INFO, log_file=args.log_file or None,
+                  console=not args.quiet)
+
+    store = ConfigStore(args.config)
+    overrides = config_overrides(args)
+    try:
+        config = store.load().replace(**overrides)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    engine = MonitorEngine(config.music_player, config.hotkey, control_kind=config.control,
+                           session_rules=config.session_rules)
+    engine.apply_config(config)
+
+    def on_config_changed(changed):
+        try:
+            engine.apply_config(changed.replace(**overrides))
+        except ValueError as e:
+            engine.log(f"配置文件与命令行参数冲突，保留当前设置: {e}", logging.WARNING)
+    store.add_listener(on_config_changed)
+    store.start_watching()
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    engine.log("音频监控系统已启动（无界面模式）")
+    engine.log(f"当前音乐播放器: {', '.join(player.name for player in engine.players)}")
+    engine.log(f"当前快捷键: {'+'.join(engine.music_hotkey)}")
+    engine.start()
+    if args.record:
+        engine.start_recording(args.record)
+    try:
+        # 定时醒来，让 Windows 上的 Ctrl+C 能及时被处理
+        while not stop_event.wait(0.5):
+            pass
+    finally:
+        store.stop_watching()
+        engine.stop()
+        engine.shutdown()
+        shutdown_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
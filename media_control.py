@@ -0,0 +1,396 @@
+"""控制音乐播放器播放/暂停的方式
+
+ControlBackend 定义统一接口，send() 发送一次播放/暂停并返回耗时（秒）：
+- KeyInjectionBackend: 用一次 SendInput 批量注入快捷键的全部按下/抬起事件，没有 pyautogui 的逐键停顿
+- MediaKeyBackend: 发送系统的媒体播放/暂停键，由系统转给当前的媒体会话
+- WindowMessageBackend: 向播放器窗口投递 WM_APPCOMMAND 播放/暂停消息，不受当前焦点窗口影响
+- MprisBackend: 通过 D-Bus 的 MPRIS 接口明确地让播放器播放或暂停（Linux）
+- PyAutoGuiBackend: 原来的 pyautogui.hotkey，也是批量注入失败时的兜底
+- RecordingControlBackend: 只记录调用，不发送任何按键，用于在没有窗口系统的环境下测试控制流程
+"""
+import ctypes
+import sys
+import time
+
+from app_log import get_logger
+
+# 控制方式名称
+CONTROL_KEYS = 'keys'
+CONTROL_MEDIA_KEY = 'media_key'
+CONTROL_WINDOW_MESSAGE = 'window_message'
+CONTROL_PYAUTOGUI = 'pyautogui'
+CONTROL_MPRIS = 'mpris'
+CONTROL_BACKENDS = (CONTROL_KEYS, CONTROL_MEDIA_KEY, CONTROL_WINDOW_MESSAGE, CONTROL_PYAUTOGUI, CONTROL_MPRIS)
+# 媒体键、窗口消息、MPRIS 失败时是否改用 pyautogui 发送快捷键。pyautogui 把按键发给当前的焦点窗口，
+# 可能输入到用户正在使用的程序里，所以默认不启用；批量注入快捷键（keys）失败时总是改用 pyautogui
+HOTKEY_FALLBACK = False
+
+# 虚拟键码（按键名称与 pyautogui 一致）
+VK_MEDIA_PLAY_PAUSE = 0xB3
+VIRTUAL_KEYS = {
+    'ctrl': 0x11, 'ctrlleft': 0xA2, 'ctrlright': 0xA3, 'control': 0x11,
+    'alt': 0x12, 'altleft': 0xA4, 'altright': 0xA5,
+    'shift': 0x10, 'shiftleft': 0xA0, 'shiftright': 0xA1,
+    'win': 0x5B, 'winleft': 0x5B, 'winright': 0x5C,
+    'space': 0x20, 'enter': 0x0D, 'return': 0x0D, 'tab': 0x09, 'esc': 0x1B, 'escape': 0x1B,
+    'backspace': 0x08, 'insert': 0x2D, 'delete': 0x2E, 'home': 0x24, 'end': 0x23,
+    'pageup': 0x21, 'pagedown': 0x22, 'left': 0x25, 'up': 0x26, 'right': 0x27, 'down': 0x28,
+    'playpause': VK_MEDIA_PLAY_PAUSE, 'stop': 0xB2, 'nexttrack': 0xB0, 'prevtrack': 0xB1,
+    'volumemute': 0xAD, 'volumedown': 0xAE, 'volumeup': 0xAF,
+}
+VIRTUAL_KEYS.update({chr(c).lower(): c for c in range(ord('A'), ord('Z') + 1)})
+VIRTUAL_KEYS.update({chr(c): c for c in range(ord('0'), ord('9') + 1)})
+VIRTUAL_KEYS.update({f'f{i}': 0x6F + i for i in range(1, 25)})
+# 需要 KEYEVENTF_EXTENDEDKEY 标志的按键
+EXTENDED_KEYS = frozenset((0xA3, 0xA5, 0x5B, 0x5C, 0x2D, 0x2E, 0x24, 0x23, 0x21, 0x22, 0x25, 0x26, 0x27, 0x28,
+                           0xB0, 0xB1, 0xB2, 0xB3, 0xAD, 0xAE, 0xAF))
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+WM_APPCOMMAND = 0x0319
+APPCOMMAND_MEDIA_PLAY_PAUSE = 14
+MPRIS_PREFIX = 'org.mpris.MediaPlayer2.'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+MPRIS_PLAYER_INTERFACE = 'org.mpris.MediaPlayer2.Player'
+
+
+class ControlError(Exception):
+    """播放/暂停没有发送出去"""
+
+
+class _KeyboardInput(ctypes.Structure):
+    _fields_ = [('wVk', ctypes.c_ushort), ('wScan', ctypes.c_ushort), ('dwFlags', ctypes.c_ulong),
+                ('time', ctypes.c_ulong), ('dwExtraInfo', ctypes.c_size_t)]
+
+
+class _MouseInput(ctypes.Structure):
+    _fields_ = [('dx', ctypes.c_long), ('dy', ctypes.c_long), ('mouseData', ctypes.c_ulong),
+                ('dwFlags', ctypes.c_ulong), ('time', ctypes.c_ulong), ('dwExtraInfo', ctypes.c_size_t)]
+
+
+class _InputUnion(ctypes.Union):
+    # 包含 MOUSEINPUT 使结构体大小与系统的 INPUT 一致
+    _fields_ = [('ki', _KeyboardInput), ('mi', _MouseInput)]
+
+
+class _Input(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_ulong), ('u', _InputUnion)]
+
+
+def virtual_key(name):
+    """按键名称转换为虚拟键码"""
+    try:
+        return VIRTUAL_KEYS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"不支持的按键: {name}") from None
+
+
+def build_key_events(vks):
+    """按下所有按键再逆序抬起，返回 [(虚拟键码, 标志)]"""
+    events = []
+    for vk in vks:
+        events.append((vk, KEYEVENTF_EXTENDEDKEY if vk in EXTENDED_KEYS else 0))
+    for vk in reversed(vks):
+        events.append((vk, KEYEVENTF_KEYUP | (KEYEVENTF_EXTENDEDKEY if vk in EXTENDED_KEYS else 0)))
+    return events
+
+
+def send_key_events(events):
+    """一次 SendInput 调用注入全部按键事件"""
+    inputs = (_Input * len(events))()
+    for item, (vk, flags) in zip(inputs, events):
+        item.type = INPUT_KEYBOARD
+        item.u.ki.wVk = vk
+        item.u.ki.dwFlags = flags
+    sent = ctypes.windll.user32.SendInput(len(events), inputs, ctypes.sizeof(_Input))
+    if sent != len(events):
+        raise ControlError(f"SendInput 只注入了 {sent}/{len(events)} 个按键事件")
+
+
+class ControlBackend:
+    """播放/暂停控制方式的基类"""
+    name = ''
+
+    def __init__(self):
+        self.last_duration = None  # 最近一次发送的耗时（秒）
+        self.sends = 0
+        self.used = self  # 最近一次实际使用的方式（兜底组合中可能是兜底方式）
+
+    def set_hotkey(self, keys):
+        """修改快捷键，不使用快捷键的控制方式忽略"""
+
+    def describe(self):
+        """用于日志的说明"""
+        return self.name
+
+    def send(self, action):
+        """发送一次播放/暂停（action 为 'play' 或 'pause'），返回耗时（秒），失败时抛出 ControlError"""
+        start = time.perf_counter()
+        self._send(action)
+        self.last_duration = time.perf_counter() - start
+        self.sends += 1
+        return self.last_duration
+
+    def _send(self, action):
+        raise NotImplementedError
+
+
+class KeyInjectionBackend(ControlBackend):
+    """用 SendInput 批量注入快捷键"""
+    name = CONTROL_KEYS
+
+    def __init__(self, keys):
+        super().__init__()
+        self.keys = []
+        self._events = []
+        self.set_hotkey(keys)
+
+    def set_hotkey(self, keys):
+        # 按键事件只在快捷键变化时生成一次
+        self._events = build_key_events([virtual_key(key) for key in keys])
+        self.keys = list(keys)
+
+    def describe(self):
+        return f"快捷键 {'+'.join(self.keys)}"
+
+    def _send(self, action):
+        send_key_events(self._events)
+
+
+class MediaKeyBackend(ControlBackend):
+    """发送系统媒体播放/暂停键"""
+    name = CONTROL_MEDIA_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._events = build_key_events([VK_MEDIA_PLAY_PAUSE])
+
+    def describe(self):
+        return "媒体播放/暂停键"
+
+    def _send(self, action):
+        send_key_events(self._events)
+
+
+class WindowMessageBackend(ControlBackend):
+    """向播放器窗口投递 WM_APPCOMMAND 播放/暂停消息
+
+    get_window() 返回播放器主窗口句柄，找不到窗口时返回None。
+    """
+    name = CONTROL_WINDOW_MESSAGE
+
+    def __init__(self, get_window):
+        super().__init__()
+        self.get_window = get_window
+
+    def describe(self):
+        return "播放器窗口消息"
+
+    def _send(self, action):
+        hwnd = self.get_window()
+        if not hwnd:
+            raise ControlError("找不到音乐播放器窗口")
+        if not ctypes.windll.user32.PostMessageW(hwnd, WM_APPCOMMAND, hwnd, APPCOMMAND_MEDIA_PLAY_PAUSE << 16):
+            raise ControlError(f"向窗口 {hwnd} 投递消息失败")
+
+
+class PyAutoGuiBackend(ControlBackend):
+    """pyautogui.hotkey，第一次发送时才导入 pyautogui"""
+    name = CONTROL_PYAUTOGUI
+
+    def __init__(self, keys):
+        super().__init__()
+        self.keys = list(keys)
+        self._pyautogui = None
+
+    def set_hotkey(self, keys):
+        self.keys = list(keys)
+
+    def describe(self):
+        return f"快捷键 {'+'.join(self.keys)} (pyautogui)"
+
+    def _send(self, action):
+        if self._pyautogui is None:
+            import pyautogui
+            self._pyautogui = pyautogui
+        try:
+            # 不使用 pyautogui 每次调用后的固定停顿
+            self._pyautogui.hotkey(*self.keys, _pause=False)
+        except self._pyautogui.FailSafeException as e:
+            raise ControlError(f"pyautogui 触发了安全保护: {e}") from None
+
+
+class DBusSessionBus:
+    """会话 D-Bus 的薄封装（jeepney），方便替换成模拟的总线"""
+
+    def __init__(self):
+        from jeepney import DBusAddress, new_method_call
+        from jeepney.io.blocking import open_dbus_connection
+        self._DBusAddress = DBusAddress
+        self._new_method_call = new_method_call
+        try:
+            self._connection = open_dbus_connection(bus='SESSION')
+        except (OSError, KeyError) as e:
+            raise ControlError(f"无法连接会话 D-Bus: {e}") from None
+
+    def _call(self, bus_name, path, interface, method, signature=None, body=()):
+        from jeepney import DBusErrorResponse
+        from jeepney.wrappers import unwrap_msg
+        address = self._DBusAddress(path, bus_name=bus_name, interface=interface)
+        message = self._new_method_call(address, method, signature, body)
+        try:
+            return unwrap_msg(self._connection.send_and_get_reply(message, timeout=1))
+        except (DBusErrorResponse, OSError, TimeoutError) as e:
+            raise ControlError(f"D-Bus 调用 {bus_name} {method} 失败: {e}") from None
+
+    def list_names(self):
+        """总线上的全部名称"""
+        return self._call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'ListNames')[0]
+
+    def get_pid(self, bus_name):
+        """名称所属的进程号"""
+        return self._call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                          'GetConnectionUnixProcessID', 's', (bus_name,))[0]
+
+    def call_player(self, bus_name, method):
+        """调用 MPRIS 播放器接口的方法（Play / Pause / PlayPause）"""
+        self._call(bus_name, MPRIS_PATH, MPRIS_PLAYER_INTERFACE, method)
+
+
+class MprisBackend(ControlBackend):
+    """通过 MPRIS 控制播放器
+
+    按进程号找到播放器在会话总线上的 org.mpris.MediaPlayer2.* 名称（找不到时按名称匹配），
+    播放时调用 Play、暂停时调用 Pause，不会因为状态判断错误而把播放器切换到相反的状态。
+    get_pids() 返回播放器的进程号；bus 省略时第一次发送才连接会话总线（需要 jeepney）。
+    """
+    name = CONTROL_MPRIS
+
+    def __init__(self, player_name, get_pids=None, bus=None):
+        super().__init__()
+        self.player_name = player_name
+        self.get_pids = get_pids
+        self.bus = bus
+        self.bus_name = None
+
+    def describe(self):
+        return f"MPRIS ({self.bus_name or self.player_name})"
+
+    def find_player(self):
+        """返回播放器的 MPRIS 名称，找不到时抛出 ControlError"""
+        names = [name for name in self.bus.list_names() if name.startswith(MPRIS_PREFIX)]
+        pids = set(self.get_pids()) if self.get_pids is not None else set()
+        if pids:
+            for name in names:
+                try:
+                    if self.bus.get_pid(name) in pids:
+                        return name
+                except ControlError:
+                    continue
+        # 名称形如 org.mpris.MediaPlayer2.spotify 或 org.mpris.MediaPlayer2.vlc.instance1234
+        stem = self.player_name.lower().rsplit('.exe', 1)[0]
+        for name in names:
+            if name[len(MPRIS_PREFIX):].split('.')[0].lower() in (stem, stem.replace('-', '')):
+                return name
+        raise ControlError(f"会话总线上没有 {self.player_name} 的 MPRIS 接口")
+
+    def _send(self, action):
+        if self.bus is None:
+            try:
+                self.bus = DBusSessionBus()
+            except ImportError as e:
+                raise ControlError(f"需要安装 jeepney: {e}") from None
+        method = 'Play' if action == 'play' else 'Pause'
+        if self.bus_name is not None:
+            try:
+                self.bus.call_player(self.bus_name, method)
+                return
+            except ControlError:
+                # 播放器可能重启了，重新查找名称
+                self.bus_name = None
+        self.bus_name = self.find_player()
+        self.bus.call_player(self.bus_name, method)
+
+
+class FallbackControlBackend(ControlBackend):
+    """首选方式失败时改用兜底方式"""
+
+    def __init__(self, primary, fallback):
+        super().__init__()
+        self.primary = primary
+        self.fallback = fallback
+        self.used = primary
+        self.last_error = None
+        self.name = primary.name
+
+    def set_hotkey(self, keys):
+        self.primary.set_hotkey(keys)
+        self.fallback.set_hotkey(keys)
+
+    def describe(self):
+        return self.used.describe()
+
+    def _send(self, action):
+        try:
+            self.primary.send(action)
+            self.used = self.primary
+            self.last_error = None
+        except ControlError as e:
+            self.last_error = e
+            self.fallback.send(action)
+            self.used = self.fallback
+
+
+class RecordingControlBackend(ControlBackend):
+    """只记录调用的控制方式
+
+    calls 保存 (时间, action, 快捷键)；on_send(action) 可以用来模拟播放器对按键的响应。
+    fail 为 True 时发送会抛出 ControlError。
+    """
+    name = 'recording'
+
+    def __init__(self, keys=(), on_send=None):
+        super().__init__()
+        self.keys = list(keys)
+        self.on_send = on_send
+        self.fail = False
+        self.calls = []
+
+    def set_hotkey(self, keys):
+        self.keys = list(keys)
+
+    def _send(self, action):
+        if self.fail:
+            raise ControlError("模拟的发送失败")
+        self.calls.append((time.monotonic(), action, tuple(self.keys)))
+        if self.on_send is not None:
+            self.on_send(action)
+
+
+def create_control_backend(kind, keys, get_window=None, player_name='', get_pids=None, hotkey_fallback=HOTKEY_FALLBACK):
+    """创建控制方式
+
+    批量注入快捷键失败（或快捷键中有 SendInput 不支持的按键）时改用 pyautogui；
+    其他原生方式只在 hotkey_fallback 为 True 时才改用 pyautogui，否则失败就报告失败。
+    MPRIS 用于 Linux，其他原生方式只在 Windows 上可用。
+    """
+    if kind == CONTROL_MPRIS:
+        primary = MprisBackend(player_name, get_pids)
+        return FallbackControlBackend(primary, PyAutoGuiBackend(keys)) if hotkey_fallback else primary
+    if kind == CONTROL_PYAUTOGUI or sys.platform != 'win32':
+        return PyAutoGuiBackend(keys)
+    if kind == CONTROL_KEYS:
+        try:
+            primary = KeyInjectionBackend(keys)
+        except ValueError as e:
+            get_logger().warning("%s，改用 pyautogui 发送快捷键 %s", e, '+'.join(keys))
+            return PyAutoGuiBackend(keys)
+        return FallbackControlBackend(primary, PyAutoGuiBackend(keys))
+    if kind == CONTROL_MEDIA_KEY:
+        primary = MediaKeyBackend()
+    elif kind == CONTROL_WINDOW_MESSAGE:
+        primary = WindowMessageBackend(get_window)
+    else:
+        raise ValueError(f"未知的控制方式: {kind}")
+    return FallbackControlBackend(primary, PyAutoGuiBackend(keys)) if hotkey_fallback else primary
@@ -0,0 +1,127 @@
+"""检测循环的性能统计
+
+记录每次检测中各个阶段的耗时（最近若干次采样的 p50/p95/p99）以及
+操作次数、冷却期内被抑制的操作、重试等计数，并可以导出为 JSON 或 Prometheus 文本格式。
+"""
+import json
+import os
+import time
+from array import array
+from contextlib import contextmanager
+
+
+class RollingHistogram:
+    """保存最近 size 个采样（秒），按需计算分位数"""
+    __slots__ = ('_samples', '_size', '_next', '_count', 'total_count', 'total_sum')
+
+    def __init__(self, size=1024):
+        self._samples = array('d', [0.0]) * size
+        self._size = size
+        self._next = 0
+        self._count = 0
+        self.total_count = 0
+        self.total_sum = 0.0
+
+    def observe(self, value):
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % self._size
+        if self._count < self._size:
+            self._count += 1
+        self.total_count += 1
+        self.total_sum += value
+
+    def percentiles(self, *quantiles):
+        """返回各分位数（最近窗口内），没有采样时返回 0.0"""
+        if not self._count:
+            return [0.0 for _ in quantiles]
+        ordered = sorted(self._samples[:self._count] if self._count < self._size else self._samples)
+        last = len(ordered) - 1
+        return [ordered[min(last, int(round(q * last)))] for q in quantiles]
+
+
+class Metrics:
+    """各阶段耗时直方图 + 计数器"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, histogram_size=1024):
+        self.histogram_size = histogram_size
+        self.histograms = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        """统计一个阶段的耗时：with metrics.stage('sessions'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = RollingHistogram(self.histogram_size)
+        histogram.observe(seconds)
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """返回可以直接序列化的统计数据（耗时单位为毫秒）"""
+        stages = {}
+        for name, histogram in self.histograms.items():
+            p50, p95, p99 = histogram.percentiles(*self.QUANTILES)
+            stages[name] = {
+                'count': histogram.total_count,
+                'p50_ms': round(p50 * 1000, 3),
+                'p95_ms': round(p95 * 1000, 3),
+                'p99_ms': round(p99 * 1000, 3),
+                'total_ms': round(histogram.total_sum * 1000, 3),
+            }
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'stages': stages,
+            'counters': dict(self.counters),
+        }
+
+    def summary(self, stage='tick'):
+        """一行摘要，用于界面显示"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            return "暂无统计数据"
+        p50, p95, p99 = (value * 1000 for value in histogram.percentiles(*self.QUANTILES))
+        counters = self.counters
+        return (f"检测耗时 p50/p95/p99: {p50:.1f}/{p95:.1f}/{p99:.1f} ms | "
+                f"操作 {counters.get('actions', 0)} 次，冷却抑制 {counters.get('cooldown_suppressed', 0)} 次，"
+                f"重试 {counters.get('retries', 0)} 次")
+
+    def to_prometheus(self, prefix='music_always_play'):
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        snapshot = self.snapshot()
+        lines.append(f"# TYPE {prefix}_stage_seconds summary")
+        for name, stage in sorted(snapshot['stages'].items()):
+            for quantile, key in zip(self.QUANTILES, ('p50_ms', 'p95_ms', 'p99_ms')):
+                lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{quantile}"}} {stage[key] / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["total_ms"] / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """写入统计文件：.prom 扩展名使用 Prometheus 文本格式，其余使用 JSON"""
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 先写临时文件再替换，读取方不会看到写了一半的文件
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
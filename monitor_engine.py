@@ -0,0 +1,983 @@
+"""音频监控引擎
+
+检测 → 判断 → 控制 的全部逻辑，不依赖Qt。
+图形界面（音乐一直放！.py）和无界面模式（headless.py）都只是它的使用者：
+调用 start() / stop() / set_music_player() 等方法，并通过 add_listener() 接收状态通知。
+可以同时监控多个音乐播放器（add_player()），每个播放器分别判断和控制。
+
+pycaw、comtypes、psutil、win32gui 在开始监控时才导入，控制方式（media_control）在第一次控制时才创建，
+创建引擎本身不加载这些依赖。
+"""
+import logging
+import os
+import time
+
+from action_confirmation import ActionConfirmation, CONFIRMED
+from activity_trace import TraceWriter, TICK_CONFIRM, TICK_FULL
+from app_log import app_data_dir, get_logger
+from audio_sessions import create_session_backend, SESSION_CREATED, STATE_ACTIVE
+from media_control import CONTROL_KEYS, ControlError
+from metrics import Metrics
+from noise_floor import NOISE_FLOOR_OFF_SHARE, NoiseFloorMap
+from peak_history import ActivityDetector, ActivityMap
+from player_profiles import PlayerProfile, RESUME_ALWAYS, RESUME_IF_PAUSED
+from player_tracking import parse_title_state, TITLE_PAUSED, TITLE_PLAYING
+from session_rules import compile_rules, parse_rule, ACTION_IGNORE, ACTION_THRESHOLD
+from task_scheduler import TaskScheduler, AdaptiveInterval, RateCounter
+from volume_ducking import DuckingSettings, VolumeDucker
+
+# 配置部分
+DEFAULT_MUSIC_PLAYER = 'lx-music-desktop.exe'  # 默认音乐播放器进程名
+DEFAULT_HOTKEY = ['ctrl', 'alt', 'p']  # 默认播放/暂停快捷键
+PEAK_THRESHOLD = 0.01  # 声音触发阈值（0.0-1.0）
+PEAK_OFF_THRESHOLD = 0.003  # 声音停止阈值，低于它才算无声（与触发阈值之间的回差避免反复切换）
+VERY_LOW_THRESHOLD = 1e-8  # 极低音量阈值，用于检测暂停状态（开启自动校准后按学习到的本底噪声判断）
+MIN_ACTIVE_SECONDS = 0.2  # 其他程序的声音至少持续这么久才算开始播放（过滤单次的短促声音）
+MIN_SILENT_SECONDS = 1.5  # 其他程序至少安静这么久才算停止播放（避免语音通话的停顿被当成结束）
+PLAYER_MIN_SILENT_SECONDS = 4  # 音乐播放器标题显示播放中、但持续无声这么久时认为已暂停
+PEAK_HISTORY_SIZE = 64  # 每个会话保存的峰值采样数
+METRICS_FILE = os.path.join(app_data_dir(), "metrics.json")  # 性能统计导出文件（.prom 扩展名导出 Prometheus 文本格式）
+METRICS_EXPORT_SECONDS = 60  # 性能统计导出间隔
+METRICS_PUBLISH_SECONDS = 5  # 向使用者发送性能统计摘要的间隔
+MIN_POLL_INTERVAL_MS = 200  # 状态变化前后及冷却期内的检测间隔（毫秒）
+MAX_POLL_INTERVAL_MS = 5000  # 状态长时间不变时的最长检测间隔（毫秒）
+POLL_BACKOFF_FACTOR = 1.5  # 状态不变时，每次检测后间隔放大的倍数
+ACTION_COOLDOWN_SECONDS = 5  # 两次控制操作之间的冷却时间
+EVENT_IDLE_POLL_INTERVAL_MS = 30000  # 事件模式下没有其他程序的活动会话时，兜底轮询的间隔
+SESSION_EVENT_DEBOUNCE_MS = 100  # 会话事件合并窗口，短时间内的多个事件只触发一次检测
+CONFIRM_POLL_INTERVAL_MS = 25  # 发送快捷键后确认操作是否生效的检测间隔（毫秒）
+CONFIRM_TIMEOUT_SECONDS = 3  # 超过这个时间状态仍未切换，认为操作没有生效
+CONFIRM_SILENT_SECONDS = 0.3  # 暂停后播放器至少安静这么久才算暂停成功（窗口标题没有暂停标识时）
+RETRY_BACKOFF_SECONDS = 15  # 多次启动播放未成功后，暂停尝试的时间
+CONTROL_BACKEND = CONTROL_KEYS  # 控制播放/暂停的方式，见 media_control.CONTROL_BACKENDS
+AUTO_CALIBRATE = False  # 按程序和设备学习本底噪声并自动设置阈值，见 noise_floor.py
+SESSION_RULES = ()  # 其他程序的处理规则，例如 ("ignore:glob:*chime*", "threshold:process:discord.exe:0.2")，见 session_rules.py
+USE_TITLE_EVENT_HOOK = True  # 通过窗口事件推送获取播放器标题，关闭后每次检测都读取窗口标题
+
+# 引擎发给使用者的通知类型
+NOTIFY_RUNNING = 'running'  # 值为 bool
+NOTIFY_TICK_RATE = 'tick_rate'  # 值为最近一分钟的检测次数
+NOTIFY_METRICS = 'metrics'  # 值为性能统计摘要字符串
+NOTIFY_DUCKED = 'ducked'  # 值为 (播放器进程名, 是否已闪避)
+
+
+class DetectionSettings:
+    """可以在运行中修改的检测参数，默认值为上面的配置"""
+    __slots__ = ('peak_threshold', 'peak_off_threshold', 'min_active_seconds', 'min_silent_seconds',
+                 'action_cooldown_seconds', 'min_poll_interval_ms', 'max_poll_interval_ms', 'auto_calibrate')
+
+    def __init__(self, peak_threshold=PEAK_THRESHOLD, peak_off_threshold=PEAK_OFF_THRESHOLD,
+                 min_active_seconds=MIN_ACTIVE_SECONDS, min_silent_seconds=MIN_SILENT_SECONDS,
+                 action_cooldown_seconds=ACTION_COOLDOWN_SECONDS, min_poll_interval_ms=MIN_POLL_INTERVAL_MS,
+                 max_poll_interval_ms=MAX_POLL_INTERVAL_MS, auto_calibrate=AUTO_CALIBRATE):
+        self.peak_threshold = peak_threshold
+        self.peak_off_threshold = peak_off_threshold
+        self.min_active_seconds = min_active_seconds
+        self.min_silent_seconds = min_silent_seconds
+        self.action_cooldown_seconds = action_cooldown_seconds
+        self.min_poll_interval_ms = min_poll_interval_ms
+        self.max_poll_interval_ms = max_poll_interval_ms
+        self.auto_calibrate = auto_calibrate  # 峰值阈值按学习到的本底噪声自动设置
+
+    def __eq__(self, other):
+        return isinstance(other, DetectionSettings) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"DetectionSettings({', '.join(f'{name}={getattr(self, name)}' for name in self.__slots__)})"
+
+    def to_json(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+
+class MonitorEngine:
+    """音频监控引擎
+
+    所有检测和控制都在引擎自己的调度线程中执行；公开方法可以在任意线程调用。
+    通知回调 callback(kind, value) 在调度线程中调用，使用者需要自行切换线程。
+    audio_backend / window_api / process_api / control_backend 省略时使用当前平台的实现，也可以传入模拟实现。
+    music_player / music_hotkey / control_kind 是主播放器的设置，其他播放器用 add_player() 添加。
+    session_rules 是其他程序的处理规则（见 session_rules.py），省略时使用 SESSION_RULES。
+    clock 是调度器时钟，回放记录时传入虚拟时钟（见 trace_replay.py）。
+    detection 是检测参数（DetectionSettings），省略时使用上面的配置。
+    """
+
+    def __init__(self, music_player=DEFAULT_MUSIC_PLAYER, music_hotkey=None, audio_backend=None,
+                 window_api=None, control_backend=None, control_kind=CONTROL_BACKEND, session_rules=None,
+                 clock=time.monotonic, process_api=None, detection=None):
+        # 状态变量
+        self.last_other_playing = False
+        self.last_lx_playing = False  # 是否有播放器在播放
+        self.running = False
+        self.detection = detection or DetectionSettings()  # 只在调度线程中替换，见 set_detection()
+        self.other_activity = self.create_other_activity()
+        self.noise_floor = self.create_noise_floor()  # 各程序的本底噪声，未开启自动校准时为 None
+        self.ducking = DuckingSettings()  # 音量闪避的渐变参数，只在调度线程中替换
+        self.other_session_active = False
+        self.session_rules = compile_rules(SESSION_RULES if session_rules is None else session_rules)
+        self._listeners = []
+        self.recorder = None  # 正在写入的活动记录（TraceWriter）
+
+        # 音乐播放器：第一个是主播放器，按进程名索引，一次遍历会话快照完成分类
+        self.window_api = window_api
+        self.process_api = process_api
+        self.clock = clock
+        self.control_kind = control_kind
+        self.players = []
+        self.players_by_process = {}
+        self.add_player(music_player, music_hotkey or DEFAULT_HOTKEY, control_kind, RESUME_ALWAYS,
+                        control_backend=control_backend)
+
+        # 音频会话后端（事件驱动，轮询作为兜底），省略时在开始监控时才创建
+        self.audio_backend = audio_backend
+        self.event_mode = False
+        if self.audio_backend is not None:
+            self.audio_backend.add_listener(self.on_session_event)
+
+        self.logger = get_logger()
+
+        # 检测 → 判断 → 控制 的整个循环都在调度线程中执行
+        # 音频会话的 COM 对象在后端自己的线程中（com_worker），这个线程不需要初始化 COM
+        self.scheduler = TaskScheduler("音频监控",
+                                       error_handler=lambda e: self.log(f"发生错误: {e}", logging.ERROR),
+                                       clock=clock)
+        self.tick_task = None
+        self.hold_until = 0  # 在此之前不进行下一次检测
+        self.adaptive_interval = self.create_adaptive_interval()
+        self.tick_rate = RateCounter(60)
+        self.last_reported_tick_rate = None
+
+        # 每个检测阶段的耗时统计和操作计数
+        self.metrics = Metrics()
+        self.metrics_tasks = []
+
+    @property
+    def primary(self):
+        """主播放器"""
+        return self.players[0]
+
+    @property
+    def music_player(self):
+        return self.primary.name
+
+    @property
+    def music_hotkey(self):
+        return self.primary.hotkey
+
+    def add_listener(self, callback):
+        """注册状态通知回调 callback(kind, value)"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def notify(self, kind, value):
+        for callback in list(self._listeners):
+            try:
+                callback(kind, value)
+            except Exception as e:
+                self.log(f"处理引擎通知时出错: {e}", logging.ERROR)
+
+    def log(self, message, level=logging.INFO):
+        """添加日志消息，可以在任意线程调用"""
+        self.logger.log(level, message)
+
+    def debug(self, message, *args):
+        """添加调试日志，参数只在开启调试日志时才会被格式化"""
+        self.logger.debug(message, *args)
+
+    def start(self):
+        """开始监控"""
+        if self.running:
+            return
+        self.running = True
+        self.scheduler.start()
+        self.scheduler.call_soon(self.start_worker)
+        self.notify(NOTIFY_RUNNING, True)
+
+    def stop(self):
+        """停止监控"""
+        if not self.running:
+            return
+        self.running = False
+        self.scheduler.call_soon(self.stop_worker)
+        self.log("监控已停止")
+        self.notify(NOTIFY_RUNNING, False)
+
+    def shutdown(self):
+        """停止监控并结束调度线程，释放音频会话后端"""
+        self.running = False
+        if self.scheduler.running:
+            self.scheduler.call_soon(self.stop_worker)
+            self.scheduler.stop()
+        if self.audio_backend is not None:
+            self.audio_backend.close()
+
+    def add_player(self, process_name, hotkey=None, control_kind=None, resume=RESUME_IF_PAUSED, name=None,
+                   control_backend=None, duck=False):
+        """添加一个音乐播放器，返回它的 PlayerProfile；进程名已存在时返回已有的配置
+
+        resume 为 RESUME_ALWAYS 时，没有任何声音就让它播放；
+        为 RESUME_IF_PAUSED 时，只在其他程序停止播放后恢复被本程序暂停的播放。
+        duck 为 True 时用会话音量闪避代替快捷键暂停。
+        """
+        key = process_name.strip().lower()
+        existing = self.players_by_process.get(key)
+        if existing is not None:
+            return existing
+        player = PlayerProfile(process_name, hotkey or DEFAULT_HOTKEY, control_kind or self.control_kind,
+                               self.create_player_activity(), resume, name, self.window_api, control_backend, USE_TITLE_EVENT_HOOK,
+                               self.process_api, duck, self.clock)
+        if player.title_tracker is not None:
+            player.title_tracker.on_change = self.on_title_changed
+        # 替换列表和索引而不是原地修改，调度线程中正在进行的遍历不受影响
+        self.players = self.players + [player]
+        self.players_by_process = dict(self.players_by_process, **{player.process_name: player})
+        if self.recorder is not None:
+            self.scheduler.call_soon(self.record_player_config, player)
+        return player
+
+    def remove_player(self, process_name):
+        """移除一个音乐播放器（主播放器不能移除）"""
+        key = process_name.strip().lower()
+        player = self.players_by_process.get(key)
+        if player is None or player is self.primary:
+            return False
+        self.players = [p for p in self.players if p is not player]
+        self.players_by_process = {p.process_name: p for p in self.players}
+        self.scheduler.call_soon(player.stop)
+        return True
+
+    def set_music_player(self, music_player):
+        """修改主播放器的进程名"""
+        music_player = music_player.strip()
+        self.scheduler.call_soon(self.reset_player_tracking, self.primary, music_player)
+        self.log(f"音乐播放器已更新为: {music_player}")
+
+    def set_hotkey(self, keys, player=None):
+        """修改播放/暂停快捷键，player 省略时修改主播放器"""
+        if keys:
+            self.scheduler.call_soon(self._set_hotkey, player or self.primary, list(keys))
+
+    def _set_hotkey(self, player, keys):
+        if keys == player.hotkey:
+            return
+        player.set_hotkey(keys)
+        self.log(f"{player.name} 的快捷键已更新为: {'+'.join(player.hotkey)}")
+
+    def set_session_rules(self, rules):
+        """替换其他程序的处理规则，规则无效时抛出 ValueError"""
+        # 先编译再整体替换，调度线程读到的总是完整的规则索引
+        self.session_rules = compile_rules(rules)
+        self.log(f"已加载 {len(self.session_rules)} 条程序规则")
+        if self.recorder is not None:
+            self.scheduler.call_soon(self.record_config)
+
+    def create_other_activity(self):
+        settings = self.detection
+        return ActivityMap(settings.peak_threshold, settings.peak_off_threshold, settings.min_active_seconds,
+                           settings.min_silent_seconds, PEAK_HISTORY_SIZE)
+
+    def create_player_activity(self):
+        settings = self.detection
+        return ActivityDetector(settings.peak_threshold, settings.peak_off_threshold, 0, PLAYER_MIN_SILENT_SECONDS,
+                                PEAK_HISTORY_SIZE)
+
+    def create_noise_floor(self):
+        settings = self.detection
+        if not settings.auto_calibrate:
+            return None
+        return NoiseFloorMap(max_floor=settings.peak_off_threshold * NOISE_FLOOR_OFF_SHARE)
+
+    def create_adaptive_interval(self):
+        settings = self.detection
+        return AdaptiveInterval(settings.min_poll_interval_ms / 1000, settings.max_poll_interval_ms / 1000,
+                                POLL_BACKOFF_FACTOR)
+
+    def set_detection(self, settings):
+        """替换检测参数（DetectionSettings），峰值历史和检测间隔按新参数重新开始"""
+        self.scheduler.call_soon(self._apply_detection, settings)
+
+    def _apply_detection(self, settings):
+        if settings == self.detection:
+            return
+        self.detection = settings
+        self.other_activity = self.create_other_activity()
+        self.noise_floor = self.create_noise_floor()
+        for player in self.players:
+            player.activity = self.create_player_activity()
+        self.adaptive_interval = self.create_adaptive_interval()
+        self.record_config()
+        self.log(f"检测参数已更新: 阈值 {settings.peak_threshold}/{settings.peak_off_threshold}，"
+                 f"冷却 {settings.action_cooldown_seconds} 秒，"
+                 f"检测间隔 {settings.min_poll_interval_ms}-{settings.max_poll_interval_ms} 毫秒"
+                 f"{'，自动校准阈值' if settings.auto_calibrate else ''}")
+        self.schedule_check(0)
+
+    def set_duck(self, enabled, player=None):
+        """开启/关闭播放器的音量闪避模式，关闭时立即恢复被闪避的音量"""
+        self.scheduler.call_soon(self._set_duck, player or self.primary, enabled)
+
+    def _set_duck(self, player, enabled):
+        if player.duck == enabled:
+            return
+        player.duck = enabled
+        if not enabled:
+            player.stop_ducking()
+            player.paused_by_us = False
+        self.record_player_config(player)
+        self.log(f"{player.name} {'改用音量闪避' if enabled else '改用快捷键暂停'}")
+
+    def set_ducking(self, settings):
+        """替换音量闪避的渐变参数（volume_ducking.DuckingSettings）"""
+        self.scheduler.call_soon(self._apply_ducking, settings)
+
+    def _apply_ducking(self, settings):
+        if settings == self.ducking:
+            return
+        self.ducking = settings
+        for player in self.players:
+            if player.ducker is not None:
+                player.ducker.settings = settings
+        self.log(f"音量闪避参数已更新: 音量 {settings.level:.0%}，曲线 {settings.curve}，"
+                 f"降低 {settings.down_ms} 毫秒 / 恢复 {settings.up_ms} 毫秒")
+
+    def set_control_kind(self, kind, player=None):
+        """修改控制方式，下一次控制时按新方式创建"""
+        self.scheduler.call_soon(self._set_control_kind, player or self.primary, kind)
+
+    def _set_control_kind(self, player, kind):
+        if kind == player.control_kind:
+            return
+        player.control_kind = kind
+        player.control_backend = None
+        self.log(f"{player.name} 的控制方式已更新为: {kind}")
+
+    def set_resume(self, resume, player=None):
+        """修改播放器的恢复方式（RESUME_ALWAYS / RESUME_IF_PAUSED）"""
+        self.scheduler.call_soon(self._set_resume, player or self.primary, resume)
+
+    def _set_resume(self, player, resume):
+        if resume == player.resume:
+            return
+        player.resume = resume
+        self.log(f"{player.name} 的恢复方式已更新为: {resume}")
+
+    def apply_config(self, config):
+        """应用配置（config_store.AppConfig），只修改有变化的设置，可以在任意线程调用"""
+        primary = self.primary
+        if config.music_player.strip().lower() != primary.process_name:
+            self.set_music_player(config.music_player)
+        if list(config.hotkey) != primary.hotkey:
+            self.set_hotkey(config.hotkey)
+        self.set_control_kind(config.control)
+        self.set_duck(config.duck)
+        self.set_ducking(DuckingSettings(config.duck_level, config.duck_curve, config.duck_down_ms,
+                                         config.duck_up_ms))
+
+        wanted = {spec['process_name'].strip().lower(): spec for spec in config.players}
+        for player in self.players[1:]:
+            if player.process_name not in wanted:
+                self.remove_player(player.process_name)
+                self.log(f"已移除音乐播放器: {player.name}")
+        for key, spec in wanted.items():
+            if key == primary.process_name or key == config.music_player.strip().lower():
+                continue
+            player = self.players_by_process.get(key)
+            if player is None:
+                self.add_player(spec['process_name'], spec.get('hotkey'), spec.get('control'),
+                                spec.get('resume', RESUME_IF_PAUSED), duck=spec.get('duck', False))
+                self.log(f"已添加音乐播放器: {spec['process_name']}")
+                continue
+            if spec.get('hotkey') and list(spec['hotkey']) != player.hotkey:
+                self.set_hotkey(spec['hotkey'], player)
+            if spec.get('control'):
+                self.set_control_kind(spec['control'], player)
+            self.set_resume(spec.get('resume', player.resume), player)
+            self.set_duck(spec.get('duck', False), player)
+
+        rules = [parse_rule(rule).to_text() for rule in config.session_rules]
+        if rules != [rule.to_text() for rule in self.session_rules.rules]:
+            self.set_session_rules(rules)
+        self.set_detection(DetectionSettings(config.peak_threshold, config.peak_off_threshold,
+                                             config.min_active_seconds, config.min_silent_seconds,
+                                             config.action_cooldown_seconds, config.min_poll_interval_ms,
+                                             config.max_poll_interval_ms, config.auto_calibrate))
+
+    def start_recording(self, path):
+        """开始把每次检测的会话峰值、播放器标题、判断和操作追加写入记录文件"""
+        self.scheduler.call_soon(self._start_recording, path)
+
+    def stop_recording(self):
+        """停止记录"""
+        self.scheduler.call_soon(self._stop_recording)
+
+    def _start_recording(self, path):
+        self._stop_recording()
+        try:
+            self.recorder = TraceWriter(path)
+        except (OSError, ValueError) as e:
+            self.log(f"无法写入活动记录 {path}: {e}", logging.ERROR)
+            return
+        self.record_config()
+        for player in self.players:
+            self.record_player_config(player)
+        self.log(f"开始记录音频活动: {path}")
+
+    def _stop_recording(self):
+        if self.recorder is None:
+            return
+        recorder, self.recorder = self.recorder, None
+        try:
+            recorder.close()
+        except OSError as e:
+            self.log(f"保存活动记录失败: {e}", logging.WARNING)
+            return
+        self.log(f"活动记录已保存: {recorder.path}（{recorder.records} 条）")
+
+    def record_config(self):
+        """把检测参数和程序规则写入记录，回放时默认按它们判断"""
+        if self.recorder is not None:
+            self.recorder.config({'detection': self.detection.to_json(),
+                                  'session_rules': [rule.to_text() for rule in self.session_rules.rules]})
+
+    def record_player_config(self, player):
+        """把播放器配置写入记录，回放时按它重建播放器"""
+        if self.recorder is not None and player in self.players:
+            self.recorder.player_config(player.process_name, player.resume, self.players.index(player), player.duck)
+
+    def reset_player_tracking(self, player, music_player):
+        """播放器进程名变化后重置进程、窗口和标题缓存（在调度线程中执行）"""
+        player.set_process_name(music_player)
+        self.players_by_process = {p.process_name: p for p in self.players}
+        self.other_activity.clear()
+        self.record_player_config(player)
+
+    def start_worker(self):
+        """开始监控（在调度线程中执行）"""
+        if self.audio_backend is None:
+            try:
+                self.audio_backend = create_session_backend()
+            except (OSError, ImportError) as e:
+                self.log(f"无法创建音频会话后端: {e}", logging.ERROR)
+                self.stop()
+                return
+            self.audio_backend.add_listener(self.on_session_event)
+        self.event_mode = self.audio_backend.start_events()
+        if self.event_mode:
+            self.log("监控已启动（事件驱动模式）")
+        else:
+            self.log(f"监控已启动（轮询模式，检测间隔 {self.detection.min_poll_interval_ms}-"
+                     f"{self.detection.max_poll_interval_ms} 毫秒自适应）")
+        if len(self.players) > 1:
+            self.log(f"监控的音乐播放器: {', '.join(player.name for player in self.players)}")
+        self.adaptive_interval.reset()
+        self.schedule_check(0)
+        self.metrics_tasks = [
+            self.scheduler.call_later(METRICS_PUBLISH_SECONDS, self.publish_metrics),
+            self.scheduler.call_later(METRICS_EXPORT_SECONDS, self.export_metrics),
+        ]
+
+    def stop_worker(self):
+        """停止监控（在调度线程中执行）"""
+        self.scheduler.cancel(self.tick_task)
+        self.tick_task = None
+        for task in self.metrics_tasks:
+            self.scheduler.cancel(task)
+        self.metrics_tasks = []
+        self.export_metrics(reschedule=False)
+        if self.audio_backend is not None:
+            self.audio_backend.stop_events()
+        for player in self.players:
+            player.stop()
+        self.event_mode = False
+        self.hold_until = 0
+        self._stop_recording()
+
+    def schedule_check(self, delay):
+        """安排一次检测（在调度线程中执行）
+
+        检测时间不早于 hold_until；已经安排了更早的检测时保留原来的安排。
+        """
+        if not self.running:
+            return
+        when = max(self.scheduler.time() + delay, self.hold_until)
+        if self.tick_task is not None and not self.tick_task.cancelled:
+            if self.tick_task.when <= when:
+                return
+            self.scheduler.cancel(self.tick_task)
+        self.tick_task = self.scheduler.call_at(when, self.run_check)
+
+    def confirming(self):
+        """正在确认操作结果的播放器"""
+        return [player for player in self.players if player.confirmation is not None]
+
+    def run_check(self):
+        """执行一次检测并安排下一次（在调度线程中执行）"""
+        self.tick_task = None
+        if not self.running:
+            return
+        delay = self.step()
+        if self.recorder is not None:
+            try:
+                self.recorder.flush()
+            except OSError as e:
+                self.log(f"写入活动记录失败: {e}", logging.ERROR)
+                self._stop_recording()
+        self.schedule_check(delay)
+
+    def step(self):
+        """执行一次检测（或一次操作确认），返回到下一次检测的间隔（秒）
+
+        回放记录时由 trace_replay.py 按记录的时间直接调用。
+        """
+        confirming = self.confirming()
+        if confirming:
+            if self.recorder is not None:
+                self.recorder.tick(self.scheduler.time(), TICK_CONFIRM)
+            # 刚发送了快捷键：只观察这些播放器，确认操作生效或超时前不做新的判断
+            with self.metrics.stage('confirm_poll'):
+                self.check_confirmation(confirming)
+            if self.confirming():
+                return CONFIRM_POLL_INTERVAL_MS / 1000
+            self.adaptive_interval.reset()
+            return self.poll_interval(True)
+        if self.recorder is not None:
+            self.recorder.tick(self.scheduler.time(), TICK_FULL)
+        previous_state = (self.last_other_playing, self.last_lx_playing)
+        with self.metrics.stage('tick'):
+            self.check_audio_status()
+        self.metrics.increment('ticks')
+        self.tick_rate.add()
+        ticks_per_minute = self.ticks_per_minute()
+        if ticks_per_minute != self.last_reported_tick_rate:
+            self.last_reported_tick_rate = ticks_per_minute
+            self.notify(NOTIFY_TICK_RATE, ticks_per_minute)
+        # 状态刚变化或处于操作冷却期内时密切观察，否则逐步放慢
+        changed = (self.last_other_playing, self.last_lx_playing) != previous_state
+        now = self.scheduler.time()
+        cooldown = self.detection.action_cooldown_seconds
+        in_cooldown = any(now - player.last_action_time <= cooldown for player in self.players)
+        # 峰值越过阈值但还没确认时也需要尽快再次采样
+        pending = self.other_activity.pending or any(player.activity.pending for player in self.players)
+        if self.confirming():
+            return CONFIRM_POLL_INTERVAL_MS / 1000
+        return self.poll_interval(changed or in_cooldown or pending)
+
+    def publish_metrics(self):
+        """发送性能统计摘要（在调度线程中定时执行）"""
+        self.notify(NOTIFY_METRICS, self.metrics.summary())
+        self.metrics_tasks[0] = self.scheduler.call_later(METRICS_PUBLISH_SECONDS, self.publish_metrics)
+
+    def export_metrics(self, reschedule=True):
+        """把性能统计写入文件（在调度线程中定时执行）"""
+        try:
+            self.metrics.export(METRICS_FILE)
+        except OSError as e:
+            self.log(f"导出性能统计失败: {e}", logging.WARNING)
+        if reschedule:
+            self.metrics_tasks[1] = self.scheduler.call_later(METRICS_EXPORT_SECONDS, self.export_metrics)
+
+    def hold(self, seconds):
+        """推迟下一次检测，用定时代替阻塞线程的 time.sleep"""
+        self.hold_until = max(self.hold_until, self.scheduler.time()) + seconds
+
+    def poll_interval(self, active):
+        """下一次检测的间隔（秒），active 表示状态刚变化或处于冷却期"""
+        # 会话事件只反映会话的新建/状态变化，峰值变化不会产生事件，
+        # 所以只要还有其他程序的活动会话，就继续自适应轮询；
+        # 所有会话都空闲时只依赖事件，轮询退为低频兜底
+        if self.event_mode and not self.other_session_active and not active:
+            return EVENT_IDLE_POLL_INTERVAL_MS / 1000
+        return self.adaptive_interval.next(active)
+
+    def ticks_per_minute(self):
+        """最近一分钟内的检测次数"""
+        return self.tick_rate.count()
+
+    def on_session_event(self, event):
+        """收到音频会话事件后尽快安排一次检测（在后端的回调线程中调用）"""
+        if not self.running:
+            return
+        name = event.process_name or ('新会话' if event.kind == SESSION_CREATED else '系统声音')
+        self.debug("音频会话事件: %s %s", name, event.kind)
+        if event.kind == SESSION_CREATED:
+            self.scheduler.call_soon(self.request_process_scans)
+        self.scheduler.call_soon(self.on_activity)
+
+    def request_process_scans(self):
+        """出现了新的音频会话：还没有运行的播放器下次检测时立即扫描进程（在调度线程中执行）"""
+        for player in self.players:
+            player.index.request_scan()
+
+    def on_title_changed(self, title):
+        """播放器窗口标题变化（在标题事件线程中调用），正在确认操作时立即检查"""
+        if self.running and self.confirming():
+            self.scheduler.call_soon(self.schedule_check, 0)
+
+    def on_activity(self):
+        """有新的音频活动：回到最短检测间隔并尽快检测（在调度线程中执行）"""
+        self.adaptive_interval.reset()
+        self.schedule_check(SESSION_EVENT_DEBOUNCE_MS / 1000)
+
+    def classify_sessions(self, sessions):
+        """一次遍历会话快照，返回：
+        ({播放器进程名: 最大峰值}, {其他程序pid: 最大峰值}, {其他程序pid: 自己的阈值}, 其他程序是否有活动会话)
+
+        其他程序先按规则处理：忽略的会话不参与判断，指定了阈值的会话使用自己的阈值。
+        """
+        players = self.players_by_process
+        rules = self.session_rules
+        player_peaks = {}
+        other_peaks = {}
+        other_thresholds = {}
+        other_session_active = False
+        for session in sessions:
+            name = session.process_name
+            if name in players:
+                # 播放器有音频会话说明它在运行，不必等到下一次定期扫描
+                players[name].index.request_scan()
+                if session.peak > player_peaks.get(name, 0.0):
+                    player_peaks[name] = session.peak
+                continue
+            rule = rules.match(session) if rules else None
+            if rule is not None:
+                if rule.action == ACTION_IGNORE:
+                    continue
+                if rule.action == ACTION_THRESHOLD:
+                    other_thresholds[session.pid] = rule.threshold
+            if session.state == STATE_ACTIVE:
+                other_session_active = True
+            if session.peak > other_peaks.get(session.pid, -1.0):
+                other_peaks[session.pid] = session.peak
+        return player_peaks, other_peaks, other_thresholds, other_session_active
+
+    def calibrate(self, sessions, other_peaks, other_thresholds):
+        """用这次快照的峰值学习各程序在各设备上的本底噪声（自动校准开启时在每次完整检测中调用）
+
+        返回 {播放器进程名: NoiseFloor}（取峰值最大的会话）；没有规则阈值的其他程序按校准结果
+        在 other_thresholds 中填入 (触发阈值, 停止阈值)。
+        播放器正在播放时不学习它的采样（很轻的音乐不能当成本底噪声），只使用已经学到的结果。
+        """
+        noise_floor = self.noise_floor
+        players = self.players_by_process
+        player_floors = {}
+        player_best = {}
+        calibrated = {}
+        for session in sessions:
+            name = session.process_name
+            key = (name, session.device)
+            player = players.get(name)
+            if player is not None and player.activity.active:
+                floor, changed = noise_floor.get(key), False
+                if floor is None:
+                    continue
+            else:
+                floor, changed = noise_floor.push(key, session.peak)
+            if changed:
+                device = f" ({session.device})" if session.device else ''
+                if floor.floor is None:
+                    self.debug("%s%s 的本底噪声不稳定，使用默认阈值", name, device)
+                else:
+                    on_threshold, off_threshold = floor.thresholds()
+                    self.log(f"已学习 {name}{device} 的本底噪声 {floor.floor:.2g}，"
+                             f"阈值 {on_threshold:.2g}/{off_threshold:.2g}")
+            if player is not None:
+                if session.peak >= player_best.get(name, -1.0):
+                    player_best[name] = session.peak
+                    player_floors[name] = floor
+                continue
+            pid = session.pid
+            if pid not in other_peaks or pid in other_thresholds:
+                continue
+            thresholds = floor.thresholds()
+            if thresholds is not None and (pid not in calibrated or thresholds > calibrated[pid]):
+                calibrated[pid] = thresholds
+        other_thresholds.update(calibrated)
+        return player_floors
+
+    def 检测LX_Music是否在播放音频(self, player, peak_value, floor=None):
+        """检测音乐播放器是否在播放音频，通过窗口标题和音量判断
+
+        floor 是自动校准学习到的本底噪声（NoiseFloor），阈值按它设置。
+        """
+        try:
+            # 首先检查音乐播放器进程是否存在（使用缓存的进程索引，避免每次扫描全部进程）
+            with self.metrics.stage('process_index'):
+                player_pids = player.index.get_pids()
+            if not player_pids:
+                if self.recorder is not None:
+                    self.recorder.player(player.process_name, False, None)
+                self.log(f"音乐播放器进程 {player.name} 未运行")
+                return False
+
+            # 查找音乐播放器窗口标题
+            with self.metrics.stage('window_title'):
+                music_player_title = player.read_title(player_pids)
+            if self.recorder is not None:
+                self.recorder.player(player.process_name, True, music_player_title)
+
+            self.debug("%s 窗口标题: '%s' (窗口缓存 命中 %d / 未命中 %d)", player.name,
+                       music_player_title, player.window_cache.hits, player.window_cache.misses)
+
+            # 使用音量检测作为主要判断方法
+            title_state = parse_title_state(music_player_title, player.process_name)
+            player.last_title_state = title_state
+            self.debug("%s 音量峰值: %s", player.name, peak_value)
+
+            thresholds = floor.thresholds() if floor is not None else None
+            if thresholds is None:
+                thresholds = self.detection.peak_threshold, self.detection.peak_off_threshold
+            player.activity.on_threshold, player.activity.off_threshold = thresholds
+
+            # 峰值落在学习到的本底噪声范围内，第一次采样就可以确定已暂停
+            if floor is not None and floor.at_floor(peak_value, self.detection.peak_off_threshold):
+                player.activity.update(peak_value, self.scheduler.time())
+                player.activity.active = False
+                self.debug("%s 已暂停（本底噪声 %.2g）", player.name, floor.floor)
+                return False
+
+            # 根据音量判断播放状态
+            # 如果音量超过阈值（回差范围内保持），则认为正在播放
+            if player.activity.update(peak_value, self.scheduler.time()):
+                return True
+            # 如果音量极低（接近0但不是0），则认为是暂停状态
+            elif floor is None and peak_value > 0 and peak_value < VERY_LOW_THRESHOLD:
+                self.log(f"{player.name} 已暂停（极低音量）")
+                return False
+
+            # 如果音量检测不确定，则使用窗口标题辅助判断
+            if title_state == TITLE_PAUSED:
+                return False
+
+            # 如果窗口标题包含歌曲名，且没有明确的暂停标识，则可能在播放
+            is_playing_by_title = title_state == TITLE_PLAYING
+
+            # 如果标题判断为播放中，但已经持续一段时间没有声音，则认为已暂停
+            if is_playing_by_title and player.activity.silent:
+                self.log(f"{player.name} 可能已暂停（无音量）")
+                return False
+
+            return is_playing_by_title
+
+        except Exception as e:
+            self.log(f"检测 {player.name} 状态时出错: {e}", logging.ERROR)
+            return False
+
+    def check_confirmation(self, players):
+        """观察播放器的峰值和窗口标题，判断刚发送的操作是否生效（在调度线程中执行）"""
+        recorder = self.recorder
+        try:
+            sessions = self.audio_backend.get_sessions()
+            if recorder is not None:
+                recorder.sessions(sessions)
+            player_peaks = self.classify_sessions(sessions)[0]
+        except Exception as e:
+            self.log(f"确认操作结果时出错: {e}", logging.ERROR)
+            player_peaks = {}
+        now = self.scheduler.time()
+        for player in players:
+            confirmation = player.confirmation
+            try:
+                player_pids = player.index.get_pids()
+                title = player.read_title(player_pids) if player_pids else None
+                if recorder is not None:
+                    recorder.player(player.process_name, bool(player_pids), title)
+                title_state = parse_title_state(title, player.process_name) if player_pids else None
+            except Exception as e:
+                self.log(f"确认 {player.name} 操作结果时出错: {e}", logging.ERROR)
+                title_state = None
+            if confirmation.update(player_peaks.get(player.process_name, 0.0), title_state, now) is not None:
+                self.finish_confirmation(player, confirmation)
+
+    def finish_confirmation(self, player, confirmation):
+        """记录确认结果，并据此更新播放状态和重试计数"""
+        player.confirmation = None
+        action_name = '开始播放' if confirmation.action == 'play' else '暂停'
+        elapsed_ms = confirmation.elapsed * 1000
+        if self.recorder is not None:
+            self.recorder.confirm(confirmation.finished, player.process_name, confirmation.result == CONFIRMED,
+                                  confirmation.elapsed)
+        self.metrics.observe('confirm', confirmation.elapsed)
+        if confirmation.result == CONFIRMED:
+            self.metrics.increment('confirmed')
+            self.log(f"{player.name} 已{action_name}（{elapsed_ms:.0f} 毫秒后确认）")
+            player.playing = confirmation.action == 'play'
+            if confirmation.action == 'play':
+                player.consecutive_attempts = 0  # 播放成功，重置连续尝试计数
+                player.paused_by_us = False
+            else:
+                player.activity.reset()  # 已确认暂停，不再等待无声持续时间
+        else:
+            # 超时：连续尝试计数保留，下一次检测按重试逻辑处理
+            self.metrics.increment('confirm_timeouts')
+            self.log(f"{player.name} 的{action_name}操作在 {elapsed_ms / 1000:.1f} 秒内没有生效", logging.WARNING)
+
+    def 控制LX_Music(self, player, action):
+        """控制音乐播放器的播放状态，返回是否发送成功"""
+        if action == 'play' or action == 'pause':
+            try:
+                backend = player.get_control_backend()
+                elapsed = backend.send(action)
+            except (ControlError, ValueError, ImportError) as e:
+                if self.recorder is not None:
+                    self.recorder.action(self.scheduler.time(), player.process_name, action, False, 0.0)
+                self.metrics.increment('control_errors')
+                self.log(f"控制 {player.name} 失败 ({action}): {e}", logging.ERROR)
+                return False
+            if self.recorder is not None:
+                self.recorder.action(self.scheduler.time(), player.process_name, action, True, elapsed)
+            used = backend.used
+            if getattr(backend, 'last_error', None) is not None:
+                # 每次改用兜底方式都提醒：pyautogui 的按键发给当前的焦点窗口
+                self.log(f"{backend.primary.describe()}失败（{backend.last_error}），已改用{used.describe()}"
+                         f"（按键发给当前焦点窗口）", logging.WARNING)
+            self.log(f"已通过{used.describe()}控制 {player.name} ({action}，耗时 {elapsed * 1000:.1f} 毫秒)")
+            # 每种控制方式分别统计耗时
+            self.metrics.observe('control', elapsed)
+            self.metrics.observe(f'control_{used.name}', elapsed)
+            self.metrics.increment('actions')
+            self.metrics.increment(f'actions_{action}')
+            # 不再固定等待，观察播放器状态确认操作是否生效
+            player.confirmation = ActionConfirmation(action, self.scheduler.time(), CONFIRM_TIMEOUT_SECONDS,
+                                                     player.last_title_state, player.activity.on_threshold,
+                                                     player.activity.off_threshold,
+                                                     CONFIRM_SILENT_SECONDS)
+            return True
+        return False
+
+    def 检测其他程序是否在播放音频(self, peaks, thresholds, other_session_active):
+        """检测其他程序是否在播放音频（按进程维护峰值历史，带回差和最短持续时间）"""
+        self.other_session_active = other_session_active
+        return bool(self.other_activity.update(peaks, self.scheduler.time(), thresholds))
+
+    def check_audio_status(self):
+        """检查音频状态并对每个播放器执行相应操作"""
+        try:
+            current_time = self.scheduler.time()
+            # 每次检测只枚举一次会话，并在一次遍历中分出各个播放器和其他程序
+            with self.metrics.stage('sessions'):
+                sessions = self.audio_backend.get_sessions()
+            if self.recorder is not None:
+                self.recorder.sessions(sessions)
+            player_peaks, other_peaks, other_thresholds, other_session_active = self.classify_sessions(sessions)
+            player_floors = {}
+            if self.noise_floor is not None:
+                player_floors = self.calibrate(sessions, other_peaks, other_thresholds)
+            other_playing = self.检测其他程序是否在播放音频(other_peaks, other_thresholds, other_session_active)
+            players = self.players
+            for player in players:
+                player.playing = self.检测LX_Music是否在播放音频(player, player_peaks.get(player.process_name, 0.0),
+                                                            player_floors.get(player.process_name))
+
+            self.debug("调试信息 - 其他程序播放状态: %s, 播放器播放状态: %s", other_playing,
+                       {player.name: player.playing for player in players})
+
+            for player in players:
+                if self.recorder is not None:
+                    self.recorder.decision(current_time, player.process_name, other_playing, player.playing)
+                # 其他播放器在播放，或者有等待恢复的播放器时，不主动启动"总是播放"的播放器
+                others_busy = any(p.playing or p.paused_by_us for p in players if p is not player)
+                self.decide(player, other_playing, others_busy, current_time)
+
+            # 更新上一次的状态
+            self.last_other_playing = other_playing
+            self.last_lx_playing = any(player.playing for player in players)
+
+        except Exception as e:
+            self.metrics.increment('errors')
+            self.log(f"发生错误: {e}", logging.ERROR)
+
+    def get_ducker(self, player):
+        """播放器的 VolumeDucker，音频会话后端不支持会话音量时返回 None（退回快捷键暂停）"""
+        if player.ducker is None:
+            if not self.audio_backend.supports_volume:
+                return None
+            player.ducker = VolumeDucker(
+                self.audio_backend, player.process_name, self.scheduler, self.ducking,
+                on_error=lambda e: self.log(f"设置 {player.name} 的音量失败: {e}", logging.ERROR))
+        return player.ducker
+
+    def decide_ducking(self, player, other_playing, current_time):
+        """音量闪避模式：其他程序播放时渐变降低播放器的会话音量，停止后渐变恢复，返回是否已经处理
+
+        闪避期间播放器一直在播放，不发送快捷键，也不需要确认和重试；
+        没有闪避也不需要恢复时返回 False，按原来的逻辑处理（例如"总是播放"的播放器没有在播放）。
+        """
+        ducker = self.get_ducker(player)
+        if ducker is None:
+            return False
+        if other_playing:
+            if not ducker.ducked and player.playing and ducker.duck():
+                self.log(f"检测到其他程序正在播放，降低 {player.name} 的音量")
+                self.on_ducked(player, True, current_time)
+            return True
+        if ducker.ducked:
+            ducker.restore()
+            self.log(f"其他程序已停止播放，恢复 {player.name} 的音量")
+            self.on_ducked(player, False, current_time)
+            return True
+        return False
+
+    def on_ducked(self, player, ducked, current_time):
+        """记录一次闪避或恢复"""
+        action = 'duck' if ducked else 'restore'
+        if self.recorder is not None:
+            self.recorder.action(current_time, player.process_name, action, True, 0.0)
+        self.metrics.increment('actions')
+        self.metrics.increment(f'actions_{action}')
+        player.paused_by_us = ducked
+        player.consecutive_attempts = 0
+        player.last_action = action
+        player.last_action_time = current_time
+        self.notify(NOTIFY_DUCKED, (player.process_name, ducked))
+
+    def decide(self, player, other_playing, others_busy, current_time):
+        """根据其他程序的播放状态决定暂停或恢复这个播放器"""
+        if player.duck and self.decide_ducking(player, other_playing, current_time):
+            return
+        lx_playing = player.playing
+        # 添加操作冷却时间，避免频繁切换
+        cooldown_passed = (current_time - player.last_action_time) > self.detection.action_cooldown_seconds
+        if not cooldown_passed and lx_playing == other_playing:
+            # 本来需要暂停或恢复播放，但还在冷却期内
+            self.metrics.increment('cooldown_suppressed')
+
+        # 情况1: 其他程序正在播放，确保播放器暂停
+        if other_playing:
+            if lx_playing and cooldown_passed:
+                self.log(f"检测到其他程序正在播放，暂停 {player.name}")
+                if self.控制LX_Music(player, 'pause'):
+                    player.paused_by_us = True
+                player.last_action = 'pause'
+                player.last_action_time = current_time
+            player.consecutive_attempts = 0  # 重置连续尝试计数
+        # 情况2: 其他程序不在播放，恢复播放器
+        elif cooldown_passed:
+            if lx_playing:
+                player.consecutive_attempts = 0  # 已经在播放，重置计数
+                player.paused_by_us = False
+                return
+            if not (player.paused_by_us or (player.resume == RESUME_ALWAYS and not others_busy)):
+                return
+            if self.scheduler.time() < player.backoff_until:
+                return
+            # 添加防止循环触发的逻辑
+            player.consecutive_attempts += 1
+            if player.consecutive_attempts <= 3:  # 最多尝试3次
+                if player.consecutive_attempts > 1:
+                    self.metrics.increment('retries')
+                self.log(f"没有检测到任何音频播放，启动 {player.name} (尝试 {player.consecutive_attempts}/3)")
+                self.控制LX_Music(player, 'play')
+                player.last_action = 'play'
+                player.last_action_time = current_time
+            else:
+                self.log(f"多次尝试启动 {player.name} 未成功，暂停尝试")
+                self.metrics.increment('retry_backoffs')
+                player.backoff_until = self.scheduler.time() + RETRY_BACKOFF_SECONDS  # 等待更长时间再尝试
+                player.consecutive_attempts = 0
@@ -0,0 +1,162 @@
+"""按程序和设备学习本底噪声，自动设置峰值阈值
+
+有的设备或程序在没有声音时峰值也不为 0（音效处理、底噪），固定的 PEAK_THRESHOLD 可能一直判断为有声；
+有的在暂停时峰值正好为 0，固定阈值又会把很轻的声音当成无声。
+这里为每个 (进程名, 设备) 保存最近的峰值采样，用对数分桶的直方图统计分位数：
+最低的一段采样如果集中在很窄的范围内，就是这个程序在这个设备上的本底噪声，阈值按它设置：
+
+- 本底噪声不为 0：峰值落在本底噪声范围内时立即判断为无声，不必等无声持续一段时间；
+- 本底噪声为 0：使用较低的触发阈值，很轻的声音在第一次采样时就能判断为有声。
+
+一直在发声的程序（最低的采样也分散在较宽的范围内）不会被校准，继续使用默认阈值；
+本底噪声的上限由使用者按停止阈值设置（max_floor），学习到的值不会高于它。
+"""
+import math
+from array import array
+
+NOISE_FLOOR_WINDOW = 512  # 每个程序保存的采样数
+NOISE_FLOOR_MIN_SAMPLES = 32  # 至少有这么多采样才开始校准
+NOISE_FLOOR_PERCENTILE = 0.1  # 用这个分位数的采样估计本底噪声
+NOISE_FLOOR_MIN_SHARE = 0.2  # 本底噪声范围内至少要有这个比例的采样，才认为是稳定的本底噪声
+NOISE_FLOOR_MARGIN = 4.0  # 触发阈值 = 本底噪声上限 × 这个倍数
+NOISE_FLOOR_OFF_MARGIN = 1.5  # 停止阈值 = 本底噪声上限 × 这个倍数
+NOISE_FLOOR_MIN_THRESHOLD = 0.002  # 校准后触发阈值的下限（本底噪声为 0 时使用）
+NOISE_FLOOR_MAX = 0.05  # 本底噪声超过这个值时认为程序一直在发声，不校准
+NOISE_FLOOR_OFF_SHARE = 0.5  # 本底噪声上限不超过停止阈值的这个比例，否则很轻的音乐会被学成本底噪声
+NOISE_FLOOR_RECOMPUTE_SAMPLES = 16  # 每加入这么多采样重新计算一次分位数
+NOISE_FLOOR_MAX_KEYS = 256  # 最多记录的 (进程名, 设备) 个数，超出时丢弃最早出现的
+
+# 对数分桶：桶 0 为峰值 0，之后每 1/BINS_PER_DECADE 个数量级一个桶，覆盖 MIN_PEAK 到 1.0
+BINS_PER_DECADE = 8
+MIN_PEAK_EXPONENT = -9
+BIN_COUNT = 1 + BINS_PER_DECADE * -MIN_PEAK_EXPONENT
+
+
+def peak_bin(peak):
+    """峰值所在的桶"""
+    if peak <= 0.0:
+        return 0
+    index = int((math.log10(peak) - MIN_PEAK_EXPONENT) * BINS_PER_DECADE)
+    return 1 + min(max(index, 0), BIN_COUNT - 2)
+
+
+def bin_upper(index):
+    """桶的上限峰值"""
+    if index == 0:
+        return 0.0
+    return 10.0 ** (MIN_PEAK_EXPONENT + index / BINS_PER_DECADE)
+
+
+class NoiseFloor:
+    """一个程序在一个设备上的本底噪声：最近采样所在桶的环形缓冲区和各桶计数"""
+    __slots__ = ('_bins', '_counts', '_next', '_count', '_pending', 'max_floor', 'floor_bin', 'floor')
+
+    def __init__(self, size=NOISE_FLOOR_WINDOW, max_floor=NOISE_FLOOR_MAX):
+        self._bins = array('B', [0]) * size
+        self._counts = array('H', [0]) * BIN_COUNT
+        self._next = 0
+        self._count = 0
+        self._pending = 0
+        self.max_floor = min(max_floor, NOISE_FLOOR_MAX)  # 本底噪声上限超过它时不校准
+        self.floor_bin = None  # 本底噪声范围最高的桶，未校准时为 None
+        self.floor = None  # 本底噪声上限峰值，未校准时为 None
+
+    def __len__(self):
+        return self._count
+
+    def push(self, peak):
+        """加入一个采样，返回校准结果是否发生了变化"""
+        index = peak_bin(peak)
+        size = len(self._bins)
+        if self._count == size:
+            self._counts[self._bins[self._next]] -= 1
+        else:
+            self._count += 1
+        self._bins[self._next] = index
+        self._counts[index] += 1
+        self._next = (self._next + 1) % size
+        self._pending += 1
+        if self._pending < NOISE_FLOOR_RECOMPUTE_SAMPLES and self._count != NOISE_FLOOR_MIN_SAMPLES:
+            return False
+        self._pending = 0
+        return self._recompute()
+
+    def percentile_bin(self, fraction):
+        """分位数所在的桶"""
+        target = max(1, math.ceil(self._count * fraction))
+        total = 0
+        for index, count in enumerate(self._counts):
+            total += count
+            if total >= target:
+                return index
+        return BIN_COUNT - 1
+
+    def _recompute(self):
+        floor_bin = None
+        if self._count >= NOISE_FLOOR_MIN_SAMPLES:
+            low = self.percentile_bin(NOISE_FLOOR_PERCENTILE)
+            # 本底噪声范围为分位数所在的桶和上一个桶（峰值 0 单独一个桶）
+            high = low if low == 0 else min(low + 1, BIN_COUNT - 1)
+            share = sum(self._counts[low:high + 1]) / self._count
+            if share >= NOISE_FLOOR_MIN_SHARE and bin_upper(high) <= self.max_floor:
+                floor_bin = high
+        if floor_bin == self.floor_bin:
+            return False
+        self.floor_bin = floor_bin
+        self.floor = None if floor_bin is None else bin_upper(floor_bin)
+        return True
+
+    def thresholds(self):
+        """校准后的 (触发阈值, 停止阈值)，未校准时返回 None"""
+        if self.floor is None:
+            return None
+        on_threshold = max(self.floor * NOISE_FLOOR_MARGIN, NOISE_FLOOR_MIN_THRESHOLD)
+        off_threshold = max(self.floor * NOISE_FLOOR_OFF_MARGIN, NOISE_FLOOR_MIN_THRESHOLD * 0.3)
+        return on_threshold, min(off_threshold, on_threshold)
+
+    def at_floor(self, peak, off_threshold=None):
+        """峰值处于不为 0 的本底噪声范围内：可以直接判断为无声
+
+        给出停止阈值时，本底噪声上限还要明显低于它（不超过 NOISE_FLOOR_OFF_SHARE）才直接判断。
+        """
+        if not self.floor:
+            return False
+        if off_threshold is not None and self.floor > off_threshold * NOISE_FLOOR_OFF_SHARE:
+            return False
+        return peak_bin(peak) <= self.floor_bin
+
+
+class NoiseFloorMap:
+    """按 (进程名, 设备) 分别学习本底噪声"""
+
+    def __init__(self, size=NOISE_FLOOR_WINDOW, max_keys=NOISE_FLOOR_MAX_KEYS, max_floor=NOISE_FLOOR_MAX):
+        self._size = size
+        self._max_keys = max_keys
+        self.max_floor = max_floor
+        self._floors = {}
+
+    def __len__(self):
+        return len(self._floors)
+
+    def get(self, key):
+        return self._floors.get(key)
+
+    def push(self, key, peak):
+        """加入一个采样，返回这个键的 NoiseFloor 以及校准结果是否发生了变化"""
+        floor = self._floors.get(key)
+        if floor is None:
+            if len(self._floors) >= self._max_keys:
+                del self._floors[next(iter(self._floors))]
+            floor = self._floors[key] = NoiseFloor(self._size, self.max_floor)
+        return floor, floor.push(peak)
+
+    def thresholds(self, key):
+        floor = self._floors.get(key)
+        return floor.thresholds() if floor is not None else None
+
+    def summary(self):
+        """{(进程名, 设备): 本底噪声上限}，只包括已校准的"""
+        return {key: floor.floor for key, floor in self._floors.items() if floor.floor is not None}
+
+    def clear(self):
+        self._floors.clear()
@@ -0,0 +1,165 @@
+"""音量峰值历史与有声/无声判断
+
+单次采样可能正好落在语音通话的两个字之间，直接和阈值比较容易误判。
+这里为每个会话保存最近的峰值采样（定长数组实现的环形缓冲区，内存固定），
+并用开/关两个阈值（回差）加最短持续时间来判断是否真的在发声。
+"""
+from array import array
+
+
+class PeakHistory:
+    """定长环形缓冲区，保存最近的 (时间, 峰值) 采样"""
+    __slots__ = ('_values', '_times', '_size', '_next', '_count')
+
+    def __init__(self, size=64):
+        self._size = size
+        self._values = array('f', [0.0]) * size
+        self._times = array('d', [0.0]) * size
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, value, now):
+        self._values[self._next] = value
+        self._times[self._next] = now
+        self._next = (self._next + 1) % self._size
+        if self._count < self._size:
+            self._count += 1
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def latest(self):
+        """最新的峰值，没有采样时返回 0.0"""
+        if not self._count:
+            return 0.0
+        return self._values[self._next - 1]
+
+    def values(self):
+        """按时间顺序返回所有峰值"""
+        start = (self._next - self._count) % self._size
+        return [self._values[(start + i) % self._size] for i in range(self._count)]
+
+    def _run_duration(self, matches):
+        """最新的连续满足条件的采样持续了多久；最新采样不满足时返回None"""
+        if not self._count:
+            return None
+        index = self._next - 1
+        if not matches(self._values[index]):
+            return None
+        newest = self._times[index]
+        oldest = newest
+        for _ in range(self._count):
+            if not matches(self._values[index]):
+                break
+            oldest = self._times[index]
+            index -= 1
+        return newest - oldest
+
+    def duration_above(self, threshold):
+        """峰值连续不低于 threshold 的时长（秒）"""
+        return self._run_duration(lambda value: value >= threshold)
+
+    def duration_below(self, threshold):
+        """峰值连续不高于 threshold 的时长（秒）"""
+        return self._run_duration(lambda value: value <= threshold)
+
+
+class ActivityDetector:
+    """带回差和最短持续时间的有声/无声判断
+
+    无声 → 有声：峰值持续不低于 on_threshold 至少 min_on 秒；
+    有声 → 无声：峰值持续不高于 off_threshold 至少 min_off 秒。
+    介于两个阈值之间的采样保持当前状态。
+    """
+
+    def __init__(self, on_threshold, off_threshold, min_on=0.0, min_off=0.0, size=64):
+        self.on_threshold = on_threshold
+        self.off_threshold = min(off_threshold, on_threshold)
+        self.min_on = min_on
+        self.min_off = min_off
+        self.history = PeakHistory(size)
+        self.active = False
+
+    def update(self, peak, now):
+        """加入一个采样，返回更新后的状态"""
+        self.history.push(peak, now)
+        if not self.active:
+            duration = self.history.duration_above(self.on_threshold)
+            if duration is not None and duration >= self.min_on:
+                self.active = True
+        else:
+            duration = self.history.duration_below(self.off_threshold)
+            if duration is not None and duration >= self.min_off:
+                self.active = False
+        return self.active
+
+    @property
+    def silent(self):
+        """已经确认无声（峰值持续低于关阈值达到最短时长）"""
+        duration = self.history.duration_below(self.off_threshold)
+        return duration is not None and duration >= self.min_off
+
+    @property
+    def pending(self):
+        """最新采样越过了阈值但状态还没有切换，需要尽快再次采样确认"""
+        if not len(self.history):
+            return False
+        latest = self.history.latest()
+        if self.active:
+            return latest <= self.off_threshold
+        return latest >= self.on_threshold
+
+    def reset(self):
+        self.history.clear()
+        self.active = False
+
+
+class ActivityMap:
+    """按会话（或进程）分别维护 ActivityDetector"""
+
+    def __init__(self, on_threshold, off_threshold, min_on=0.0, min_off=0.0, size=64):
+        self._settings = (on_threshold, off_threshold, min_on, min_off, size)
+        self._detectors = {}
+
+    def __len__(self):
+        return len(self._detectors)
+
+    def update(self, peaks, now, thresholds=None):
+        """peaks: {键: 峰值}，返回处于有声状态的键集合；不再出现的键会被移除
+
+        thresholds: {键: 开阈值}，为个别键指定自己的开阈值，关阈值按默认的回差比例缩放；
+        值也可以是 (开阈值, 关阈值)，同时指定两个阈值
+        """
+        for key in list(self._detectors):
+            if key not in peaks:
+                del self._detectors[key]
+        active = set()
+        for key, peak in peaks.items():
+            detector = self._detectors.get(key)
+            if detector is None:
+                detector = self._detectors[key] = ActivityDetector(*self._settings)
+            self._apply_threshold(detector, thresholds.get(key) if thresholds else None)
+            if detector.update(peak, now):
+                active.add(key)
+        return active
+
+    def _apply_threshold(self, detector, thresholds):
+        default_on, default_off = self._settings[0], self._settings[1]
+        if isinstance(thresholds, tuple):
+            on_threshold, off_threshold = thresholds
+        else:
+            on_threshold = default_on if thresholds is None else thresholds
+            off_threshold = on_threshold * default_off / default_on if default_on else 0.0
+        detector.on_threshold = on_threshold
+        detector.off_threshold = min(off_threshold, on_threshold)
+
+    @property
+    def pending(self):
+        return any(detector.pending for detector in self._detectors.values())
+
+    def clear(self):
+        self._detectors.clear()
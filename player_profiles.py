@@ -0,0 +1,119 @@
+"""音乐播放器配置与状态
+
+同时监控多个播放器时，每个播放器有自己的进程名、快捷键和控制方式，
+以及各自的进程/窗口缓存、峰值历史和暂停/恢复状态，互不影响。
+"""
+import time
+
+from media_control import create_control_backend
+from player_tracking import PlayerProcessIndex, PlayerWindowCache, create_title_tracker
+
+# 其他程序停止播放后何时恢复播放
+RESUME_ALWAYS = 'always'  # 没有任何声音时总是让它播放（原来的行为）
+RESUME_IF_PAUSED = 'paused'  # 只恢复被本程序暂停的播放器
+RESUME_MODES = (RESUME_ALWAYS, RESUME_IF_PAUSED)
+
+
+class PlayerProfile:
+    """一个音乐播放器的配置、缓存和控制状态
+
+    方法都只应在引擎的调度线程中调用。
+    """
+
+    def __init__(self, process_name, hotkey, control_kind, activity, resume=RESUME_ALWAYS, name=None,
+                 window_api=None, control_backend=None, title_events=True, process_api=None, duck=False,
+                 clock=time.monotonic):
+        self.process_name = process_name.strip().lower()
+        self.name = name or process_name
+        self.hotkey = list(hotkey)
+        self.control_kind = control_kind
+        self.control_backend = control_backend
+        self.control_backend_owned = False  # control_backend 是否由 get_control_backend 按配置创建
+        self.resume = resume
+        self.duck = duck  # 用会话音量闪避代替快捷键暂停，见 volume_ducking.py
+        self.ducker = None  # VolumeDucker，第一次闪避时由引擎创建
+        self.activity = activity  # ActivityDetector，由引擎按检测阈值创建
+        self.index = PlayerProcessIndex(self.process_name, process_api, clock)
+        self.window_cache = PlayerWindowCache(self.index, window_api)
+        self.title_tracker = create_title_tracker(self.process_name, clock) if title_events else None
+
+        # 判断和控制状态
+        self.playing = False
+        self.last_action = None
+        self.last_action_time = float('-inf')  # 调度器时间
+        self.consecutive_attempts = 0
+        self.backoff_until = 0  # 多次启动未成功后，在此之前（调度器时间）不再尝试
+        self.paused_by_us = False  # 被本程序暂停，其他程序停止播放后需要恢复
+        self.last_title_state = None  # 最近一次检测时根据窗口标题判断的播放状态
+        self.confirmation = None  # 正在确认结果的播放/暂停操作
+
+    def __repr__(self):
+        return f"PlayerProfile({self.process_name!r})"
+
+    def set_process_name(self, process_name):
+        """修改进程名并重置缓存和状态"""
+        self.process_name = process_name.strip().lower()
+        self.name = process_name.strip()
+        self.index.set_process_name(self.process_name)
+        if self.title_tracker is not None:
+            self.title_tracker.set_process_name(self.process_name)
+        self.reset()
+
+    def set_hotkey(self, keys):
+        """修改快捷键
+
+        按配置创建的控制方式直接丢弃，下次控制时用新快捷键重新创建：SendInput 不支持的按键
+        与第一次创建时一样改用 pyautogui。传入的控制方式（模拟实现）只更新快捷键。
+        """
+        self.hotkey = list(keys)
+        if self.control_backend_owned:
+            self.control_backend = None
+            self.control_backend_owned = False
+        elif self.control_backend is not None:
+            self.control_backend.set_hotkey(self.hotkey)
+
+    def reset(self):
+        """丢弃缓存和判断状态"""
+        self.window_cache.invalidate()
+        self.activity.reset()
+        self.playing = False
+        self.consecutive_attempts = 0
+        self.backoff_until = 0
+        self.paused_by_us = False
+        self.last_title_state = None
+        self.confirmation = None
+        self.stop_ducking()
+
+    def stop(self):
+        """停止监控时取消标题订阅和未完成的确认，恢复被闪避的音量"""
+        if self.title_tracker is not None:
+            self.title_tracker.stop()
+        self.confirmation = None
+        self.stop_ducking()
+
+    def stop_ducking(self):
+        """立即恢复闪避前的音量，之后按需要重新创建 VolumeDucker"""
+        if self.ducker is not None:
+            self.ducker.stop()
+            self.ducker = None
+
+    def read_title(self, player_pids):
+        """播放器窗口标题：优先使用窗口事件推送的标题，没有推送结果时读取窗口标题
+        （优先使用缓存的窗口句柄，缓存失效时才枚举全部窗口）"""
+        title = None
+        if self.title_tracker is not None and self.title_tracker.track(player_pids):
+            title = self.title_tracker.title
+        if title is None:
+            title = self.window_cache.get_title(player_pids)
+            if self.title_tracker is not None:
+                self.title_tracker.seed(title, self.window_cache.window)
+        return title
+
+    def get_control_backend(self):
+        """第一次控制时才创建控制方式"""
+        if self.control_backend is None:
+            self.control_backend = create_control_backend(
+                self.control_kind, self.hotkey, lambda: self.window_cache.get_window(self.index.get_pids()),
+                self.process_name, self.index.get_pids)
+            self.control_backend_owned = True
+        return self.control_backend
@@ -0,0 +1,480 @@
+"""音乐播放器进程跟踪
+
+检测循环每次都需要知道播放器是否在运行、窗口标题是什么，这里把结果缓存起来，
+只在缓存失效时才做代价较高的全量扫描；窗口标题还可以通过窗口事件推送获得。
+psutil、win32gui 在第一次检测时才导入，不拖慢程序启动。
+"""
+import sys
+import threading
+import time
+
+# 根据窗口标题判断的播放状态
+TITLE_PLAYING = 'playing'
+TITLE_PAUSED = 'paused'
+
+PROCESS_RESCAN_SECONDS = 5  # 播放器未运行时两次全量扫描进程的最短间隔
+TITLE_SUBSCRIBE_RETRY_SECONDS = 30  # 订阅窗口事件失败后，同一组播放器进程再次尝试订阅的间隔
+
+
+def parse_title_state(title, process_name):
+    """根据窗口标题判断播放状态，无法判断时返回None"""
+    if not title:
+        return None
+    if "- 暂停中" in title or "- paused" in title.lower():
+        return TITLE_PAUSED
+    # 窗口标题包含歌曲名（不是播放器自身的名字），且没有明确的暂停标识，则可能在播放
+    if title.endswith(process_name.replace(".exe", "")):
+        return None
+    return TITLE_PLAYING
+
+
+class PlayerProcessIndex:
+    """音乐播放器进程索引
+
+    第一次查询时扫描全部进程，记下播放器的 pid 和进程创建时间；
+    之后只用 pid + 创建时间确认这些进程是否还活着（防止 pid 被复用）。
+    只有缓存的进程全部退出，或者配置的进程名变化时，才重新全量扫描。
+    播放器没有运行时，两次全量扫描至少间隔 rescan_interval 秒，有新的音频会话时可以用 request_scan() 提前扫描。
+    """
+
+    def __init__(self, process_name='', process_api=None, clock=time.monotonic,
+                 rescan_interval=PROCESS_RESCAN_SECONDS):
+        self._process_name = ''
+        self._process_api = process_api
+        self._pids = {}  # pid -> 进程创建时间
+        self._clock = clock
+        self._rescan_interval = rescan_interval
+        self._next_scan = float('-inf')  # 没有找到播放器时，在此之前（clock 时间）不再全量扫描
+        self.full_scans = 0
+        self.cache_hits = 0
+        self.set_process_name(process_name)
+
+    @property
+    def process_name(self):
+        return self._process_name
+
+    @property
+    def process_api(self):
+        # psutil 第一次查询进程时才导入
+        if self._process_api is None:
+            self._process_api = PsutilProcessApi()
+        return self._process_api
+
+    def set_process_name(self, process_name):
+        """修改播放器进程名，名称变化时清空缓存"""
+        process_name = process_name.strip().lower()
+        if process_name != self._process_name:
+            self._process_name = process_name
+            self.invalidate()
+
+    def invalidate(self):
+        """丢弃缓存，下次查询时重新扫描"""
+        self._pids = {}
+        self._next_scan = float('-inf')
+
+    def request_scan(self):
+        """没有找到播放器时，下次查询立即重新扫描（例如出现了新的音频会话）"""
+        if not self._pids:
+            self._next_scan = float('-inf')
+
+    def get_pids(self):
+        """返回播放器的 pid 列表，播放器未运行时返回空列表"""
+        if not self._process_name:
+            return []
+        if self._pids:
+            alive = {pid: create_time for pid, create_time in self._pids.items()
+                     if self._is_alive(pid, create_time)}
+            if alive:
+                self._pids = alive
+                self.cache_hits += 1
+                return list(alive)
+            # 缓存的进程刚刚全部退出：立即扫描一次，看有没有重新启动
+            self._pids = {}
+            self._next_scan = float('-inf')
+        now = self._clock()
+        if now < self._next_scan:
+            return []
+        self._pids = self._scan()
+        if not self._pids:
+            self._next_scan = now + self._rescan_interval
+        return list(self._pids)
+
+    def is_running(self):
+        """播放器进程是否在运行"""
+        return bool(self.get_pids())
+
+    def add_pid(self, pid):
+        """登记一个确认属于播放器的进程（例如窗口或音频会话的所属进程）"""
+        if pid in self._pids:
+            return
+        create_time = self.process_api.create_time(pid)
+        if create_time is not None:
+            self._pids[pid] = create_time
+
+    def _scan(self):
+        self.full_scans += 1
+        pids = {}
+        for pid, name, create_time in self.process_api.iter_processes():
+            if name and name.lower() == self._process_name:
+                pids[pid] = create_time
+        return pids
+
+    def _is_alive(self, pid, create_time):
+        return self.process_api.create_time(pid) == create_time
+
+
+class PsutilProcessApi:
+    """psutil 的薄封装，方便替换成模拟的进程接口"""
+
+    def __init__(self):
+        import psutil
+        self._psutil = psutil
+
+    def iter_processes(self):
+        """逐个返回 (pid, 进程名, 创建时间)"""
+        for proc in self._psutil.process_iter(['pid', 'name', 'create_time']):
+            yield proc.info['pid'], proc.info['name'], proc.info['create_time']
+
+    def create_time(self, pid):
+        """进程创建时间，进程不存在或无权访问时返回None"""
+        try:
+            return self._psutil.Process(pid).create_time()
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied):
+            return None
+
+
+class Win32WindowApi:
+    """win32gui / win32process 的薄封装，方便替换成模拟的窗口接口"""
+
+    def __init__(self):
+        import win32gui
+        import win32process
+        self._win32gui = win32gui
+        self._win32process = win32process
+
+    def list_windows(self):
+        """返回所有顶层窗口句柄"""
+        hwnds = []
+        self._win32gui.EnumWindows(lambda hwnd, extra: extra.append(hwnd) or True, hwnds)
+        return hwnds
+
+    def is_window(self, hwnd):
+        return bool(self._win32gui.IsWindow(hwnd))
+
+    def is_visible(self, hwnd):
+        return bool(self._win32gui.IsWindowVisible(hwnd))
+
+    def get_pid(self, hwnd):
+        return self._win32process.GetWindowThreadProcessId(hwnd)[1]
+
+    def get_title(self, hwnd):
+        return self._win32gui.GetWindowText(hwnd)
+
+
+class NullWindowApi:
+    """没有可用窗口接口的平台（Linux）：没有任何窗口，只根据音量判断播放状态"""
+
+    def list_windows(self):
+        return []
+
+    def is_window(self, hwnd):
+        return False
+
+    def is_visible(self, hwnd):
+        return False
+
+    def get_pid(self, hwnd):
+        return 0
+
+    def get_title(self, hwnd):
+        return ""
+
+
+class PlayerWindowCache:
+    """音乐播放器窗口句柄缓存
+
+    找到的播放器窗口按 (hwnd, pid) 缓存，之后只用"窗口仍存在、仍可见、
+    仍属于同一个播放器进程"来确认缓存有效；缓存失效时才枚举全部顶层窗口。
+    枚举时用进程索引里的 pid 集合判断窗口归属，不再为每个窗口查询进程名。
+    """
+
+    def __init__(self, process_index, window_api=None):
+        self.process_index = process_index
+        self._window_api = window_api
+        self._windows = []  # [(hwnd, pid)]
+        self.window = None  # 最近一次读到标题的窗口句柄
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def window_api(self):
+        # win32gui 第一次查询窗口时才导入
+        if self._window_api is None:
+            self._window_api = Win32WindowApi() if sys.platform == 'win32' else NullWindowApi()
+        return self._window_api
+
+    def invalidate(self):
+        """丢弃缓存的窗口句柄"""
+        self._windows = []
+        self.window = None
+
+    def get_title(self, player_pids=None):
+        """返回播放器窗口标题，找不到窗口时返回空字符串
+
+        player_pids: 本次检测已经查询过的播放器 pid，省略时从进程索引获取
+        """
+        if player_pids is None:
+            player_pids = self.process_index.get_pids()
+        player_pids = set(player_pids)
+        if not player_pids:
+            self._windows = []
+            self.window = None
+            return ""
+        title = self._read_cached_title(player_pids)
+        if title:
+            self.hits += 1
+            return title
+        self.misses += 1
+        self._windows = self._find_windows(player_pids)
+        return self._read_cached_title(player_pids)
+
+    def get_window(self, player_pids=None):
+        """返回播放器主窗口句柄（与 get_title 读取标题的是同一个窗口），找不到时返回None"""
+        if not self.get_title(player_pids):
+            return None
+        api = self.window_api
+        for hwnd, pid in self._windows:
+            if api.is_visible(hwnd):
+                return hwnd
+        return None
+
+    def _read_cached_title(self, player_pids):
+        api = self.window_api
+        valid = []
+        title = ""
+        self.window = None
+        for hwnd, pid in self._windows:
+            if pid not in player_pids or not api.is_window(hwnd) or api.get_pid(hwnd) != pid:
+                continue
+            valid.append((hwnd, pid))
+            if not title and api.is_visible(hwnd):
+                title = api.get_title(hwnd)
+                if title:
+                    self.window = hwnd
+        self._windows = valid
+        return title
+
+    def _find_windows(self, player_pids):
+        api = self.window_api
+        windows = []
+        for hwnd in api.list_windows():
+            if not api.is_visible(hwnd):
+                continue
+            pid = api.get_pid(hwnd)
+            if pid in player_pids and api.get_title(hwnd):
+                windows.append((hwnd, pid))
+        # 与原来的枚举回调保持一致：有多个窗口时以最后一个有标题的窗口为准
+        windows.reverse()
+        return windows
+
+
+class TitleTracker:
+    """推送式的播放器窗口标题跟踪器
+
+    由事件源调用 update_title() 推送最新标题，检测时直接读取 title / state，
+    不需要任何系统调用。track() 在播放器进程变化时重新订阅事件，订阅失败后
+    同一组进程要等 TITLE_SUBSCRIBE_RETRY_SECONDS 才再次尝试。
+    title 为 None 表示还没有收到标题，调用方应退回到读取窗口标题，并用 seed() 告诉跟踪器
+    标题来自哪个窗口：之后只接受这个窗口的标题变化（播放器的桌面歌词等其他窗口不算），
+    这个窗口关闭或隐藏后 title 回到 None。
+    """
+
+    def __init__(self, process_name='', clock=time.monotonic):
+        self.process_name = process_name
+        self.clock = clock
+        self.title = None
+        self.state = None
+        self.window = None  # 标题来自的窗口句柄
+        self.title_changes = 0
+        self.subscribe_failures = 0
+        self.on_change = None  # 标题变化回调 on_change(title)，在事件源的线程中调用
+        self._pids = frozenset()
+        self._failed_pids = frozenset()
+        self._retry_at = 0.0
+
+    def set_process_name(self, process_name):
+        """修改播放器进程名，取消已有的订阅"""
+        self.process_name = process_name
+        self.stop()
+
+    def track(self, pids):
+        """跟踪这些播放器进程的窗口，返回是否处于跟踪状态"""
+        pids = frozenset(pids)
+        if pids != self._pids:
+            self.stop()
+            if pids and (pids != self._failed_pids or self.clock() >= self._retry_at):
+                if self._subscribe(pids):
+                    self._pids = pids
+                    self._failed_pids = frozenset()
+                else:
+                    # 清理没有订阅成功的事件源，一段时间内不再为同一组进程尝试
+                    self._unsubscribe()
+                    self.subscribe_failures += 1
+                    self._failed_pids = pids
+                    self._retry_at = self.clock() + TITLE_SUBSCRIBE_RETRY_SECONDS
+        return bool(self._pids)
+
+    def seed(self, title, window=None):
+        """用主动读取到的标题和它所在的窗口初始化，已经有标题时忽略"""
+        if self.title is None and title:
+            self.window = window
+            self.update_title(title)
+
+    def update_title(self, title, window=None):
+        """事件源推送新的窗口标题，window 是标题变化的窗口（None 表示不区分窗口）"""
+        if window is not None and window != self.window:
+            return
+        if title == self.title:
+            return
+        self.title = title
+        self.state = parse_title_state(title, self.process_name)
+        self.title_changes += 1
+        if self.on_change is not None:
+            self.on_change(title)
+
+    def window_closed(self, window):
+        """事件源报告窗口关闭或隐藏：是标题来自的窗口时丢弃标题，等待重新读取"""
+        if window == self.window:
+            self.window = None
+            self.title = None
+            self.state = None
+
+    def stop(self):
+        """取消订阅并清空已知标题"""
+        if self._pids:
+            self._unsubscribe()
+        self._pids = frozenset()
+        self.title = None
+        self.state = None
+        self.window = None
+
+    def _subscribe(self, pids):
+        return True
+
+    def _unsubscribe(self):
+        pass
+
+
+class SimulatedTitleTracker(TitleTracker):
+    """由调用方推送标题的跟踪器，用来在没有窗口系统的环境下模拟窗口事件"""
+
+    def __init__(self, process_name='', clock=time.monotonic):
+        super().__init__(process_name, clock)
+        self.subscriptions = 0
+        self.fail = False  # 为 True 时订阅失败
+
+    def _subscribe(self, pids):
+        self.subscriptions += 1
+        return not self.fail
+
+    def push_title(self, title, window=None):
+        """模拟一次窗口标题变化事件"""
+        if self._pids:
+            self.update_title(title, window)
+
+    def push_closed(self, window):
+        """模拟一次窗口关闭或隐藏事件"""
+        if self._pids:
+            self.window_closed(window)
+
+
+class WinEventTitleTracker(TitleTracker):
+    """通过 SetWinEventHook 订阅播放器进程的窗口名称变化、关闭和隐藏事件
+
+    钩子运行在自己的线程里并自带消息循环，不依赖调用方线程是否在处理消息。
+    """
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_HIDE = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    OBJID_WINDOW = 0
+    CHILDID_SELF = 0
+    GA_ROOT = 2
+    WM_QUIT = 0x0012
+
+    def __init__(self, process_name='', clock=time.monotonic):
+        super().__init__(process_name, clock)
+        self._thread = None
+        self._thread_id = None
+
+    def _subscribe(self, pids):
+        ready = threading.Event()
+        result = []
+        self._thread = threading.Thread(target=self._run, args=(pids, ready, result), daemon=True)
+        self._thread.start()
+        ready.wait(1.0)
+        return bool(result and result[0])
+
+    def _unsubscribe(self):
+        if self._thread_id is not None:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+        if self._thread is not None:
+            self._thread.join(1.0)
+        self._thread = None
+        self._thread_id = None
+
+    def _run(self, pids, ready, result):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+                                           wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        user32.GetAncestor.argtypes = [wintypes.HWND, wintypes.UINT]
+        user32.GetAncestor.restype = wintypes.HWND
+
+        def callback(hook, event, hwnd, id_object, id_child, event_thread, event_time):
+            # 只关心窗口自身的事件；标题来自的窗口由 update_title 过滤
+            if id_object != self.OBJID_WINDOW or id_child != self.CHILDID_SELF or not hwnd:
+                return
+            if event in (self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_HIDE):
+                self.window_closed(hwnd)
+                return
+            if event != self.EVENT_OBJECT_NAMECHANGE or hwnd != self.window:
+                return
+            if user32.GetAncestor(hwnd, self.GA_ROOT) != hwnd or not user32.IsWindowVisible(hwnd):
+                return
+            length = user32.GetWindowTextLengthW(hwnd)
+            buffer = ctypes.create_unicode_buffer(length + 1)
+            user32.GetWindowTextW(hwnd, buffer, length + 1)
+            if buffer.value:
+                self.update_title(buffer.value, hwnd)
+
+        proc = WinEventProc(callback)
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        hooks = []
+        for pid in pids:
+            for first, last in ((self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE),
+                                (self.EVENT_OBJECT_DESTROY, self.EVENT_OBJECT_HIDE)):
+                hooks.append(user32.SetWinEventHook(first, last, None, proc, pid, 0, self.WINEVENT_OUTOFCONTEXT))
+        result.append(any(hooks))
+        ready.set()
+        if any(hooks):
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            if hook:
+                user32.UnhookWinEvent(hook)
+
+
+def create_title_tracker(process_name, clock=time.monotonic):
+    """创建当前平台的推送式标题跟踪器，不支持时返回None"""
+    if sys.platform == 'win32':
+        return WinEventTitleTracker(process_name, clock)
+    return None
@@ -0,0 +1,641 @@
+"""PulseAudio / PipeWire 音频会话后端（Linux）
+
+与 Windows 后端相同的接口（audio_sessions.AudioSessionBackend）：每个 sink input（程序的播放流）
+是一个会话，进程号、进程名来自流的属性，峰值从对应 sink 的监听流（monitor）采样，
+流被暂停（corked）时视为不活动。PipeWire 通过 pipewire-pulse 提供同样的接口。
+会话事件来自服务器的订阅通知（sink input 新建 / 变化 / 移除），不需要轮询发现新会话。
+
+启用事件后，事件线程为每个播放中的流保持一个常驻的峰值监听流，采样在事件循环中到达并缓存，
+每次检测只读取缓存的峰值，不会阻塞调度线程；没有事件线程、或无法为流建立监听流（例如 pulsectl 缺少需要的内部接口）时
+才在检测时逐个流阻塞采样。
+
+服务器的访问都经过 PulseClient 接口：
+- PulsectlClient: 基于 pulsectl，第一次使用时才导入
+- FixturePulseClient: 回放录制的数据（sink input 快照和事件），不需要声卡和音频服务器
+
+录制数据：
+
+    python pulse_audio.py --record-fixture pulse_fixture.json --snapshots 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from app_log import get_logger
+from audio_sessions import (AudioSessionBackend, AudioSessionInfo, SessionEvent, SESSION_CREATED,
+                            SESSION_DISCONNECTED, SESSION_STATE_CHANGED, STATE_ACTIVE, STATE_INACTIVE)
+
+CLIENT_NAME = 'music-always-play'  # 在音频服务器中显示的客户端名称
+PEAK_SAMPLE_SECONDS = 0.02  # 没有常驻峰值监听流时，每个活动流的峰值采样时长（秒）
+PEAK_MONITOR_RATE = 25  # 常驻峰值监听流每秒的采样数（每个采样是这段时间内的峰值）
+EVENT_LISTEN_TIMEOUT = 0.5  # 事件线程检查是否需要停止的间隔（秒）
+
+# 服务器事件类型（pulsectl 的 PulseEventTypeEnum）
+EVENT_NEW = 'new'
+EVENT_CHANGE = 'change'
+EVENT_REMOVE = 'remove'
+_EVENT_KINDS = {EVENT_NEW: SESSION_CREATED, EVENT_CHANGE: SESSION_STATE_CHANGED, EVENT_REMOVE: SESSION_DISCONNECTED}
+
+# 常驻峰值监听流用到的 pulsectl 内部接口（pulsectl._pulsectl 的 ctypes 绑定和 Pulse._ctx），不属于公开接口，
+# 不同版本的 pulsectl 可能没有，缺少时改为检测时采样峰值
+_PEAK_MONITOR_CTYPES = ('PA_SAMPLE_SPEC', 'PA_BUFFER_ATTR', 'PA_STREAM_REQUEST_CB_T', 'PA_SAMPLE_FLOAT32NE',
+                        'PA_STREAM_DONT_MOVE', 'PA_STREAM_PEAK_DETECT', 'PA_STREAM_ADJUST_LATENCY',
+                        'PA_STREAM_DONT_INHIBIT_AUTO_SUSPEND', 'byref', 'cast', 'POINTER', 'c_void_p', 'c_int',
+                        'c_float', 'pa')
+_PEAK_MONITOR_FUNCTIONS = ('CallError', 'proplist_from_string', 'proplist_free', 'stream_new_with_proplist',
+                           'stream_peek', 'stream_drop', 'stream_set_monitor_stream', 'stream_set_read_callback',
+                           'stream_connect_record', 'stream_disconnect', 'stream_unref')
+
+
+def missing_peak_monitor_internals(c, pulse):
+    """常驻峰值监听流需要、但 pulsectl 中没有的内部接口名称（c 是 pulsectl._pulsectl，pulse 是 pulsectl.Pulse）"""
+    missing = [f'_pulsectl.{name}' for name in _PEAK_MONITOR_CTYPES if not hasattr(c, name)]
+    if hasattr(c, 'pa'):
+        missing += [f'_pulsectl.pa.{name}' for name in _PEAK_MONITOR_FUNCTIONS if not hasattr(c.pa, name)]
+    if getattr(pulse, '_ctx', None) is None:
+        missing.append('Pulse._ctx')
+    return missing
+
+
+def _pulsectl_version():
+    try:
+        from importlib.metadata import version
+        return version('pulsectl')
+    except Exception:
+        return '未知版本'
+
+
+class SinkInput:
+    """一个 sink input（程序的播放流）"""
+    __slots__ = ('index', 'pid', 'binary', 'app_name', 'media_name', 'corked', 'sink', 'peak')
+
+    def __init__(self, index, pid=0, binary='', app_name='', media_name='', corked=False, sink=0, peak=0.0):
+        self.index = index
+        self.pid = pid
+        self.binary = binary  # application.process.binary
+        self.app_name = app_name  # application.name
+        self.media_name = media_name  # media.name
+        self.corked = corked
+        self.sink = sink
+        self.peak = peak  # 只有录制数据里有，实时数据通过 PulseClient.peak() 采样
+
+    def __repr__(self):
+        return f"SinkInput({self.index}, {self.binary!r}, pid={self.pid}, corked={self.corked})"
+
+    def to_json(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+
+class PulseServerEvent:
+    """服务器的 sink input 事件"""
+    __slots__ = ('kind', 'index')
+
+    def __init__(self, kind, index):
+        self.kind = kind  # EVENT_NEW / EVENT_CHANGE / EVENT_REMOVE
+        self.index = index
+
+    def __repr__(self):
+        return f"PulseServerEvent({self.kind!r}, {self.index})"
+
+
+class StreamPeak:
+    """一个流的常驻峰值监听结果：add() 在事件线程中调用，take() 在检测时调用"""
+    __slots__ = ('sink', 'latest', 'highest')
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.latest = 0.0
+        self.highest = None  # 上次 take() 之后的最大采样
+
+    def add(self, peak):
+        self.latest = peak
+        if self.highest is None or peak > self.highest:
+            self.highest = peak
+
+    def take(self):
+        """上次读取后的最大峰值；这期间没有新采样时返回最近一个采样（两个线程之间偶尔丢失一个采样没有影响）"""
+        highest, self.highest = self.highest, None
+        return self.latest if highest is None else highest
+
+
+class PulseClient:
+    """音频服务器访问接口，每个实例只在一个线程中使用
+
+    supports_peak_monitor 为 True 的客户端可以为流建立常驻的峰值监听流（start_peak_monitor），
+    采样在 listen() 的事件循环中到达。
+    """
+    supports_peak_monitor = False
+
+    def sink_inputs(self):
+        """返回当前所有 SinkInput"""
+        raise NotImplementedError
+
+    def sink_input(self, index):
+        """返回一个 SinkInput，不存在时返回None"""
+        for sink_input in self.sink_inputs():
+            if sink_input.index == index:
+                return sink_input
+        return None
+
+    def peak(self, sink_input):
+        """采样一个流的峰值（0.0-1.0）"""
+        raise NotImplementedError
+
+    def volume(self, index):
+        """流的音量（0.0-1.0），流不存在时返回None"""
+        raise NotImplementedError
+
+    def set_volume(self, index, volume):
+        """设置流所有声道的音量，流不存在时返回False"""
+        raise NotImplementedError
+
+    def start_peak_monitor(self, sink_input, on_peak):
+        """为流建立常驻的峰值监听流，listen() 运行期间每收到一个采样调用 on_peak(峰值)
+
+        只在调用 listen() 的线程中使用：开始 listen() 之前，或在 listen() 的事件回调中。
+        """
+        raise NotImplementedError
+
+    def stop_peak_monitor(self, index):
+        """关闭流的常驻峰值监听流，没有时不做任何事"""
+
+    def listen(self, callback, stop):
+        """阻塞监听 sink input 事件，对每个事件调用 callback(PulseServerEvent)，直到 stop 被设置"""
+        raise NotImplementedError
+
+    def interrupt(self):
+        """让正在进行的 listen() 尽快返回（可以在其他线程调用）"""
+
+    def close(self):
+        pass
+
+
+class PulsectlClient(PulseClient):
+    """基于 pulsectl 的客户端
+
+    常驻峰值监听流与 pulsectl 的 get_peak_sample 相同（PEAK_DETECT 的录音流，只监听一个 sink input），
+    只是一直保持连接，采样在 event_listen() 的事件循环中到达。它直接使用 pulsectl 的内部接口，
+    连接时检查这些接口是否存在，缺少时 supports_peak_monitor 为 False，后端改为检测时采样峰值。
+    """
+    supports_peak_monitor = True
+
+    def __init__(self, name=CLIENT_NAME):
+        import pulsectl
+        try:
+            from pulsectl import _pulsectl
+        except ImportError:
+            _pulsectl = None
+        self._pulsectl = pulsectl
+        self._c = _pulsectl
+        try:
+            self._pulse = pulsectl.Pulse(name)
+        except pulsectl.PulseError as e:
+            raise OSError(f"无法连接音频服务器: {e}") from None
+        missing = missing_peak_monitor_internals(_pulsectl, self._pulse) if _pulsectl is not None else ['_pulsectl']
+        if missing:
+            self.supports_peak_monitor = False
+            get_logger().warning("pulsectl %s 缺少常驻峰值监听需要的内部接口（%s），改为检测时采样峰值",
+                                 _pulsectl_version(), ', '.join(missing))
+        self._monitors = {}  # sink 编号 -> 监听流（monitor source）名称
+        self._peak_streams = {}  # sink input 编号 -> (录音流, 读取回调)，回调对象必须一直保留
+
+    def _convert(self, info):
+        props = info.proplist
+        try:
+            pid = int(props.get('application.process.id', 0))
+        except ValueError:
+            pid = 0
+        return SinkInput(info.index, pid, props.get('application.process.binary', ''),
+                         props.get('application.name', ''), props.get('media.name', ''),
+                         bool(info.corked), info.sink)
+
+    def sink_inputs(self):
+        return [self._convert(info) for info in self._pulse.sink_input_list()]
+
+    def sink_input(self, index):
+        try:
+            return self._convert(self._pulse.sink_input_info(index))
+        except self._pulsectl.PulseIndexError:
+            return None
+
+    def _monitor_source(self, sink):
+        source = self._monitors.get(sink)
+        if source is None:
+            source = self._monitors[sink] = self._pulse.sink_info(sink).monitor_source_name
+        return source
+
+    def peak(self, sink_input):
+        # 在 sink 的监听流上只采样这个 sink input 的声音
+        return self._pulse.get_peak_sample(self._monitor_source(sink_input.sink), PEAK_SAMPLE_SECONDS,
+                                           stream_idx=sink_input.index)
+
+    def start_peak_monitor(self, sink_input, on_peak):
+        if not self.supports_peak_monitor:
+            raise OSError(f"pulsectl {_pulsectl_version()} 不支持常驻峰值监听流")
+        c = self._c
+        self.stop_peak_monitor(sink_input.index)
+        source = self._monitor_source(sink_input.sink).encode('utf-8')
+        # 与 pavucontrol 相同的标识，不会出现在混音器的录音流列表里
+        proplist = c.pa.proplist_from_string('application.id=org.PulseAudio.pavucontrol')
+        spec = c.PA_SAMPLE_SPEC(format=c.PA_SAMPLE_FLOAT32NE, rate=PEAK_MONITOR_RATE, channels=1)
+        stream = c.pa.stream_new_with_proplist(self._pulse._ctx, 'peak detect', c.byref(spec), None, proplist)
+        c.pa.proplist_free(proplist)
+
+        @c.PA_STREAM_REQUEST_CB_T
+        def on_read(s, nbytes, userdata):
+            buffer, size = c.c_void_p(), c.c_int(nbytes)
+            c.pa.stream_peek(s, buffer, c.byref(size))
+            try:
+                if buffer and size.value >= 4:
+                    samples = c.cast(buffer, c.POINTER(c.c_float))
+                    on_peak(min(1.0, max(samples[i] for i in range(size.value // 4))))
+            except Exception as e:
+                get_logger().warning("处理峰值采样时出错: %s", e)
+            finally:
+                # 缓冲区为空时不能调用 stream_drop
+                if size.value:
+                    c.pa.stream_drop(s)
+
+        c.pa.stream_set_monitor_stream(stream, sink_input.index)
+        c.pa.stream_set_read_callback(stream, on_read, None)
+        try:
+            c.pa.stream_connect_record(stream, source, c.PA_BUFFER_ATTR(fragsize=4, maxlength=2 ** 32 - 1),
+                                       c.PA_STREAM_DONT_MOVE | c.PA_STREAM_PEAK_DETECT | c.PA_STREAM_ADJUST_LATENCY
+                                       | c.PA_STREAM_DONT_INHIBIT_AUTO_SUSPEND)
+        except c.pa.CallError as e:
+            c.pa.stream_unref(stream)
+            raise OSError(f"无法监听流 {sink_input.index} 的峰值: {e}") from None
+        self._peak_streams[sink_input.index] = (stream, on_read)
+
+    def stop_peak_monitor(self, index):
+        entry = self._peak_streams.pop(index, None)
+        if entry is None:
+            return
+        c = self._c
+        try:
+            c.pa.stream_disconnect(entry[0])
+        except c.pa.CallError:
+            pass  # 流已经被服务器移除
+        c.pa.stream_unref(entry[0])
+
+    def volume(self, index):
+        try:
+            return self._pulse.sink_input_info(index).volume.value_flat
+        except self._pulsectl.PulseIndexError:
+            return None
+
+    def set_volume(self, index, volume):
+        try:
+            self._pulse.volume_set_all_chans(self._pulse.sink_input_info(index), volume)
+        except self._pulsectl.PulseIndexError:
+            return False
+        return True
+
+    def listen(self, callback, stop):
+        received = []
+
+        def on_event(event):
+            # 回调里不能调用服务器接口，先收集起来，event_listen 返回后再处理
+            if event.facility != 'sink_input':
+                return
+            for kind in _EVENT_KINDS:
+                if event.t == kind:
+                    received.append(PulseServerEvent(kind, event.index))
+
+        self._pulse.event_mask_set('sink_input')
+        self._pulse.event_callback_set(on_event)
+        try:
+            while not stop.is_set():
+                self._pulse.event_listen(timeout=EVENT_LISTEN_TIMEOUT)
+                events, received[:] = list(received), []
+                for event in events:
+                    callback(event)
+        finally:
+            self._pulse.event_callback_set(None)
+            self._pulse.event_mask_set('null')
+
+    def interrupt(self):
+        self._pulse.event_listen_stop()
+
+    def close(self):
+        for index in list(self._peak_streams):
+            self.stop_peak_monitor(index)
+        self._pulse.close()
+
+
+class FixturePulseClient(PulseClient):
+    """按录制时的时间回放录制的数据
+
+    数据格式：{"interval": 0.5, "snapshots": [[SinkInput 的字段, ...], ...], "events": [{"kind": "new", "index": 5, "at": 1.2}, ...]}
+    第 k 个快照从第一次使用后的 k * interval 秒开始有效，最后一个快照一直有效；
+    listen() 在每个事件的 at 秒发出事件，并把当前快照中的峰值送给常驻峰值监听流，直到停止。
+    clock 可以换成虚拟时钟。同一个实例可以同时作为后端的快照客户端和事件客户端（client_factory=lambda: fixture）。
+    """
+    supports_peak_monitor = True
+
+    def __init__(self, snapshots, events=(), interval=0.5, clock=time.monotonic):
+        self.snapshots = [[SinkInput.from_json(item) if isinstance(item, dict) else item for item in snapshot]
+                          for snapshot in snapshots] or [[]]
+        self.events = sorted(((event.get('at', 0.0), PulseServerEvent(event['kind'], event['index']))
+                              for event in events), key=lambda item: item[0])
+        self.interval = interval
+        self.clock = clock
+        self.started = None
+        self.peak_reads = 0
+        self.volumes = {}  # sink input 编号 -> 音量
+        self.peak_monitors = {}  # sink input 编号 -> on_peak
+
+    @classmethod
+    def load(cls, path, clock=time.monotonic):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('snapshots', []), data.get('events', []), data.get('interval', 0.5), clock)
+
+    def elapsed(self):
+        if self.started is None:
+            self.started = self.clock()
+        return self.clock() - self.started
+
+    def current(self):
+        index = int(self.elapsed() / self.interval) if self.interval > 0 else 0
+        return self.snapshots[min(index, len(self.snapshots) - 1)]
+
+    def sink_inputs(self):
+        return list(self.current())
+
+    def sink_input(self, index):
+        for sink_input in self.current():
+            if sink_input.index == index:
+                return sink_input
+        return None
+
+    def peak(self, sink_input):
+        self.peak_reads += 1
+        return sink_input.peak
+
+    def volume(self, index):
+        if self.sink_input(index) is None:
+            return None
+        return self.volumes.get(index, 1.0)
+
+    def set_volume(self, index, volume):
+        if self.sink_input(index) is None:
+            return False
+        self.volumes[index] = volume
+        return True
+
+    def start_peak_monitor(self, sink_input, on_peak):
+        self.peak_monitors[sink_input.index] = on_peak
+
+    def stop_peak_monitor(self, index):
+        self.peak_monitors.pop(index, None)
+
+    def feed_peaks(self):
+        """把当前快照中的峰值送给常驻峰值监听流"""
+        for sink_input in self.current():
+            on_peak = self.peak_monitors.get(sink_input.index)
+            if on_peak is not None:
+                on_peak(sink_input.peak)
+
+    def listen(self, callback, stop):
+        pending = list(self.events)
+        while not stop.is_set():
+            self.feed_peaks()
+            while pending and self.elapsed() >= pending[0][0]:
+                callback(pending.pop(0)[1])
+            stop.wait(1 / PEAK_MONITOR_RATE)
+
+
+def _exe_path(pid, cache):
+    """进程的可执行文件路径（/proc/pid/exe），无法读取时为空字符串"""
+    if not pid:
+        return ''
+    path = cache.get(pid)
+    if path is None:
+        try:
+            path = os.readlink(f'/proc/{pid}/exe')
+        except OSError:
+            path = ''
+        cache[pid] = path
+    return path
+
+
+class PulseAudioSessionBackend(AudioSessionBackend):
+    """PulseAudio / PipeWire 音频会话后端
+
+    client_factory() 创建 PulseClient：快照和事件监听分别使用一个客户端（各自只在一个线程中使用）。
+    常驻峰值监听流属于事件客户端，只在事件线程中建立和关闭。
+    创建后端时就连接服务器，没有安装 pulsectl 时抛出 ImportError，连不上服务器时抛出 OSError。
+    """
+    name = 'pulse'
+    supports_volume = True
+
+    def __init__(self, client_factory=PulsectlClient):
+        super().__init__()
+        self.client_factory = client_factory
+        self.client = client_factory()
+        self._event_client = None
+        self._event_thread = None
+        self._stop = threading.Event()
+        self._known = {}  # sink input 编号 -> (pid, 进程名)，用于移除事件
+        self._peaks = {}  # sink input 编号 -> StreamPeak，由事件线程的常驻峰值监听流更新
+        self._sampled = {}  # sink input 编号 -> sink，无法建立常驻峰值监听流、检测时采样峰值的流
+        self._peak_monitoring = False
+        self._exe_paths = {}  # pid -> 可执行文件路径
+        self._lock = threading.Lock()
+
+    def _session(self, sink_input, peak=0.0):
+        name = (sink_input.binary or '').lower()
+        display_name = sink_input.app_name or sink_input.media_name
+        return AudioSessionInfo(sink_input.pid, name, STATE_INACTIVE if sink_input.corked else STATE_ACTIVE, peak,
+                                _exe_path(sink_input.pid, self._exe_paths), display_name, f"sink{sink_input.sink}")
+
+    def get_sessions(self):
+        client = self.client
+        monitoring = self._peak_monitoring
+        peaks = self._peaks
+        sampled = self._sampled
+        result = []
+        known = {}
+        for sink_input in client.sink_inputs():
+            known[sink_input.index] = (sink_input.pid, (sink_input.binary or '').lower())
+            if sink_input.corked:
+                peak = 0.0  # 暂停的流没有声音，不需要采样
+            elif monitoring and sink_input.index not in sampled:
+                # 事件线程还没有为新的流建立监听流时先按无声处理，新流的事件会再安排一次检测
+                stream_peak = peaks.get(sink_input.index)
+                peak = stream_peak.take() if stream_peak is not None else 0.0
+            else:
+                peak = client.peak(sink_input)
+            result.append(self._session(sink_input, peak))
+        with self._lock:
+            self._known = known
+        if len(self._exe_paths) > 2 * len(result) + 64:
+            # 丢弃已经退出的进程
+            self._exe_paths = {session.pid: session.exe_path for session in result}
+        return result
+
+    def _process_streams(self, process_name):
+        """最近一次快照中这个进程的 sink input 编号"""
+        with self._lock:
+            return [index for index, (_, name) in self._known.items() if name == process_name]
+
+    def get_process_volume(self, process_name):
+        for index in self._process_streams(process_name):
+            volume = self.client.volume(index)
+            if volume is not None:
+                return volume
+        return None
+
+    def set_process_volume(self, process_name, volume):
+        volume = min(max(volume, 0.0), 1.0)
+        return sum(1 for index in self._process_streams(process_name) if self.client.set_volume(index, volume))
+
+    def start_events(self):
+        if self._event_thread is not None:
+            return self.events_active
+        try:
+            self._event_client = self.client_factory()
+        except Exception as e:
+            get_logger().warning("无法订阅音频服务器事件: %s", e)
+            return False
+        self._stop.clear()
+        self._event_thread = threading.Thread(target=self._listen, name="音频服务器事件", daemon=True)
+        self._event_thread.start()
+        self.events_active = True
+        return True
+
+    def stop_events(self):
+        self.events_active = False
+        if self._event_thread is None:
+            return
+        self._stop.set()
+        self._event_client.interrupt()
+        self._event_thread.join(EVENT_LISTEN_TIMEOUT * 4)
+        self._event_thread = None
+
+    def _listen(self):
+        client = self._event_client
+        try:
+            if client.supports_peak_monitor:
+                for sink_input in client.sink_inputs():
+                    self._update_peak_monitor(client, sink_input)
+                self._peak_monitoring = True
+            client.listen(self._on_server_event, self._stop)
+        except Exception as e:
+            get_logger().error("音频服务器事件监听出错: %s", e)
+            self.events_active = False
+        finally:
+            self._peak_monitoring = False
+            self._peaks = {}
+            self._sampled = {}
+            client.close()
+
+    def _update_peak_monitor(self, client, sink_input):
+        """按流的状态建立、重建或关闭常驻峰值监听流（在事件线程中执行）"""
+        if not client.supports_peak_monitor:
+            return
+        index = sink_input.index
+        current = self._peaks.get(index)
+        if sink_input.corked:
+            self._drop_peak_monitor(client, index)
+            return
+        if (current is not None and current.sink == sink_input.sink) or self._sampled.get(index) == sink_input.sink:
+            return
+        # 新的流或流换了 sink（监听流不会跟着移动）
+        stream_peak = StreamPeak(sink_input.sink)
+        try:
+            client.start_peak_monitor(sink_input, stream_peak.add)
+        except OSError as e:
+            get_logger().warning("%s，流 %s 改为检测时采样峰值", e, index)
+            self._peaks = {key: value for key, value in self._peaks.items() if key != index}
+            self._sampled = {**self._sampled, index: sink_input.sink}
+            return
+        # 替换整个字典而不是原地修改，检测线程正在进行的遍历不受影响
+        self._peaks = {**self._peaks, index: stream_peak}
+        self._sampled = {key: value for key, value in self._sampled.items() if key != index}
+
+    def _drop_peak_monitor(self, client, index):
+        if index in self._peaks:
+            client.stop_peak_monitor(index)
+            self._peaks = {key: value for key, value in self._peaks.items() if key != index}
+        if index in self._sampled:
+            self._sampled = {key: value for key, value in self._sampled.items() if key != index}
+
+    def _on_server_event(self, event):
+        """在事件线程中把服务器事件转换为会话事件"""
+        kind = _EVENT_KINDS.get(event.kind)
+        if kind is None:
+            return
+        if kind == SESSION_DISCONNECTED:
+            with self._lock:
+                pid, name = self._known.pop(event.index, (0, ''))
+            self._drop_peak_monitor(self._event_client, event.index)
+            self._emit(SessionEvent(kind, pid, name))
+            return
+        sink_input = self._event_client.sink_input(event.index)
+        if sink_input is None:
+            return
+        self._update_peak_monitor(self._event_client, sink_input)
+        name = (sink_input.binary or '').lower()
+        with self._lock:
+            self._known[event.index] = (sink_input.pid, name)
+        self._emit(SessionEvent(kind, sink_input.pid, name, STATE_INACTIVE if sink_input.corked else STATE_ACTIVE))
+
+
+def record_fixture(path, snapshots, interval, events_seconds=0.0):
+    """从当前的音频服务器录制数据，供 FixturePulseClient 回放"""
+    client = PulsectlClient(CLIENT_NAME + '-recorder')
+    data = {'interval': interval, 'snapshots': [], 'events': []}
+    started = time.monotonic()
+    try:
+        for i in range(snapshots):
+            snapshot = client.sink_inputs()
+            for sink_input in snapshot:
+                sink_input.peak = 0.0 if sink_input.corked else client.peak(sink_input)
+            data['snapshots'].append([sink_input.to_json() for sink_input in snapshot])
+            if i < snapshots - 1:
+                time.sleep(interval)
+        if events_seconds > 0:
+            stop = threading.Event()
+            timer = threading.Timer(events_seconds, lambda: (stop.set(), client.interrupt()))
+            timer.start()
+            client.listen(lambda event: data['events'].append(
+                {'kind': event.kind, 'index': event.index, 'at': round(time.monotonic() - started, 3)}), stop)
+    finally:
+        client.close()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看 PulseAudio / PipeWire 的音频会话或录制测试数据")
+    parser.add_argument('--record-fixture', metavar='文件', help="录制 sink input 快照和事件")
+    parser.add_argument('--snapshots', type=int, default=10, help="录制的快照数量")
+    parser.add_argument('--interval', type=float, default=0.5, help="快照间隔（秒）")
+    parser.add_argument('--events-seconds', type=float, default=0.0, help="录制服务器事件的时长（秒）")
+    args = parser.parse_args(argv)
+    try:
+        if args.record_fixture:
+            data = record_fixture(args.record_fixture, args.snapshots, args.interval, args.events_seconds)
+            print(f"已录制 {len(data['snapshots'])} 个快照、{len(data['events'])} 个事件: {args.record_fixture}")
+            return 0
+        for session in PulseAudioSessionBackend().get_sessions():
+            print(f"{session.pid:>8} {session.process_name:<24} state={session.state} peak={session.peak:.4f} "
+                  f"{session.display_name}")
+    except ImportError as e:
+        print(f"需要安装 pulsectl: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""其他程序音频会话的处理规则
+
+默认情况下，音乐播放器以外的任何会话峰值超过阈值都会打断音乐。规则可以按
+进程名、进程名通配符、可执行文件路径或会话显示名称匹配，并指定动作：
+- ignore: 忽略这个程序的声音（通知音、后台程序等）
+- interrupt: 按默认阈值打断音乐
+- threshold: 只有峰值超过这个程序自己的阈值时才打断
+
+规则只编译一次：精确匹配放进哈希表，通配符合并成一个正则表达式，
+匹配结果按 (进程名, 路径, 显示名称) 缓存，每次检测对每个会话只需一次字典查找。
+优先级：精确进程名 > 精确路径 > 精确显示名称 > 进程名通配符 > 路径通配符 > 显示名称通配符，
+同一类中先写的规则优先。
+"""
+import fnmatch
+import re
+
+# 动作
+ACTION_IGNORE = 'ignore'
+ACTION_INTERRUPT = 'interrupt'
+ACTION_THRESHOLD = 'threshold'
+RULE_ACTIONS = (ACTION_IGNORE, ACTION_INTERRUPT, ACTION_THRESHOLD)
+
+# 匹配方式
+MATCH_PROCESS = 'process'  # 进程名（不区分大小写）
+MATCH_GLOB = 'glob'  # 进程名通配符，例如 *helper*.exe
+MATCH_PATH = 'path'  # 可执行文件完整路径，可以包含通配符
+MATCH_DISPLAY = 'display'  # 会话显示名称，可以包含通配符
+RULE_MATCHES = (MATCH_PROCESS, MATCH_GLOB, MATCH_PATH, MATCH_DISPLAY)
+
+MATCH_CACHE_SIZE = 1024  # 匹配结果缓存的上限，超过后清空重新缓存
+
+
+class SessionRule:
+    """一条规则"""
+    __slots__ = ('match', 'pattern', 'action', 'threshold')
+
+    def __init__(self, match, pattern, action, threshold=None):
+        if match not in RULE_MATCHES:
+            raise ValueError(f"未知的匹配方式: {match}")
+        if action not in RULE_ACTIONS:
+            raise ValueError(f"未知的动作: {action}")
+        if action == ACTION_THRESHOLD and threshold is None:
+            raise ValueError(f"规则 {pattern} 缺少阈值")
+        if threshold is not None and not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"规则 {pattern} 的阈值应在 0 到 1 之间: {threshold}")
+        if not pattern.strip():
+            raise ValueError(f"规则缺少匹配的模式: {action}:{match}")
+        self.match = match
+        self.pattern = pattern.strip()
+        self.action = action
+        self.threshold = threshold
+
+    def __repr__(self):
+        threshold = f", {self.threshold}" if self.threshold is not None else ''
+        return f"SessionRule({self.match!r}, {self.pattern!r}, {self.action!r}{threshold})"
+
+    def to_text(self):
+        """与 parse_rule() 对应的文本形式"""
+        text = f"{self.action}:{self.match}:{self.pattern}"
+        return f"{text}:{self.threshold}" if self.threshold is not None else text
+
+
+def parse_rule(text):
+    """解析 "动作:匹配方式:模式[:阈值]"，例如 ignore:glob:*chime* 或 threshold:process:discord.exe:0.2
+
+    路径中可能包含冒号，所以阈值只在最后一段是数字时才会被识别。
+    """
+    action, sep1, rest = text.strip().partition(':')
+    match, sep2, pattern = rest.partition(':')
+    if not sep1 or not sep2 or not pattern:
+        raise ValueError(f"无效的规则: {text}，格式为 动作:匹配方式:模式[:阈值]")
+    threshold = None
+    if action == ACTION_THRESHOLD:
+        pattern, _, value = pattern.rpartition(':')
+        try:
+            threshold = float(value)
+        except ValueError:
+            raise ValueError(f"无效的阈值: {text}") from None
+        if not pattern:
+            raise ValueError(f"无效的规则: {text}，格式为 threshold:匹配方式:模式:阈值")
+    return SessionRule(match, pattern, action, threshold)
+
+
+def _has_wildcard(pattern):
+    return any(c in pattern for c in '*?[')
+
+
+class CompiledRules:
+    """编译后的规则索引
+
+    match(session) 返回匹配的 SessionRule，没有匹配时返回None（按默认方式处理）。
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self._exact = {MATCH_PROCESS: {}, MATCH_PATH: {}, MATCH_DISPLAY: {}}
+        globs = {MATCH_PROCESS: [], MATCH_PATH: [], MATCH_DISPLAY: []}
+        for rule in self.rules:
+            kind = MATCH_PROCESS if rule.match == MATCH_GLOB else rule.match
+            pattern = rule.pattern.lower()
+            if rule.match != MATCH_GLOB and not _has_wildcard(pattern):
+                self._exact[kind].setdefault(pattern, rule)
+            else:
+                globs[kind].append((pattern, rule))
+        # 每类通配符合并成一个正则表达式，用分组名找到匹配的规则
+        self._globs = {}
+        for kind, items in globs.items():
+            if not items:
+                continue
+            groups = '|'.join(f"(?P<r{i}>{fnmatch.translate(pattern)})" for i, (pattern, rule) in enumerate(items))
+            self._globs[kind] = (re.compile(groups), [rule for pattern, rule in items])
+        self._cache = {}
+        self.cache_hits = 0
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, session):
+        key = (session.process_name, session.exe_path, session.display_name)
+        try:
+            rule = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self.cache_hits += 1
+            return rule
+        rule = self._lookup(session.process_name, (session.exe_path or '').lower(),
+                            (session.display_name or '').lower())
+        if len(self._cache) >= MATCH_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = rule
+        return rule
+
+    def _lookup(self, process_name, exe_path, display_name):
+        values = ((MATCH_PROCESS, process_name), (MATCH_PATH, exe_path), (MATCH_DISPLAY, display_name))
+        for kind, value in values:
+            if value:
+                rule = self._exact[kind].get(value)
+                if rule is not None:
+                    return rule
+        for kind, value in values:
+            compiled = self._globs.get(kind)
+            if compiled is not None and value:
+                m = compiled[0].match(value)
+                if m is not None:
+                    return compiled[1][int(m.lastgroup[1:])]
+        return None
+
+
+def compile_rules(rules):
+    """规则（SessionRule 或 "动作:匹配方式:模式[:阈值]" 文本）编译为 CompiledRules"""
+    return CompiledRules(rule if isinstance(rule, SessionRule) else parse_rule(rule) for rule in rules)
@@ -0,0 +1,222 @@
+"""启动耗时测试
+
+在全新的解释器里逐个导入程序的模块，用 python -X importtime 统计每个模块的导入耗时（含其依赖），
+并检查导入后是否提前加载了较重的依赖；然后启动图形界面，统计从开始运行到首帧绘制完成的耗时，
+以及关闭窗口进入托盘模式后的常驻内存。
+任何一项超过预算时以非零状态退出，可以放在打包前或持续集成里运行：
+
+    python startup_bench.py
+    python startup_bench.py --repeat 5 --budget monitor_engine=30 --paint-budget-ms 800
+    python startup_bench.py --qt-platform offscreen   # 没有显示器的环境
+    python startup_bench.py --skip-paint --tray-budget-mb 80
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GUI_MODULE = "音乐一直放！"
+GUI_SCRIPT = os.path.join(HERE, GUI_MODULE + ".py")
+STARTUP_PROBE_ENV = "MUSIC_ALWAYS_PLAY_STARTUP_PROBE"  # 与 音乐一直放！.py 中的同名配置一致
+TRAY_PROBE_ENV = "MUSIC_ALWAYS_PLAY_TRAY_PROBE"  # 与 音乐一直放！.py 中的同名配置一致
+
+# 被测模块及默认的导入耗时预算（毫秒，含该模块导入的所有依赖）
+IMPORT_BUDGETS_MS = {
+    'app_log': 80,
+    'audio_sessions': 40,
+    'metrics': 40,
+    'peak_history': 40,
+    'player_tracking': 40,
+    'task_scheduler': 40,
+    'monitor_engine': 120,
+    'headless': 150,
+    GUI_MODULE: 400,
+}
+FIRST_PAINT_BUDGET_MS = 1500  # 启动到首帧绘制的默认预算（毫秒）
+TRAY_RSS_BUDGET_MB = 120  # 托盘模式常驻内存的默认预算（MB）
+PROBE_TIMEOUT_SECONDS = 30
+
+# 只应在开始监控或第一次控制时才导入的依赖
+HEAVY_MODULES = ('pyautogui', 'pycaw', 'comtypes', 'psutil', 'win32gui', 'win32process', 'win32api', 'pulsectl',
+                 'jeepney')
+# 只有图形界面模块可以导入的依赖
+GUI_ONLY_MODULES = ('PyQt6',)
+
+
+class BenchResult:
+    """一项测量；samples_ms / budget_ms 的单位是 unit（内存测量为 MB）"""
+    __slots__ = ('name', 'kind', 'samples_ms', 'budget_ms', 'early_imports', 'error', 'unit', 'note')
+
+    def __init__(self, name, kind, budget_ms, unit='ms'):
+        self.name = name
+        self.kind = kind
+        self.budget_ms = budget_ms
+        self.samples_ms = []
+        self.early_imports = []
+        self.error = None
+        self.unit = unit
+        self.note = ''
+
+    @property
+    def median_ms(self):
+        return statistics.median(self.samples_ms) if self.samples_ms else None
+
+    @property
+    def passed(self):
+        if self.error or self.early_imports:
+            return False
+        return self.median_ms is not None and self.median_ms <= self.budget_ms
+
+
+def child_env(**extra):
+    env = dict(os.environ)
+    env['PYTHONIOENCODING'] = 'utf-8'
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    env.update(extra)
+    return env
+
+
+def parse_importtime(stderr, module):
+    """从 -X importtime 的输出里取出 module 的累计导入耗时（毫秒），找不到时返回None"""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or parts[2].strip() != module:
+            continue
+        try:
+            return int(parts[1]) / 1000
+        except ValueError:
+            return None
+    return None
+
+
+def measure_import(module, budget_ms, repeat):
+    """在新的解释器里导入 module，返回 BenchResult"""
+    result = BenchResult(module, 'import', budget_ms)
+    forbidden = HEAVY_MODULES if module == GUI_MODULE else HEAVY_MODULES + GUI_ONLY_MODULES
+    # 用 __import__ 而不是 importlib.import_module，后者不经过 -X importtime 的统计
+    code = ("import sys\n"
+            f"__import__({module!r})\n"
+            f"print(','.join(name for name in {forbidden!r} if name in sys.modules))\n")
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=HERE, env=child_env(),
+                              capture_output=True, text=True, encoding='utf-8', errors='replace')
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            result.error = lines[-1] if lines else f"退出码 {proc.returncode}"
+            return result
+        elapsed = parse_importtime(proc.stderr, module)
+        if elapsed is None:
+            result.error = "没有找到导入耗时"
+            return result
+        result.samples_ms.append(elapsed)
+        result.early_imports = [name for name in proc.stdout.strip().split(',') if name]
+    return result
+
+
+def measure_first_paint(budget_ms, repeat, qt_platform=None):
+    """启动图形界面，返回从开始运行到首帧绘制完成的耗时 BenchResult"""
+    result = BenchResult(GUI_MODULE, 'first_paint', budget_ms)
+    extra = {STARTUP_PROBE_ENV: '1'}
+    if qt_platform:
+        extra['QT_QPA_PLATFORM'] = qt_platform
+    for _ in range(repeat):
+        try:
+            proc = subprocess.run([sys.executable, GUI_SCRIPT], cwd=HERE, env=child_env(**extra),
+                                  capture_output=True, text=True, encoding='utf-8', errors='replace',
+                                  timeout=PROBE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            result.error = f"{PROBE_TIMEOUT_SECONDS} 秒内没有完成首帧绘制"
+            return result
+        elapsed = None
+        for line in proc.stdout.splitlines():
+            if line.startswith('first_paint_ms='):
+                elapsed = float(line.split('=', 1)[1])
+        if elapsed is None:
+            lines = proc.stderr.strip().splitlines()
+            result.error = lines[-1] if lines else f"没有输出首帧耗时（退出码 {proc.returncode}）"
+            return result
+        result.samples_ms.append(elapsed)
+    return result
+
+
+def measure_tray_memory(budget_mb, repeat, qt_platform=None):
+    """启动图形界面后立即关闭窗口进入托盘模式，返回托盘模式常驻内存（MB）的 BenchResult"""
+    result = BenchResult(GUI_MODULE, 'tray_rss', budget_mb, unit='MB')
+    extra = {TRAY_PROBE_ENV: '1'}
+    if qt_platform:
+        extra['QT_QPA_PLATFORM'] = qt_platform
+    window_samples = []
+    for _ in range(repeat):
+        try:
+            proc = subprocess.run([sys.executable, GUI_SCRIPT], cwd=HERE, env=child_env(**extra),
+                                  capture_output=True, text=True, encoding='utf-8', errors='replace',
+                                  timeout=PROBE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            result.error = f"{PROBE_TIMEOUT_SECONDS} 秒内没有进入托盘模式"
+            return result
+        values = {}
+        for line in proc.stdout.splitlines():
+            if line.startswith('window_rss_mb='):
+                values = dict(part.split('=', 1) for part in line.split())
+        if not values or not float(values['tray_rss_mb']):
+            lines = proc.stderr.strip().splitlines()
+            result.error = lines[-1] if lines else f"没有输出内存占用（退出码 {proc.returncode}）"
+            return result
+        result.samples_ms.append(float(values['tray_rss_mb']))
+        window_samples.append(float(values['window_rss_mb']))
+    result.note = f"窗口打开时 {statistics.median(window_samples):.1f} MB"
+    return result
+
+
+def parse_budgets(values):
+    budgets = dict(IMPORT_BUDGETS_MS)
+    for value in values or ():
+        name, sep, ms = value.partition('=')
+        if not sep or name not in budgets:
+            raise SystemExit(f"无效的预算 {value!r}，格式为 模块名=毫秒，可选模块: {', '.join(budgets)}")
+        budgets[name] = float(ms)
+    return budgets
+
+
+def print_report(results):
+    print(f"{'模块':<20}{'项目':<14}{'中位数':>12}{'预算':>10}  结果")
+    for result in results:
+        median = f"{result.median_ms:.1f}{result.unit}" if result.median_ms is not None else '-'
+        status = '通过' if result.passed else '超出预算'
+        if result.error:
+            status = f"失败: {result.error}"
+        elif result.early_imports:
+            status = f"失败: 提前导入了 {', '.join(result.early_imports)}"
+        elif result.note:
+            status = f"{status}（{result.note}）"
+        print(f"{result.name:<20}{result.kind:<14}{median:>12}{result.budget_ms:>8.0f}{result.unit}  "
+              f"{status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="统计各模块的导入耗时和界面首帧耗时")
+    parser.add_argument('--repeat', type=int, default=3, help="每项测量的次数，取中位数")
+    parser.add_argument('--budget', action='append', metavar='模块=毫秒', help="修改某个模块的导入耗时预算，可重复")
+    parser.add_argument('--paint-budget-ms', type=float, default=FIRST_PAINT_BUDGET_MS, help="首帧绘制耗时预算")
+    parser.add_argument('--skip-paint', action='store_true', help="不测量界面首帧耗时")
+    parser.add_argument('--tray-budget-mb', type=float, default=TRAY_RSS_BUDGET_MB, help="托盘模式常驻内存预算（MB）")
+    parser.add_argument('--skip-tray', action='store_true', help="不测量托盘模式的内存占用")
+    parser.add_argument('--qt-platform', help="设置 QT_QPA_PLATFORM，例如 offscreen")
+    args = parser.parse_args(argv)
+
+    budgets = parse_budgets(args.budget)
+    results = [measure_import(module, budget, args.repeat) for module, budget in budgets.items()]
+    if not args.skip_paint:
+        results.append(measure_first_paint(args.paint_budget_ms, args.repeat, args.qt_platform))
+    if not args.skip_tray:
+        results.append(measure_tray_memory(args.tray_budget_mb, args.repeat, args.qt_platform))
+    print_report(results)
+    return 0 if all(result.passed for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
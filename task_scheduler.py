@@ -0,0 +1,185 @@
+"""单线程定时任务调度器
+
+检测和控制逻辑都在调度器自己的线程里按顺序执行，延迟通过定时任务表达，
+不再用 time.sleep 阻塞界面线程。
+"""
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+
+class ScheduledTask:
+    """一个已安排的任务，可以通过 TaskScheduler.cancel() 取消"""
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class TaskScheduler:
+    """在单独线程中按时间顺序执行任务
+
+    thread_init / thread_cleanup 在线程开始和结束时调用（例如初始化 COM）。
+    任务抛出的异常交给 error_handler 处理，不会终止线程。
+    clock 是调度器使用的时钟，回放记录时可以换成虚拟时钟。
+    """
+
+    def __init__(self, name='scheduler', thread_init=None, thread_cleanup=None, error_handler=None,
+                 clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.thread_init = thread_init
+        self.thread_cleanup = thread_cleanup
+        self.error_handler = error_handler
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def time(self):
+        """调度器使用的单调时钟（秒）"""
+        return self.clock()
+
+    def start(self):
+        """启动调度线程，已经启动时不做任何事"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """停止调度线程
+
+        已经到期的任务会先执行完，还没到时间的任务被丢弃。
+        在调度线程内部调用时只做标记，当前任务结束后线程退出。
+        """
+        if not self._running:
+            return
+        if self.in_scheduler_thread():
+            self._request_stop()
+            return
+        self.call_soon(self._request_stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _request_stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    @property
+    def running(self):
+        return self._running
+
+    def in_scheduler_thread(self):
+        return self._thread is threading.current_thread()
+
+    def call_soon(self, callback, *args):
+        return self.call_at(self.time(), callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.time() + max(0.0, delay), callback, *args)
+
+    def call_at(self, when, callback, *args):
+        task = ScheduledTask(when, callback, args)
+        with self._condition:
+            heapq.heappush(self._queue, (when, next(self._counter), task))
+            self._condition.notify()
+        return task
+
+    @staticmethod
+    def cancel(task):
+        if task is not None:
+            task.cancelled = True
+
+    def _run(self):
+        if self.thread_init:
+            self.thread_init()
+        try:
+            while True:
+                with self._condition:
+                    task = None
+                    while self._running:
+                        if self._queue:
+                            delay = self._queue[0][0] - self.time()
+                            if delay <= 0:
+                                task = heapq.heappop(self._queue)[2]
+                                break
+                            self._condition.wait(delay)
+                        else:
+                            self._condition.wait()
+                    if not self._running:
+                        self._queue.clear()
+                        break
+                if task.cancelled:
+                    continue
+                try:
+                    task.callback(*task.args)
+                except Exception as e:
+                    if self.error_handler:
+                        self.error_handler(e)
+                    else:
+                        print(f"执行定时任务时出错: {e}")
+        finally:
+            if self.thread_cleanup:
+                self.thread_cleanup()
+
+
+class AdaptiveInterval:
+    """随活动情况自适应的检测间隔（秒）
+
+    刚发生变化或需要密切观察时立即回到最短间隔，
+    状态一直不变时每次按 backoff 倍数放大，直到最长间隔。
+    """
+
+    def __init__(self, min_interval, max_interval, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.current = self.min_interval
+
+    def reset(self):
+        """回到最短间隔"""
+        self.current = self.min_interval
+        return self.current
+
+    def next(self, active=False):
+        """返回下一次检测的间隔，active 表示刚发生变化或处于需要密切观察的时期"""
+        if active:
+            return self.reset()
+        self.current = min(self.current * self.backoff, self.max_interval)
+        return self.current
+
+
+class RateCounter:
+    """统计最近一段时间内的事件次数（例如每分钟检测次数）"""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.total = 0
+        self._times = collections.deque()
+
+    def add(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._times.append(now)
+        self.total += 1
+        self._trim(now)
+
+    def count(self, now=None):
+        """最近 window 秒内的次数"""
+        self._trim(time.monotonic() if now is None else now)
+        return len(self._times)
+
+    def _trim(self, now):
+        limit = now - self.window
+        while self._times and self._times[0] < limit:
+            self._times.popleft()
@@ -0,0 +1,136 @@
+"""活动记录文件和回放的测试"""
+import pytest
+
+from activity_trace import (REC_ACTION, REC_CONFIG, REC_DECISION, REC_PLAYER, REC_SEGMENT, REC_SESSION, REC_TICK,
+                            RECORD_SIZE, TraceReader, TraceWriter)
+from audio_sessions import AudioSessionInfo, FakeAudioSessionBackend, STATE_INACTIVE
+from media_control import RecordingControlBackend
+from monitor_engine import DetectionSettings, MonitorEngine
+from player_tracking import NullWindowApi
+from trace_replay import TraceReplay, main
+
+PLAYER = 'player.exe'
+LONG_TITLE = '一首名字很长很长的歌 - 一位名字也很长的歌手 (Live at 某个很大的体育馆) - 播放器'
+
+
+def read_all(path):
+    with TraceReader(path) as reader:
+        return list(reader)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    config = {'detection': {'peak_threshold': 0.2}, 'session_rules': ['ignore:glob:*chime*']}
+    with TraceWriter(path) as writer:
+        writer.config(config)
+        writer.tick(1.5)
+        writer.sessions([AudioSessionInfo(42, 'chrome.exe', STATE_INACTIVE, 0.25, 'C:\\chrome.exe', 'YouTube')])
+        writer.player(PLAYER, True, LONG_TITLE)
+        writer.player(PLAYER, False, None)
+        writer.decision(1.5, PLAYER, True, False)
+        writer.action(1.5, PLAYER, 'pause', True, 0.002)
+
+    records = read_all(path)
+    assert [record.kind for record in records] == [REC_SEGMENT, REC_CONFIG, REC_TICK, REC_SESSION, REC_PLAYER,
+                                                   REC_PLAYER, REC_DECISION, REC_ACTION]
+    assert records[1].ref == config
+    assert records[2].time == 1.5
+    session = records[3]
+    assert (session.ref, session.a, session.value) == ('chrome.exe', 42, 0.25)
+    assert session.b == (STATE_INACTIVE, 'C:\\chrome.exe', 'YouTube')
+    assert records[4].a == LONG_TITLE and records[4].b == 1
+    assert records[5].a is None
+    assert (records[7].ref, records[7].a, records[7].b) == (PLAYER, 2, 1)
+
+
+def test_append_starts_new_segment_and_reuses_strings(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    with TraceWriter(path) as writer:
+        writer.player(PLAYER, True, LONG_TITLE)
+    with TraceWriter(path) as writer:
+        writer.player(PLAYER, True, LONG_TITLE)
+        # 已有的字符串不会再写一次
+        assert writer.records == 2
+
+    records = read_all(path)
+    assert [record.kind for record in records] == [REC_SEGMENT, REC_PLAYER, REC_SEGMENT, REC_PLAYER]
+    assert records[1].a == records[3].a == LONG_TITLE
+
+
+def test_truncated_record_ignored_and_foreign_file_rejected(tmp_path):
+    path = tmp_path / 'trace.bin'
+    with TraceWriter(str(path)) as writer:
+        writer.tick(1.0)
+    with open(path, 'ab') as f:
+        f.write(b'\x02' * (RECORD_SIZE // 2))
+    assert [record.kind for record in read_all(str(path))] == [REC_SEGMENT, REC_TICK]
+
+    other = tmp_path / 'other.bin'
+    other.write_bytes(b'not a trace' * 10)
+    with pytest.raises(ValueError):
+        TraceReader(str(other))
+
+
+def record_run(path, detection=None, session_rules=None, other_peak=0.05):
+    """用虚拟时钟运行一段：播放器在播放，10 秒后另一个程序开始发声，写入 path"""
+    now = [0.0]
+    sessions = FakeAudioSessionBackend(supports_events=False)
+    sessions.add_session(PLAYER, 0.3, pid=10)
+
+    def respond(action):
+        sessions.set_peak(10, 0.0 if action == 'pause' else 0.3)
+
+    engine = MonitorEngine(PLAYER, audio_backend=sessions, window_api=NullWindowApi(),
+                           control_backend=RecordingControlBackend(on_send=respond), clock=lambda: now[0],
+                           process_api=_Processes(), detection=detection, session_rules=session_rules)
+    engine.recorder = TraceWriter(path)
+    engine.record_config()
+    engine.record_player_config(engine.primary)
+    while now[0] < 30:
+        if now[0] >= 10 and len(sessions.get_sessions()) == 1:
+            sessions.add_session('chrome.exe', other_peak, pid=20)
+        now[0] += engine.step()
+    engine.recorder.close()
+
+
+class _Processes:
+    def iter_processes(self):
+        yield 10, PLAYER, 1.0
+
+    def create_time(self, pid):
+        return 1.0 if pid == 10 else None
+
+
+def actions(replay):
+    return [action.action for action in replay.replayed]
+
+
+def test_replay_uses_recorded_config(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    # 阈值调高后 0.05 的声音不会打断音乐
+    record_run(path, detection=DetectionSettings(peak_threshold=0.1, peak_off_threshold=0.05))
+    replay = TraceReplay(path).run()
+    assert replay.recorded == [] and replay.differences() == []
+
+    # 命令行指定的参数优先：默认阈值下会暂停，与记录不同
+    overridden = TraceReplay(path, detection=DetectionSettings()).run()
+    assert actions(overridden)[0] == 'pause'
+    assert overridden.differences()
+
+
+def test_replay_uses_recorded_rules(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    record_run(path, session_rules=['ignore:process:chrome.exe'], other_peak=0.5)
+    assert TraceReplay(path).run().differences() == []
+    assert actions(TraceReplay(path, session_rules=[]).run())[0] == 'pause'
+
+
+def test_replay_segments_use_their_own_engine_and_config(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    record_run(path)
+    record_run(path, detection=DetectionSettings(peak_threshold=0.1, peak_off_threshold=0.05))
+    replay = TraceReplay(path).run()
+    assert replay.segments == 2
+    assert [action.action for action in replay.recorded] == ['pause']
+    assert replay.differences() == []
+    assert main(['replay', path]) == 0
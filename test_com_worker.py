@@ -0,0 +1,130 @@
+"""音频 COM 线程的测试（其他平台上不初始化 COM，只测试请求的排队和合并）"""
+import threading
+import time
+
+import pytest
+
+from audio_sessions import FakeAudioSessionBackend, SESSION_CREATED
+from com_worker import ComAudioSessionBackend, ComWorker
+
+
+class Target:
+    """记录在哪个线程、以什么顺序被调用"""
+
+    def __init__(self):
+        self.calls = []
+        self.worker = None
+        self.in_worker = []
+        self.release = threading.Event()
+        self.blocked = threading.Event()
+
+    def block(self):
+        self.blocked.set()
+        self.release.wait(5)
+
+    def set_volume(self, name, volume):
+        self.in_worker.append(self.worker.in_worker_thread())
+        self.calls.append((name, volume))
+        return volume
+
+    def fail(self):
+        raise KeyError('boom')
+
+
+def call_in_thread(worker, *args, **kwargs):
+    result = {}
+
+    def run():
+        try:
+            result['value'] = worker.call(*args, **kwargs)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def wait_pending(worker, count):
+    deadline = time.monotonic() + 5
+    while worker.pending < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert worker.pending == count
+
+
+def test_calls_run_in_worker_thread_and_return_results():
+    target = Target()
+    worker = target.worker = ComWorker(lambda: target)
+    try:
+        assert worker.call('set_volume', 'a.exe', 0.5) == 0.5
+        assert target.in_worker == [True]
+        with pytest.raises(KeyError):
+            worker.call('fail')
+    finally:
+        worker.stop()
+    assert not worker.alive
+    with pytest.raises(OSError):
+        worker.call('set_volume', 'a.exe', 0.5)
+
+
+def test_factory_error_raised_from_constructor():
+    def factory():
+        raise ImportError("没有 pycaw")
+
+    with pytest.raises(ImportError):
+        ComWorker(factory)
+
+
+def test_same_key_in_one_batch_only_runs_last():
+    target = Target()
+    worker = target.worker = ComWorker(lambda: target)
+    try:
+        blocker, _ = call_in_thread(worker, 'block')
+        assert target.blocked.wait(5)
+        # 工作线程被占用时排队的请求在下一次唤醒中一起处理
+        pending = []
+        for volume in (0.1, 0.2, 0.3):
+            pending.append(call_in_thread(worker, 'set_volume', 'a.exe', volume, coalesce=('volume', 'a.exe')))
+            wait_pending(worker, len(pending))
+        pending.append(call_in_thread(worker, 'set_volume', 'b.exe', 0.9, coalesce=('volume', 'b.exe')))
+        wait_pending(worker, len(pending))
+        target.release.set()
+        blocker.join(5)
+        for thread, _ in pending:
+            thread.join(5)
+    finally:
+        worker.stop()
+    assert target.calls == [('a.exe', 0.3), ('b.exe', 0.9)]
+    # 被合并的请求拿到的是最后一个请求的结果
+    assert [result['value'] for _, result in pending] == [0.3, 0.3, 0.3, 0.9]
+    assert worker.coalesced == 2
+
+
+def test_call_times_out_when_worker_is_busy():
+    target = Target()
+    worker = target.worker = ComWorker(lambda: target, timeout=0.05)
+    try:
+        blocker, _ = call_in_thread(worker, 'block')
+        assert target.blocked.wait(5)
+        with pytest.raises(OSError, match='没有响应'):
+            worker.call('set_volume', 'a.exe', 0.5)
+    finally:
+        target.release.set()
+        blocker.join(5)
+        worker.stop()
+
+
+def test_backend_forwards_calls_and_events():
+    events = []
+    backend = ComAudioSessionBackend(FakeAudioSessionBackend)
+    backend.add_listener(events.append)
+    try:
+        assert backend.start_events()
+        backend.worker.call('add_session', 'a.exe', 0.4)
+        assert [s.process_name for s in backend.get_sessions()] == ['a.exe']
+        assert backend.set_process_volume('a.exe', 0.5) == 1
+        assert backend.get_process_volume('a.exe') == 0.5
+        assert [event.kind for event in events] == [SESSION_CREATED]
+    finally:
+        backend.close()
+    assert not backend.worker.alive
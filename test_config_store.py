@@ -0,0 +1,118 @@
+"""配置校验、保存和重新加载的测试"""
+import json
+import os
+
+import pytest
+
+from config_store import AppConfig, ConfigStore, parse_hotkey, validate_config
+from media_control import CONTROL_KEYS, CONTROL_PYAUTOGUI
+
+
+def test_defaults_round_trip():
+    config = AppConfig()
+    assert validate_config(config.to_json()) == config
+    assert validate_config({}) == config
+
+
+def test_replace_returns_validated_copy():
+    config = AppConfig()
+    changed = config.replace(hotkey='Ctrl + Shift + P', peak_threshold=0.02)
+    assert changed.hotkey == ['ctrl', 'shift', 'p']
+    assert changed.peak_threshold == 0.02
+    assert config.peak_threshold != 0.02
+
+
+def test_all_errors_are_reported_together():
+    with pytest.raises(ValueError) as info:
+        validate_config({'music_player': '', 'control': 'telepathy', 'peak_threshold': 2, 'theme': 'pink',
+                         'tray_mode': 'yes', 'session_rules': ['ignore:process:'], 'bogus': 1})
+    message = str(info.value)
+    for part in ('进程名不能为空', '未知的控制方式', '声音触发阈值', '未知的主题', 'tray_mode', '无效的规则',
+                 '未知的配置项: bogus'):
+        assert part in message
+
+
+def test_cross_field_checks():
+    with pytest.raises(ValueError, match='停止阈值'):
+        validate_config({'peak_threshold': 0.01, 'peak_off_threshold': 0.02})
+    with pytest.raises(ValueError, match='检测间隔'):
+        validate_config({'min_poll_interval_ms': 500, 'max_poll_interval_ms': 100})
+
+
+def test_hotkey_names_checked_only_for_key_injection():
+    assert parse_hotkey('ctrl+,') == ['ctrl', ',']
+    assert validate_config({'control': CONTROL_PYAUTOGUI, 'hotkey': 'ctrl+printscreen'}).hotkey == \
+        ['ctrl', 'printscreen']
+    with pytest.raises(ValueError, match='不支持的按键'):
+        validate_config({'control': CONTROL_KEYS, 'hotkey': 'ctrl+nosuchkey'})
+    # 播放器自己的控制方式优先于全局控制方式
+    config = validate_config({'control': CONTROL_KEYS, 'players': [
+        {'process_name': 'b.exe', 'hotkey': 'ctrl+nosuchkey', 'control': CONTROL_PYAUTOGUI}]})
+    assert config.players[0]['hotkey'] == ['ctrl', 'nosuchkey']
+    with pytest.raises(ValueError, match='b.exe 的快捷键'):
+        validate_config({'control': CONTROL_KEYS, 'players': [{'process_name': 'b.exe', 'hotkey': 'nosuchkey'}]})
+
+
+def test_player_specs_normalized():
+    config = validate_config({'players': ['b.exe', {'process_name': 'c.exe', 'duck': True}]})
+    assert [player['process_name'] for player in config.players] == ['b.exe', 'c.exe']
+    assert config.players[1]['duck'] is True
+    assert 'duck' not in config.players[0]
+    with pytest.raises(ValueError, match='恢复方式'):
+        validate_config({'players': [{'process_name': 'b.exe', 'resume': 'sometimes'}]})
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'config' / 'config.json')
+    store = ConfigStore(path)
+    config = store.update(music_player='spotify.exe', theme='light')
+    assert not os.path.exists(f"{path}.tmp")
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['music_player'] == 'spotify.exe'
+    assert ConfigStore(path).load() == config
+
+
+def test_failed_replace_keeps_old_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'config.json')
+    store = ConfigStore(path)
+    store.update(theme='light')
+    with open(path, encoding='utf-8') as f:
+        before = f.read()
+
+    def fail(src, dst):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(os, 'replace', fail)
+    config = store.update(theme='dark')
+    # 保存失败时文件保持原样，内存中的配置仍然更新
+    assert store.config == config
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == before
+
+
+def test_invalid_file_keeps_current_config(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('{"peak_threshold": "loud"}', encoding='utf-8')
+    store = ConfigStore(str(path))
+    assert store.load() == AppConfig()
+
+
+def test_external_change_reloads_and_notifies(tmp_path):
+    path = tmp_path / 'config.json'
+    store = ConfigStore(str(path))
+    store.update(theme='light')
+    received = []
+    store.add_listener(received.append)
+    # 自己写入的内容不会再触发重新加载
+    assert store.check_reload() is None
+
+    data = store.config.to_json()
+    data['music_player'] = 'foobar2000.exe'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    config = store.check_reload()
+    assert config is not None and config.music_player == 'foobar2000.exe'
+    assert received == [config]
+
+    path.write_text('{"music_player": ""}', encoding='utf-8')
+    assert store.check_reload() is None
+    assert store.config == config
@@ -0,0 +1,137 @@
+"""控制方式的测试（不发送真实按键）"""
+import logging
+import sys
+
+import pytest
+
+from app_log import get_logger
+from media_control import (CONTROL_KEYS, CONTROL_MEDIA_KEY, CONTROL_MPRIS, CONTROL_PYAUTOGUI, CONTROL_WINDOW_MESSAGE,
+                           KEYEVENTF_EXTENDEDKEY, KEYEVENTF_KEYUP, MPRIS_PREFIX, ControlError,
+                           FallbackControlBackend, KeyInjectionBackend, MediaKeyBackend, MprisBackend,
+                           PyAutoGuiBackend, RecordingControlBackend, WindowMessageBackend, build_key_events,
+                           create_control_backend, virtual_key)
+
+
+def test_virtual_keys_and_event_order():
+    assert virtual_key(' Ctrl ') == 0x11
+    assert virtual_key('p') == ord('P')
+    with pytest.raises(ValueError):
+        virtual_key('printscreen')
+    events = build_key_events([0x11, 0x25])
+    assert events == [(0x11, 0), (0x25, KEYEVENTF_EXTENDEDKEY),
+                      (0x25, KEYEVENTF_KEYUP | KEYEVENTF_EXTENDEDKEY), (0x11, KEYEVENTF_KEYUP)]
+
+
+def test_fallback_used_when_primary_fails():
+    primary = RecordingControlBackend(['ctrl', 'p'])
+    fallback = RecordingControlBackend(['ctrl', 'p'])
+    backend = FallbackControlBackend(primary, fallback)
+    backend.send('play')
+    assert backend.used is primary and backend.last_error is None
+
+    primary.fail = True
+    backend.send('pause')
+    assert backend.used is fallback
+    assert isinstance(backend.last_error, ControlError)
+    assert [call[1] for call in fallback.calls] == ['pause']
+    assert backend.sends == 2
+
+    backend.set_hotkey(['space'])
+    assert primary.keys == fallback.keys == ['space']
+
+
+@pytest.fixture
+def windows(monkeypatch):
+    monkeypatch.setattr(sys, 'platform', 'win32')
+
+
+def test_keys_backend_falls_back_to_pyautogui(windows):
+    backend = create_control_backend(CONTROL_KEYS, ['ctrl', 'alt', 'p'])
+    assert isinstance(backend, FallbackControlBackend)
+    assert isinstance(backend.primary, KeyInjectionBackend)
+    assert isinstance(backend.fallback, PyAutoGuiBackend)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_unsupported_key_uses_pyautogui_with_warning(windows):
+    # 程序的日志器可能已被 setup_logging / set_log_level 改过（不向上传递、级别更高），直接挂处理器
+    logger = get_logger()
+    handler = ListHandler()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+    try:
+        backend = create_control_backend(CONTROL_KEYS, ['ctrl', 'printscreen'])
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    assert isinstance(backend, PyAutoGuiBackend)
+    assert backend.keys == ['ctrl', 'printscreen']
+    assert any('pyautogui' in message for message in handler.messages)
+
+
+def test_targeted_backends_have_no_hotkey_fallback_by_default(windows):
+    assert isinstance(create_control_backend(CONTROL_MEDIA_KEY, ['p']), MediaKeyBackend)
+    assert isinstance(create_control_backend(CONTROL_WINDOW_MESSAGE, ['p'], lambda: None), WindowMessageBackend)
+    assert isinstance(create_control_backend(CONTROL_MPRIS, ['p'], player_name='vlc'), MprisBackend)
+    backend = create_control_backend(CONTROL_MEDIA_KEY, ['p'], hotkey_fallback=True)
+    assert isinstance(backend, FallbackControlBackend) and isinstance(backend.fallback, PyAutoGuiBackend)
+    with pytest.raises(ValueError):
+        create_control_backend('telepathy', ['p'])
+
+
+def test_other_platforms_use_pyautogui_except_mpris(monkeypatch):
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    assert isinstance(create_control_backend(CONTROL_KEYS, ['ctrl', 'p']), PyAutoGuiBackend)
+    assert isinstance(create_control_backend(CONTROL_PYAUTOGUI, ['ctrl', 'p']), PyAutoGuiBackend)
+    assert isinstance(create_control_backend(CONTROL_MPRIS, ['p'], player_name='vlc'), MprisBackend)
+
+
+class FakeBus:
+    """会话总线上的 MPRIS 播放器，接口与 media_control.DBusSessionBus 相同"""
+
+    def __init__(self, players):
+        self.players = players  # 名称 -> pid
+        self.calls = []
+
+    def list_names(self):
+        return ['org.freedesktop.Notifications'] + list(self.players)
+
+    def get_pid(self, bus_name):
+        return self.players[bus_name]
+
+    def call_player(self, bus_name, method):
+        if bus_name not in self.players:
+            raise ControlError(f"{bus_name} 已退出")
+        self.calls.append((bus_name, method))
+
+
+def test_mpris_finds_player_by_pid_and_sends_explicit_methods():
+    bus = FakeBus({MPRIS_PREFIX + 'chromium.instance7': 7, MPRIS_PREFIX + 'spotify': 9})
+    backend = MprisBackend('Spotify', lambda: [9], bus)
+    backend.send('pause')
+    backend.send('play')
+    assert bus.calls == [(MPRIS_PREFIX + 'spotify', 'Pause'), (MPRIS_PREFIX + 'spotify', 'Play')]
+    assert 'spotify' in backend.describe()
+
+
+def test_mpris_falls_back_to_name_and_follows_restarts():
+    bus = FakeBus({MPRIS_PREFIX + 'vlc.instance100': 100})
+    backend = MprisBackend('vlc.exe', lambda: [1], bus)
+    backend.send('play')
+    del bus.players[MPRIS_PREFIX + 'vlc.instance100']
+    bus.players[MPRIS_PREFIX + 'vlc.instance200'] = 200
+    backend.send('pause')
+    assert bus.calls[-1] == (MPRIS_PREFIX + 'vlc.instance200', 'Pause')
+
+    bus.players.clear()
+    with pytest.raises(ControlError):
+        backend.send('play')
@@ -0,0 +1,176 @@
+"""监控引擎的控制流程测试
+
+引擎运行在虚拟时钟上，音频会话来自 FakeAudioSessionBackend 或回放的 Pulse 录制数据（FixturePulseClient），
+发送的操作由 RecordingControlBackend 记录，on_send 模拟播放器对按键的响应。
+运行：python -m pytest -q
+"""
+import random
+
+import pytest
+
+from audio_sessions import FakeAudioSessionBackend
+from media_control import RecordingControlBackend
+from monitor_engine import DetectionSettings, MonitorEngine, RETRY_BACKOFF_SECONDS
+from player_tracking import NullWindowApi
+from pulse_audio import FixturePulseClient, PulseAudioSessionBackend
+
+PLAYER = 'lx-music-desktop.exe'
+PLAYER_PID = 100
+PLAYING_PEAK = 0.3
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProcessApi:
+    """固定的进程表，接口与 player_tracking.PsutilProcessApi 相同"""
+
+    def __init__(self, processes):
+        self.processes = processes  # pid -> 进程名
+
+    def iter_processes(self):
+        for pid, name in self.processes.items():
+            yield pid, name, 1.0
+
+    def create_time(self, pid):
+        return 1.0 if pid in self.processes else None
+
+
+class Harness:
+    """把引擎、虚拟时钟和记录的操作放在一起"""
+
+    def __init__(self, player, audio_backend, processes, on_send=None, clock=None, detection=None):
+        self.clock = clock or VirtualClock()
+        self.actions = []  # (虚拟时间, action)
+        self.on_send = on_send
+        self.control = RecordingControlBackend(on_send=self._record)
+        self.engine = MonitorEngine(player, audio_backend=audio_backend, window_api=NullWindowApi(),
+                                    control_backend=self.control, clock=self.clock,
+                                    process_api=FakeProcessApi(processes), detection=detection)
+
+    def _record(self, action):
+        self.actions.append((self.clock.now, action))
+        if self.on_send is not None:
+            self.on_send(action)
+
+    def run(self, seconds, before_step=None):
+        """按引擎给出的检测间隔推进虚拟时钟，before_step() 在每次检测前调用"""
+        end = self.clock.now + seconds
+        while self.clock.now < end:
+            if before_step is not None:
+                before_step()
+            self.clock.now += self.engine.step()
+
+    def names(self):
+        return [action for _, action in self.actions]
+
+
+def fake_harness(player_responds=True):
+    sessions = FakeAudioSessionBackend(supports_events=False)
+    sessions.add_session(PLAYER, PLAYING_PEAK, pid=PLAYER_PID)
+
+    def on_send(action):
+        # 模拟播放器：暂停后没有声音，继续播放后恢复声音
+        if player_responds:
+            sessions.set_peak(PLAYER_PID, 0.0 if action == 'pause' else PLAYING_PEAK)
+
+    harness = Harness(PLAYER, sessions, {PLAYER_PID: PLAYER}, on_send)
+    return harness, sessions
+
+
+def test_pause_then_resume_when_other_app_plays():
+    harness, sessions = fake_harness()
+    harness.run(3)
+    assert harness.actions == []
+
+    other = sessions.add_session('chrome.exe', 0.5, pid=200)
+    harness.run(5)
+    assert harness.names() == ['pause']
+    paused_at = harness.actions[0][0]
+    assert paused_at >= 3
+
+    sessions.set_peak(other, 0.0)
+    harness.run(15)
+    assert harness.names() == ['pause', 'play']
+    assert harness.actions[1][0] > paused_at
+    assert harness.engine.primary.playing
+
+
+def test_play_retries_three_times_then_backs_off():
+    harness, sessions = fake_harness(player_responds=False)
+    sessions.set_peak(PLAYER_PID, 0.0)
+    harness.run(60)
+
+    times = [at for at, action in harness.actions if action == 'play']
+    assert len(times) >= 4
+    # 前三次只隔冷却时间，第四次要等过退避时间
+    assert times[1] - times[0] < RETRY_BACKOFF_SECONDS
+    assert times[2] - times[1] < RETRY_BACKOFF_SECONDS
+    assert times[3] - times[2] >= RETRY_BACKOFF_SECONDS
+    assert harness.engine.metrics.counters['retry_backoffs'] >= 1
+    assert 'pause' not in harness.names()
+
+
+def test_poll_interval_backs_off_when_stable_and_resets_on_activity():
+    harness, sessions = fake_harness()
+    settings = harness.engine.detection
+    intervals = []
+    for _ in range(40):
+        intervals.append(harness.engine.step())
+        harness.clock.now += intervals[-1]
+    assert intervals[0] == pytest.approx(settings.min_poll_interval_ms / 1000)
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == pytest.approx(settings.max_poll_interval_ms / 1000)
+
+    # 其他程序开始发声：回到最短间隔，尽快确认
+    sessions.add_session('chrome.exe', 0.5, pid=200)
+    assert harness.engine.step() == pytest.approx(settings.min_poll_interval_ms / 1000)
+
+
+def test_quiet_music_is_not_learned_as_noise_floor():
+    sessions = FakeAudioSessionBackend(supports_events=False)
+    sessions.add_session(PLAYER, 0.05, pid=PLAYER_PID)
+    playing = [True]
+    rng = random.Random(1)
+
+    def toggle(action):
+        # 真实播放器的快捷键是切换：已经在播放时收到 play 会暂停
+        playing[0] = not playing[0]
+
+    def vary_peak():
+        # 很轻的音乐，大部分采样集中在 0.02 附近，旧的校准会把它学成本底噪声
+        sessions.set_peak(PLAYER_PID, 0.02 + 0.13 * rng.random() ** 3 if playing[0] else 0.0)
+
+    harness = Harness(PLAYER, sessions, {PLAYER_PID: PLAYER}, toggle,
+                      detection=DetectionSettings(auto_calibrate=True))
+    harness.run(400, vary_peak)
+    assert harness.actions == []
+    assert playing[0]
+
+
+def pulse_stream(index, binary, pid, peak):
+    return {'index': index, 'pid': pid, 'binary': binary, 'app_name': binary, 'peak': peak}
+
+
+def test_pulse_fixture_replay_pauses_and_resumes():
+    alone = [pulse_stream(1, 'spotify', 10, PLAYING_PEAK)]
+    other_playing = [pulse_stream(1, 'spotify', 10, 0.0), pulse_stream(2, 'firefox', 20, 0.5)]
+    other_stopped = [pulse_stream(1, 'spotify', 10, 0.0), pulse_stream(2, 'firefox', 20, 0.0)]
+    # 0~3 秒只有 spotify，3~8 秒 firefox 在播放（spotify 已被暂停），之后 firefox 安静
+    snapshots = [alone] * 6 + [other_playing] * 10 + [other_stopped] * 30
+    clock = VirtualClock()
+    fixture = FixturePulseClient(snapshots, interval=0.5, clock=clock)
+    harness = Harness('spotify', PulseAudioSessionBackend(client_factory=lambda: fixture),
+                      {10: 'spotify', 20: 'firefox'}, clock=clock)
+
+    harness.run(20)
+    assert harness.names()[:2] == ['pause', 'play']
+    paused_at, resumed_at = harness.actions[0][0], harness.actions[1][0]
+    assert 3 <= paused_at < 8
+    assert resumed_at >= 8
+    assert fixture.peak_reads > 0
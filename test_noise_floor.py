@@ -0,0 +1,86 @@
+"""本底噪声学习的测试"""
+from noise_floor import NOISE_FLOOR_MIN_SAMPLES, NOISE_FLOOR_WINDOW, NoiseFloor, NoiseFloorMap, bin_upper, peak_bin
+
+
+def fill(floor, peaks):
+    changed = False
+    for peak in peaks:
+        changed = floor.push(peak) or changed
+    return changed
+
+
+def test_peak_bins_are_ordered():
+    assert peak_bin(0.0) == 0
+    assert peak_bin(1e-4) < peak_bin(1e-3) < peak_bin(1.0)
+    assert bin_upper(0) == 0.0
+    assert 1e-3 <= bin_upper(peak_bin(1e-3))
+
+
+def test_not_calibrated_before_min_samples():
+    floor = NoiseFloor()
+    fill(floor, [0.0] * (NOISE_FLOOR_MIN_SAMPLES - 1))
+    assert floor.floor is None
+    assert floor.thresholds() is None
+    assert not floor.at_floor(0.0)
+
+
+def test_zero_floor_lowers_on_threshold():
+    floor = NoiseFloor()
+    assert fill(floor, [0.0] * NOISE_FLOOR_MIN_SAMPLES)
+    assert floor.floor == 0.0
+    on_threshold, off_threshold = floor.thresholds()
+    assert 0 < off_threshold <= on_threshold < 0.01
+    # 本底噪声为 0 时不能直接判断为无声
+    assert not floor.at_floor(0.0)
+
+
+def test_hiss_floor_detected_and_used_for_silence():
+    floor = NoiseFloor()
+    fill(floor, [0.0004, 0.0005] * NOISE_FLOOR_MIN_SAMPLES + [0.2] * 8)
+    assert floor.floor is not None and 0.0005 <= floor.floor < 0.001
+    on_threshold, off_threshold = floor.thresholds()
+    assert off_threshold > floor.floor and on_threshold >= off_threshold
+    assert floor.at_floor(0.0005)
+    assert not floor.at_floor(0.2)
+    # 停止阈值太低时本底噪声不算明显低于它，不直接判断
+    assert floor.at_floor(0.0005, off_threshold=0.003)
+    assert not floor.at_floor(0.0005, off_threshold=0.001)
+
+
+def test_floor_capped_by_max_floor():
+    quiet_music = [0.02, 0.021, 0.022] * NOISE_FLOOR_MIN_SAMPLES
+    assert fill(NoiseFloor(), quiet_music)
+    capped = NoiseFloor(max_floor=0.0015)
+    fill(capped, quiet_music)
+    assert capped.floor is None
+
+
+def test_spread_samples_not_calibrated():
+    floor = NoiseFloor()
+    fill(floor, [10 ** -(i % 8) for i in range(NOISE_FLOOR_MIN_SAMPLES * 2)])
+    assert floor.floor is None
+
+
+def test_window_forgets_old_samples():
+    floor = NoiseFloor(size=64)
+    fill(floor, [0.0] * 64)
+    assert floor.floor == 0.0
+    fill(floor, [10 ** -(i % 8) for i in range(64)])
+    assert len(floor) == 64
+    assert floor.floor is None
+
+
+def test_map_keeps_keys_separate_and_bounded():
+    floors = NoiseFloorMap(size=NOISE_FLOOR_WINDOW, max_keys=2, max_floor=0.0015)
+    for _ in range(NOISE_FLOOR_MIN_SAMPLES):
+        floors.push(('a.exe', 'sink0'), 0.0)
+        floors.push(('a.exe', 'sink1'), 0.0005)
+    assert floors.summary()[('a.exe', 'sink0')] == 0.0
+    assert floors.thresholds(('a.exe', 'sink1')) is not None
+    assert floors.get(('a.exe', 'sink1')).max_floor == 0.0015
+
+    floors.push(('b.exe', ''), 0.1)
+    assert len(floors) == 2
+    assert floors.get(('a.exe', 'sink0')) is None
+    floors.clear()
+    assert len(floors) == 0
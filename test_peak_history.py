@@ -0,0 +1,90 @@
+"""峰值历史和有声/无声判断的测试"""
+import pytest
+
+from peak_history import ActivityDetector, ActivityMap, PeakHistory
+
+
+def feed(detector, peaks, start=0.0, step=0.1):
+    """按固定间隔加入采样，返回每次更新后的状态"""
+    return [detector.update(peak, start + i * step) for i, peak in enumerate(peaks)]
+
+
+def test_ring_buffer_keeps_latest_values_in_order():
+    history = PeakHistory(size=4)
+    assert history.latest() == 0.0 and history.values() == []
+    for i in range(6):
+        history.push(i / 10, float(i))
+    assert len(history) == 4
+    assert history.values() == pytest.approx([0.2, 0.3, 0.4, 0.5])
+    assert history.latest() == pytest.approx(0.5)
+    history.clear()
+    assert len(history) == 0
+
+
+def test_run_durations():
+    history = PeakHistory(size=8)
+    for now, peak in enumerate([0.5, 0.0, 0.2, 0.3, 0.4]):
+        history.push(peak, float(now))
+    assert history.duration_above(0.1) == 2.0
+    assert history.duration_below(0.1) is None
+    history.push(0.0, 5.0)
+    assert history.duration_below(0.1) == 0.0
+    assert history.duration_above(0.1) is None
+
+
+def test_run_duration_limited_to_window():
+    history = PeakHistory(size=3)
+    for now in range(10):
+        history.push(0.5, float(now))
+    assert history.duration_above(0.1) == 2.0
+
+
+def test_min_on_ignores_short_blips():
+    detector = ActivityDetector(0.1, 0.05, min_on=0.3)
+    assert feed(detector, [0.5, 0.0, 0.5, 0.0]) == [False] * 4
+    assert feed(detector, [0.5] * 5, start=1.0) == [False, False, False, True, True]
+
+
+def test_hysteresis_holds_state_between_thresholds():
+    detector = ActivityDetector(0.1, 0.02)
+    assert feed(detector, [0.05, 0.2, 0.05, 0.03, 0.01]) == [False, True, True, True, False]
+    assert not detector.update(0.05, 1.0)
+
+
+def test_min_off_bridges_pauses_and_reports_silence():
+    detector = ActivityDetector(0.1, 0.02, min_off=0.25)
+    detector.update(0.5, 0.0)
+    assert feed(detector, [0.0, 0.0], start=0.1) == [True, True]
+    assert not detector.silent
+    assert detector.pending
+    assert feed(detector, [0.0, 0.0], start=0.3) == [True, False]
+    assert detector.silent and not detector.pending
+    detector.reset()
+    assert not detector.active and not detector.silent
+
+
+def test_off_threshold_never_above_on_threshold():
+    assert ActivityDetector(0.1, 0.5).off_threshold == 0.1
+
+
+def test_map_tracks_keys_and_drops_missing_ones():
+    activity = ActivityMap(0.1, 0.02)
+    assert activity.update({1: 0.5, 2: 0.0}, 0.0) == {1}
+    assert len(activity) == 2
+    assert activity.update({1: 0.05}, 0.1) == {1}
+    assert len(activity) == 1
+    activity.clear()
+    assert len(activity) == 0
+
+
+def test_map_per_key_thresholds():
+    activity = ActivityMap(0.1, 0.02)
+    # 单个值为开阈值，关阈值按默认回差比例缩放
+    assert activity.update({1: 0.3, 2: 0.3}, 0.0, {1: 0.5}) == {2}
+    assert activity.update({1: 0.6, 2: 0.3}, 0.1, {1: 0.5}) == {1, 2}
+    assert activity.update({1: 0.15, 2: 0.3}, 0.2, {1: 0.5}) == {1, 2}
+    assert activity.update({1: 0.09, 2: 0.3}, 0.3, {1: 0.5}) == {2}
+    # 也可以同时指定两个阈值
+    assert activity.update({3: 0.2}, 0.4, {3: (0.2, 0.19)}) == {3}
+    assert activity.update({3: 0.195}, 0.5, {3: (0.2, 0.19)}) == {3}
+    assert activity.pending is False
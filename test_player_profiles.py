@@ -0,0 +1,30 @@
+"""播放器配置的测试"""
+from media_control import CONTROL_KEYS, RecordingControlBackend
+from peak_history import ActivityDetector
+from player_profiles import PlayerProfile
+
+
+def profile(control_backend=None):
+    return PlayerProfile('player.exe', ['ctrl', 'alt', 'p'], CONTROL_KEYS, ActivityDetector(0.01, 0.003),
+                         control_backend=control_backend, title_events=False)
+
+
+def test_hotkey_change_rebuilds_created_backend():
+    player = profile()
+    backend = player.get_control_backend()
+    assert backend.keys == ['ctrl', 'alt', 'p']
+
+    player.set_hotkey(['ctrl', 'shift', 'capslock'])
+    assert player.control_backend is None
+    rebuilt = player.get_control_backend()
+    assert rebuilt is not backend
+    assert rebuilt.keys == ['ctrl', 'shift', 'capslock']
+
+
+def test_hotkey_change_keeps_injected_backend():
+    recording = RecordingControlBackend(['space'])
+    player = profile(recording)
+    player.set_hotkey(['ctrl', 'p'])
+    assert player.get_control_backend() is recording
+    assert recording.keys == ['ctrl', 'p']
+    assert player.hotkey == ['ctrl', 'p']
@@ -0,0 +1,154 @@
+"""播放器进程跟踪的测试"""
+from player_tracking import (PROCESS_RESCAN_SECONDS, TITLE_PAUSED, TITLE_PLAYING, TITLE_SUBSCRIBE_RETRY_SECONDS,
+                             PlayerProcessIndex, PlayerWindowCache, SimulatedTitleTracker, parse_title_state)
+
+
+class CountingProcessApi:
+    """可修改的进程表，记录全量扫描的次数"""
+
+    def __init__(self):
+        self.processes = {}  # pid -> (进程名, 创建时间)
+        self.scans = 0
+
+    def iter_processes(self):
+        self.scans += 1
+        for pid, (name, create_time) in list(self.processes.items()):
+            yield pid, name, create_time
+
+    def create_time(self, pid):
+        entry = self.processes.get(pid)
+        return entry[1] if entry else None
+
+
+def make_index(name='Player.exe'):
+    now = [0.0]
+    api = CountingProcessApi()
+    return PlayerProcessIndex(name, api, lambda: now[0]), api, now
+
+
+def test_absent_player_rescans_at_most_once_per_interval():
+    index, api, now = make_index()
+    for _ in range(50):
+        assert index.get_pids() == []
+    assert api.scans == 1
+
+    now[0] += PROCESS_RESCAN_SECONDS / 2
+    index.get_pids()
+    assert api.scans == 1
+
+    api.processes[7] = ('player.exe', 1.0)
+    now[0] += PROCESS_RESCAN_SECONDS
+    assert index.get_pids() == [7]
+    assert api.scans == 2
+
+
+def test_request_scan_finds_new_player_immediately():
+    index, api, now = make_index()
+    index.get_pids()
+    api.processes[7] = ('player.exe', 1.0)
+    index.request_scan()
+    assert index.get_pids() == [7]
+    assert api.scans == 2
+
+
+def test_running_player_uses_cache_until_it_exits():
+    index, api, now = make_index()
+    api.processes[7] = ('player.exe', 1.0)
+    api.processes[8] = ('other.exe', 1.0)
+    for _ in range(20):
+        assert index.get_pids() == [7]
+    assert api.scans == 1
+    assert index.cache_hits == 19
+    # 运行中的播放器不受 request_scan 影响
+    index.request_scan()
+    index.get_pids()
+    assert api.scans == 1
+
+    # pid 被另一个进程复用：创建时间不同，立即重新扫描
+    api.processes[7] = ('other.exe', 2.0)
+    assert index.get_pids() == []
+    assert api.scans == 2
+    index.get_pids()
+    assert api.scans == 2
+
+
+def test_process_name_change_rescans_immediately():
+    index, api, now = make_index()
+    index.get_pids()
+    api.processes[9] = ('new.exe', 1.0)
+    index.set_process_name('New.exe')
+    assert index.get_pids() == [9]
+    assert api.scans == 2
+
+
+def test_title_state():
+    assert parse_title_state('', 'player.exe') is None
+    assert parse_title_state('歌曲 - 暂停中', 'player.exe') == TITLE_PAUSED
+    assert parse_title_state('Song - Paused', 'player.exe') == TITLE_PAUSED
+    assert parse_title_state('Song - Artist', 'player.exe') == TITLE_PLAYING
+    assert parse_title_state('player', 'player.exe') is None
+
+
+class FakeWindowApi:
+    """固定的顶层窗口，接口与 player_tracking.Win32WindowApi 相同"""
+
+    def __init__(self, windows):
+        self.windows = windows  # hwnd -> [pid, 标题, 是否可见]，按枚举顺序
+
+    def list_windows(self):
+        return list(self.windows)
+
+    def is_window(self, hwnd):
+        return hwnd in self.windows
+
+    def is_visible(self, hwnd):
+        return hwnd in self.windows and self.windows[hwnd][2]
+
+    def get_pid(self, hwnd):
+        return self.windows[hwnd][0]
+
+    def get_title(self, hwnd):
+        return self.windows[hwnd][1]
+
+
+def test_title_subscription_failure_backs_off():
+    now = [0.0]
+    tracker = SimulatedTitleTracker('player.exe', lambda: now[0])
+    tracker.fail = True
+    for _ in range(20):
+        assert not tracker.track([7])
+    assert tracker.subscriptions == 1
+
+    # 播放器重启（进程变了）时立即再试
+    assert not tracker.track([8])
+    assert tracker.subscriptions == 2
+
+    tracker.fail = False
+    now[0] += TITLE_SUBSCRIBE_RETRY_SECONDS
+    assert tracker.track([8])
+    assert tracker.subscriptions == 3
+
+
+def test_title_tracker_follows_only_the_cached_window():
+    index, api, now = make_index()
+    api.processes[7] = ('player.exe', 1.0)
+    # 窗口 2 是播放器的桌面歌词窗口，主窗口是 1
+    windows = FakeWindowApi({2: [7, '第一句歌词', True], 1: [7, '歌曲 - 歌手', True]})
+    cache = PlayerWindowCache(index, windows)
+    tracker = SimulatedTitleTracker('player.exe')
+
+    assert tracker.track([7])
+    assert tracker.title is None
+    tracker.seed(cache.get_title([7]), cache.window)
+    assert (tracker.title, tracker.window) == ('歌曲 - 歌手', 1)
+
+    tracker.push_title('第二句歌词', 2)
+    assert tracker.title == '歌曲 - 歌手'
+    tracker.push_title('歌曲 - 暂停中', 1)
+    assert tracker.state == TITLE_PAUSED
+
+    # 歌词窗口关闭不影响，主窗口隐藏后回到读取窗口标题
+    tracker.push_closed(2)
+    assert tracker.title == '歌曲 - 暂停中'
+    tracker.push_closed(1)
+    assert tracker.title is None and tracker.window is None
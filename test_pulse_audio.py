@@ -0,0 +1,95 @@
+"""PulseAudio 后端的测试（使用 FixturePulseClient，不需要音频服务器）"""
+import threading
+import time
+from types import SimpleNamespace
+
+from audio_sessions import STATE_ACTIVE, STATE_INACTIVE
+from pulse_audio import FixturePulseClient, PulseAudioSessionBackend, StreamPeak, missing_peak_monitor_internals
+
+WAIT_SECONDS = 5
+
+
+def stream(index, binary, peak, corked=False):
+    return {'index': index, 'pid': index * 10, 'binary': binary, 'app_name': binary, 'peak': peak,
+            'corked': corked}
+
+
+def test_stream_peak_takes_highest_since_last_read():
+    peak = StreamPeak(0)
+    assert peak.take() == 0.0
+    for sample in (0.1, 0.4, 0.2):
+        peak.add(sample)
+    assert peak.take() == 0.4
+    # 没有新采样时返回最近一个采样
+    assert peak.take() == 0.2
+
+
+def test_missing_pulsectl_internals_are_reported():
+    pa = SimpleNamespace(CallError=Exception)
+    c = SimpleNamespace(pa=pa)
+    missing = missing_peak_monitor_internals(c, SimpleNamespace())
+    assert '_pulsectl.PA_STREAM_REQUEST_CB_T' in missing
+    assert '_pulsectl.pa.stream_connect_record' in missing
+    assert '_pulsectl.pa.CallError' not in missing
+    assert 'Pulse._ctx' in missing
+    assert missing_peak_monitor_internals(SimpleNamespace(), SimpleNamespace(_ctx=object()))[-1] == '_pulsectl.pa'
+
+
+class ListeningFixture(FixturePulseClient):
+    """listen() 开始时设置 listening，start_peak_monitor 按 fail 失败"""
+
+    def __init__(self, snapshots, fail=False):
+        super().__init__(snapshots, interval=3600)
+        self.fail = fail
+        self.listening = threading.Event()
+
+    def start_peak_monitor(self, sink_input, on_peak):
+        if self.fail:
+            raise OSError(f"无法监听流 {sink_input.index} 的峰值")
+        super().start_peak_monitor(sink_input, on_peak)
+
+    def listen(self, callback, stop):
+        self.listening.set()
+        super().listen(callback, stop)
+
+
+def backend_with_events(snapshots, fail=False):
+    """快照客户端和事件客户端分开，返回 (后端, 快照客户端, 事件客户端)"""
+    clients = [FixturePulseClient(snapshots, interval=3600), ListeningFixture(snapshots, fail)]
+    backend = PulseAudioSessionBackend(client_factory=lambda: clients.pop(0))
+    snapshot_client, event_client = backend.client, clients[0]
+    assert backend.start_events()
+    assert event_client.listening.wait(WAIT_SECONDS)
+    return backend, snapshot_client, event_client
+
+
+def test_sessions_from_snapshot_without_events():
+    backend = PulseAudioSessionBackend(client_factory=lambda: FixturePulseClient(
+        [[stream(1, 'Spotify', 0.3), stream(2, 'firefox', 0.5, corked=True)]]))
+    sessions = {session.process_name: session for session in backend.get_sessions()}
+    assert sessions['spotify'].peak == 0.3 and sessions['spotify'].state == STATE_ACTIVE
+    assert sessions['firefox'].peak == 0.0 and sessions['firefox'].state == STATE_INACTIVE
+    assert backend.client.peak_reads == 1  # 暂停的流不采样
+
+
+def test_monitored_peaks_are_read_from_cache():
+    backend, snapshot_client, _ = backend_with_events([[stream(1, 'spotify', 0.3)]])
+    try:
+        deadline = time.monotonic() + WAIT_SECONDS
+        peak = 0.0
+        while peak == 0.0 and time.monotonic() < deadline:
+            peak = backend.get_sessions()[0].peak
+            time.sleep(0.01)
+        assert peak == 0.3
+        assert snapshot_client.peak_reads == 0
+    finally:
+        backend.stop_events()
+
+
+def test_stream_without_monitor_is_sampled():
+    backend, snapshot_client, _ = backend_with_events([[stream(1, 'spotify', 0.3)]], fail=True)
+    try:
+        assert backend.get_sessions()[0].peak == 0.3
+        assert snapshot_client.peak_reads == 1
+    finally:
+        backend.stop_events()
@@ -0,0 +1,78 @@
+"""其他程序处理规则的测试"""
+import pytest
+
+from audio_sessions import AudioSessionInfo
+from session_rules import (ACTION_IGNORE, ACTION_INTERRUPT, ACTION_THRESHOLD, MATCH_CACHE_SIZE, MATCH_PROCESS,
+                           SessionRule, compile_rules, parse_rule)
+
+
+def session(process_name, exe_path='', display_name=''):
+    return AudioSessionInfo(1, process_name, exe_path=exe_path, display_name=display_name)
+
+
+def test_parse_rule_round_trip():
+    rule = parse_rule('threshold:path:C:\\Apps\\Discord\\*.exe:0.2')
+    assert rule.action == ACTION_THRESHOLD
+    assert rule.pattern == 'C:\\Apps\\Discord\\*.exe'
+    assert rule.threshold == 0.2
+    assert parse_rule(rule.to_text()).to_text() == rule.to_text()
+    assert parse_rule(' ignore:glob:*chime* ').pattern == '*chime*'
+
+
+@pytest.mark.parametrize('text', [
+    'ignore', 'ignore:process', 'ignore:process:', 'ignore:process:  ', 'skip:process:a.exe',
+    'ignore:regex:a', 'threshold:process:a.exe', 'threshold:process:a.exe:loud', 'threshold:process::0.2',
+    'threshold:process:a.exe:1.5', 'threshold:process:a.exe:-0.1',
+])
+def test_parse_rule_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+def test_exact_process_match_is_case_insensitive():
+    rules = compile_rules(['ignore:process:Notify.exe'])
+    assert rules.match(session('notify.exe')).action == ACTION_IGNORE
+    assert rules.match(session('notify2.exe')) is None
+
+
+def test_glob_path_and_display_matches():
+    rules = compile_rules([
+        'ignore:glob:*helper*.exe',
+        'threshold:path:c:\\games\\*:0.3',
+        'interrupt:display:*meeting*',
+    ])
+    assert rules.match(session('gpuhelper64.exe')).action == ACTION_IGNORE
+    assert rules.match(session('game.exe', exe_path='C:\\Games\\game.exe')).threshold == 0.3
+    assert rules.match(session('app.exe', display_name='Team Meeting')).action == ACTION_INTERRUPT
+    assert rules.match(session('app.exe')) is None
+
+
+def test_priority_exact_before_glob_and_process_before_path():
+    rules = compile_rules([
+        'ignore:glob:*.exe',
+        'threshold:display:Voice:0.5',
+        'threshold:path:c:\\voice\\voice.exe:0.2',
+        'interrupt:process:voice.exe',
+    ])
+    assert rules.match(session('voice.exe', 'C:\\Voice\\voice.exe', 'Voice')).action == ACTION_INTERRUPT
+    assert rules.match(session('other.exe', 'C:\\Voice\\voice.exe', 'Voice')).threshold == 0.2
+    assert rules.match(session('other.exe', 'D:\\other.exe', 'Voice')).threshold == 0.5
+    assert rules.match(session('other.exe', 'D:\\other.exe')).action == ACTION_IGNORE
+
+
+def test_first_rule_wins_within_a_kind():
+    rules = compile_rules(['ignore:glob:chat*', 'interrupt:glob:*.exe', 'interrupt:process:a.exe',
+                           'ignore:process:a.exe'])
+    assert rules.match(session('chat.exe')).action == ACTION_IGNORE
+    assert rules.match(session('a.exe')).action == ACTION_INTERRUPT
+
+
+def test_match_results_are_cached():
+    rules = compile_rules([SessionRule(MATCH_PROCESS, 'a.exe', ACTION_IGNORE)])
+    for _ in range(3):
+        rules.match(session('a.exe'))
+    assert rules.cache_hits == 2
+    for i in range(MATCH_CACHE_SIZE + 1):
+        rules.match(session(f'app{i}.exe'))
+    assert rules.match(session('a.exe')).action == ACTION_IGNORE
+    assert len(rules) == 1
@@ -0,0 +1,116 @@
+"""调度器的测试"""
+import threading
+
+import pytest
+
+from task_scheduler import AdaptiveInterval, RateCounter, TaskScheduler
+
+
+def run_until(scheduler, event, timeout=5):
+    scheduler.start()
+    try:
+        assert event.wait(timeout)
+    finally:
+        scheduler.stop()
+
+
+def test_tasks_run_in_time_order_on_scheduler_thread():
+    scheduler = TaskScheduler('test')
+    order = []
+    threads = set()
+    done = threading.Event()
+
+    def record(name):
+        order.append(name)
+        threads.add(scheduler.in_scheduler_thread())
+
+    scheduler.call_later(0.03, record, 'late')
+    scheduler.call_later(0.01, record, 'early')
+    scheduler.call_soon(record, 'first')
+    scheduler.call_soon(record, 'second')
+    scheduler.call_later(0.05, done.set)
+    run_until(scheduler, done)
+    assert order == ['first', 'second', 'early', 'late']
+    assert threads == {True}
+    assert not scheduler.in_scheduler_thread()
+
+
+def test_cancelled_task_does_not_run():
+    scheduler = TaskScheduler('test')
+    ran = []
+    done = threading.Event()
+    task = scheduler.call_later(0.01, ran.append, 'cancelled')
+    scheduler.cancel(task)
+    scheduler.cancel(None)
+    scheduler.call_later(0.02, done.set)
+    run_until(scheduler, done)
+    assert ran == []
+
+
+def test_errors_go_to_handler_and_thread_keeps_running():
+    errors = []
+    done = threading.Event()
+    scheduler = TaskScheduler('test', error_handler=errors.append)
+
+    def fail():
+        raise RuntimeError("任务出错")
+
+    scheduler.call_soon(fail)
+    scheduler.call_soon(done.set)
+    run_until(scheduler, done)
+    assert [str(e) for e in errors] == ["任务出错"]
+
+
+def test_thread_hooks_and_stop_from_inside():
+    calls = []
+    done = threading.Event()
+    scheduler = TaskScheduler('test', thread_init=lambda: calls.append('init'),
+                              thread_cleanup=lambda: (calls.append('cleanup'), done.set()))
+    scheduler.start()
+    scheduler.start()
+    assert scheduler.running
+    scheduler.call_soon(scheduler.stop)
+    assert done.wait(5)
+    assert calls == ['init', 'cleanup']
+    assert not scheduler.running
+
+
+def test_stop_drops_tasks_not_yet_due():
+    ran = []
+    scheduler = TaskScheduler('test')
+    scheduler.start()
+    scheduler.call_later(60, ran.append, 'later')
+    scheduler.stop()
+    assert not scheduler.running
+    assert ran == []
+
+
+def test_virtual_clock():
+    now = [100.0]
+    scheduler = TaskScheduler('test', clock=lambda: now[0])
+    assert scheduler.time() == 100.0
+    task = scheduler.call_later(-5, lambda: None)
+    assert task.when == 100.0
+
+
+def test_adaptive_interval_backs_off_and_resets():
+    interval = AdaptiveInterval(0.1, 1.0, backoff=2.0)
+    assert [interval.next() for _ in range(5)] == pytest.approx([0.2, 0.4, 0.8, 1.0, 1.0])
+    assert interval.next(active=True) == 0.1
+    assert interval.next() == pytest.approx(0.2)
+    interval.next()
+    assert interval.reset() == 0.1
+
+
+def test_adaptive_interval_max_not_below_min():
+    interval = AdaptiveInterval(0.5, 0.1)
+    assert interval.next() == 0.5
+
+
+def test_rate_counter_window():
+    counter = RateCounter(window=60)
+    for now in range(0, 120, 10):
+        counter.add(float(now))
+    assert counter.total == 12
+    assert counter.count(110.0) == 7
+    assert counter.count(500.0) == 0
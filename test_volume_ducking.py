@@ -0,0 +1,148 @@
+"""音量闪避的测试"""
+import heapq
+import itertools
+
+import pytest
+
+from audio_sessions import FakeAudioSessionBackend
+from volume_ducking import (CURVE_DB, CURVE_LINEAR, CURVE_SMOOTH, DuckingSettings, HighResolutionTimer,
+                            VolumeDucker, ramp_volume)
+
+PLAYER = 'player.exe'
+
+
+class ManualScheduler:
+    """只在 advance() 时执行到期任务的调度器，接口与 task_scheduler.TaskScheduler 相同"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._queue = []
+        self._counter = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback, *args):
+        task = [False, callback, args]
+        heapq.heappush(self._queue, (when, next(self._counter), task))
+        return task
+
+    @staticmethod
+    def cancel(task):
+        if task is not None:
+            task[0] = True
+
+    def pending(self):
+        return sum(1 for _, _, task in self._queue if not task[0])
+
+    def advance(self, seconds):
+        end = self.now + seconds
+        while self._queue and self._queue[0][0] <= end:
+            when, _, (cancelled, callback, args) = heapq.heappop(self._queue)
+            self.now = max(self.now, when)
+            if not cancelled:
+                callback(*args)
+        self.now = end
+
+
+class CountingTimer(HighResolutionTimer):
+    def __init__(self):
+        super().__init__()
+        self.changes = []
+
+    def _set(self, enabled):
+        self.changes.append(enabled)
+
+
+@pytest.mark.parametrize('curve', [CURVE_LINEAR, CURVE_SMOOTH, CURVE_DB])
+def test_curves_reach_end_points_monotonically(curve):
+    values = [ramp_volume(0.8, 0.0, i / 20, curve) for i in range(21)]
+    assert values[0] == 0.8 and values[-1] == 0.0
+    assert all(a >= b for a, b in zip(values, values[1:]))
+
+
+def test_curve_shapes():
+    assert ramp_volume(0.0, 1.0, 0.5, CURVE_LINEAR) == pytest.approx(0.5)
+    assert ramp_volume(0.0, 1.0, 0.5, CURVE_SMOOTH) == pytest.approx(0.5)
+    assert ramp_volume(0.0, 1.0, 0.1, CURVE_SMOOTH) < ramp_volume(0.0, 1.0, 0.1, CURVE_LINEAR)
+    # 分贝曲线：中点是两端的几何平均
+    assert ramp_volume(1.0, 0.01, 0.5, CURVE_DB) == pytest.approx(0.1)
+
+
+def test_settings_reject_unknown_curve():
+    with pytest.raises(ValueError):
+        DuckingSettings(curve='bounce')
+
+
+def make_ducker(settings=None, volume=0.8):
+    backend = FakeAudioSessionBackend(supports_events=False)
+    pid = backend.add_session(PLAYER)
+    backend.volumes[pid] = volume
+    scheduler = ManualScheduler()
+    timer = CountingTimer()
+    ducker = VolumeDucker(backend, PLAYER, scheduler, settings, step_ms=10, timer=timer)
+    return ducker, backend, scheduler, timer
+
+
+def test_duck_ramps_down_in_steps_then_restores():
+    ducker, backend, scheduler, timer = make_ducker(DuckingSettings(0.25, CURVE_LINEAR, 100, 50))
+    assert ducker.duck()
+    assert not ducker.duck()
+    assert ducker.ramping and timer.changes == [True]
+
+    scheduler.advance(0.05)
+    assert backend.get_process_volume(PLAYER) == pytest.approx(0.5, abs=0.01)
+    scheduler.advance(0.1)
+    assert backend.get_process_volume(PLAYER) == pytest.approx(0.2)
+    assert not ducker.ramping and timer.changes == [True, False]
+    assert scheduler.pending() == 0
+
+    assert ducker.restore()
+    scheduler.advance(0.1)
+    assert backend.get_process_volume(PLAYER) == pytest.approx(0.8)
+    assert ducker.restore_volume is None and not ducker.restore()
+
+
+def test_duck_during_restore_keeps_original_volume():
+    ducker, backend, scheduler, timer = make_ducker(DuckingSettings(0.0, CURVE_LINEAR, 100, 100))
+    ducker.duck()
+    scheduler.advance(0.2)
+    ducker.restore()
+    scheduler.advance(0.05)
+    assert 0.0 < backend.get_process_volume(PLAYER) < 0.8
+    ducker.duck()
+    scheduler.advance(0.2)
+    ducker.restore()
+    scheduler.advance(0.2)
+    assert backend.get_process_volume(PLAYER) == pytest.approx(0.8)
+    assert timer.changes[-1] is False
+
+
+def test_stop_restores_immediately_and_cancels_steps():
+    ducker, backend, scheduler, timer = make_ducker(DuckingSettings(0.0, CURVE_SMOOTH, 1000, 200))
+    ducker.duck()
+    scheduler.advance(0.3)
+    ducker.stop()
+    assert backend.get_process_volume(PLAYER) == pytest.approx(0.8)
+    assert scheduler.pending() == 0
+    assert not ducker.ducked and timer.changes == [True, False]
+
+
+def test_no_session_means_no_duck():
+    backend = FakeAudioSessionBackend(supports_events=False)
+    ducker = VolumeDucker(backend, PLAYER, ManualScheduler(), timer=CountingTimer())
+    assert not ducker.duck()
+
+
+def test_volume_errors_end_the_ramp():
+    errors = []
+    ducker, backend, scheduler, timer = make_ducker()
+    ducker.on_error = errors.append
+
+    def fail(process_name, volume):
+        raise OSError("会话已失效")
+
+    backend.set_process_volume = fail
+    ducker.duck()
+    assert len(errors) == 1 and not ducker.ramping
+    assert scheduler.pending() == 0 and timer.changes == [True, False]
@@ -0,0 +1,354 @@
+"""检测循环性能测试
+
+用合成的音频会话、进程和窗口接口驱动 MonitorEngine.step()（与实际运行相同的检测 → 判断 → 控制逻辑），
+时间使用虚拟时钟，不需要声卡、窗口系统或 Windows 接口，可以在 Linux 上运行。
+每个场景统计每次检测的耗时、内存分配（tracemalloc）以及每次检测对各个接口的调用次数：
+
+    python tick_bench.py
+    python tick_bench.py --scenario sessions_1000 --ticks 2000
+    python tick_bench.py --save tick_baseline.json       # 保存基准
+    python tick_bench.py --compare tick_baseline.json    # 与基准比较
+
+耗时中位数超过预算，或者与基准相比耗时、内存分配明显增加、接口调用次数增加时，以非零状态退出。
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+
+from app_log import set_log_level
+from audio_sessions import AudioSessionBackend, AudioSessionInfo, STATE_ACTIVE, STATE_INACTIVE
+from media_control import RecordingControlBackend
+from monitor_engine import MonitorEngine
+
+PLAYER = 'lx-music-desktop.exe'
+PLAYER_TITLE = '歌曲 - 歌手'
+TICK_SECONDS = 0.2  # 两次检测之间虚拟时钟前进的时间
+WARMUP_TICKS = 20  # 不计入统计的预热检测次数（填充缓存）
+DEFAULT_TICKS = 1000
+ALLOCATION_TICKS = 200  # tracemalloc 下统计内存分配的检测次数（tracemalloc 会明显拖慢运行）
+ACTIVITY_PERIOD_TICKS = 150  # 其他程序每隔这么多次检测播放一段声音
+ACTIVITY_LENGTH_TICKS = 50  # 每段声音持续的检测次数
+ACTIVE_SESSIONS = 3  # 同时发声的其他程序数量
+
+# 场景：音频会话数、进程数、顶层窗口数；process_churn / window_churn 表示播放器进程 / 窗口
+# 每次检测都变化，迫使进程索引 / 窗口缓存每次都全量扫描
+SCENARIOS = {
+    'sessions_10': dict(sessions=10, processes=100, windows=50),
+    'sessions_100': dict(sessions=100, processes=300, windows=100),
+    'sessions_1000': dict(sessions=1000, processes=1500, windows=200),
+    'processes_100': dict(sessions=10, processes=100, windows=50, process_churn=True),
+    'processes_1000': dict(sessions=10, processes=1000, windows=50, process_churn=True),
+    'windows_1000': dict(sessions=10, processes=100, windows=1000, window_churn=True),
+    'windows_5000': dict(sessions=10, processes=100, windows=5000, window_churn=True),
+}
+# 每个场景每次检测耗时中位数的预算（毫秒）
+TICK_BUDGETS_MS = {
+    'sessions_10': 1,
+    'sessions_100': 3,
+    'sessions_1000': 20,
+    'processes_100': 1,
+    'processes_1000': 3,
+    'windows_1000': 5,
+    'windows_5000': 20,
+}
+# 与基准比较时允许的增幅；耗时受机器负载影响，调用次数和内存分配是确定的
+LATENCY_TOLERANCE = 2.0
+ALLOCATION_TOLERANCE = 1.5
+CALLS_TOLERANCE = 0.01  # 接口调用次数是确定的，只允许舍入误差
+
+
+class CallCounter:
+    """按 '接口.方法' 统计调用次数"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def add(self, name, amount=1):
+        self.calls[name] = self.calls.get(name, 0) + amount
+
+    def reset(self):
+        self.calls = {}
+
+
+class SyntheticSessionBackend(AudioSessionBackend):
+    """合成的音频会话：播放器一个会话，其他程序按固定的模式发声"""
+    name = 'synthetic'
+
+    def __init__(self, count, counter):
+        super().__init__()
+        self.counter = counter
+        self.player_peak = 0.3
+        self._player = AudioSessionInfo(10, PLAYER, STATE_ACTIVE, self.player_peak,
+                                        f'C:\\Program Files\\lx-music\\{PLAYER}', 'LX Music')
+        self._others = [AudioSessionInfo(20 + i, f'app{i}.exe', STATE_ACTIVE if i % 4 == 0 else STATE_INACTIVE, 0.0,
+                                         f'C:\\Apps\\app{i}\\app{i}.exe', '')
+                        for i in range(count - 1)]
+
+    def advance(self, tick):
+        """按检测序号更新峰值：每个周期开头的一段时间里有几个程序发声，其余只有低于阈值的底噪"""
+        playing = tick % ACTIVITY_PERIOD_TICKS < ACTIVITY_LENGTH_TICKS
+        # 每个周期换一批程序发声，进程级的峰值历史会不断新建和过期
+        first = (tick // ACTIVITY_PERIOD_TICKS * ACTIVE_SESSIONS) % max(len(self._others), 1)
+        for i, session in enumerate(self._others):
+            if playing and first <= i < first + ACTIVE_SESSIONS:
+                session.peak = 0.2
+            else:
+                session.peak = 0.001 * ((tick + i) % 3)
+        self._player.peak = self.player_peak
+
+    def start_events(self):
+        return False
+
+    def get_sessions(self):
+        # 与 Windows 后端一样每次返回新的快照对象
+        self.counter.add('sessions.get_sessions')
+        self.counter.add('sessions.sessions', len(self._others) + 1)
+        return [AudioSessionInfo(s.pid, s.process_name, s.state, s.peak, s.exe_path, s.display_name)
+                for s in [self._player] + self._others]
+
+
+class SyntheticProcessApi:
+    """合成的进程列表，接口与 player_tracking.PsutilProcessApi 相同"""
+
+    def __init__(self, count, counter):
+        self.counter = counter
+        self._processes = {1000 + i: (f'proc{i}.exe', 1.0e9 + i) for i in range(count - 1)}
+        self.player_pid = 10
+        self._processes[self.player_pid] = (PLAYER, 1.0e9)
+        self._next_pid = 100000
+
+    def restart_player(self):
+        """播放器进程换了一个新的 pid（例如重启）"""
+        del self._processes[self.player_pid]
+        self.player_pid = self._next_pid
+        self._next_pid += 1
+        self._processes[self.player_pid] = (PLAYER, 1.0e9 + self.player_pid)
+
+    def iter_processes(self):
+        self.counter.add('processes.iter_processes')
+        for pid, (name, create_time) in list(self._processes.items()):
+            self.counter.add('processes.visited')
+            yield pid, name, create_time
+
+    def create_time(self, pid):
+        self.counter.add('processes.create_time')
+        process = self._processes.get(pid)
+        return process[1] if process is not None else None
+
+
+class SyntheticWindowApi:
+    """合成的顶层窗口，接口与 player_tracking.Win32WindowApi 相同"""
+
+    def __init__(self, count, processes, counter):
+        self.counter = counter
+        self.processes = processes
+        self._windows = {0x10000 + i: (2000 + i, f'窗口 {i}', i % 3 != 0) for i in range(count - 1)}
+        self._next_hwnd = 0x900000
+        self.player_hwnd = None
+        self.move_player_window()
+
+    def move_player_window(self):
+        """播放器窗口换了一个新的句柄，放在枚举顺序的最后"""
+        if self.player_hwnd is not None:
+            del self._windows[self.player_hwnd]
+        self.player_hwnd = self._next_hwnd
+        self._next_hwnd += 1
+        self._windows[self.player_hwnd] = (self.processes.player_pid, PLAYER_TITLE, True)
+
+    def list_windows(self):
+        self.counter.add('windows.list_windows')
+        return list(self._windows)
+
+    def is_window(self, hwnd):
+        self.counter.add('windows.is_window')
+        return hwnd in self._windows
+
+    def is_visible(self, hwnd):
+        self.counter.add('windows.is_visible')
+        return self._windows[hwnd][2]
+
+    def get_pid(self, hwnd):
+        self.counter.add('windows.get_pid')
+        if hwnd == self.player_hwnd:
+            return self.processes.player_pid
+        return self._windows[hwnd][0]
+
+    def get_title(self, hwnd):
+        self.counter.add('windows.get_title')
+        return self._windows[hwnd][1]
+
+
+class ScenarioResult:
+    __slots__ = ('name', 'ticks', 'samples_ms', 'alloc_peak_bytes', 'retained_bytes', 'calls', 'actions',
+                 'budget_ms', 'regressions')
+
+    def __init__(self, name, ticks, budget_ms):
+        self.name = name
+        self.ticks = ticks
+        self.budget_ms = budget_ms
+        self.samples_ms = []
+        self.alloc_peak_bytes = []  # 每次检测过程中内存峰值比检测前增加的字节数
+        self.retained_bytes = 0  # 全部检测结束后比开始时多占用的字节数
+        self.calls = {}  # 每次检测的平均调用次数
+        self.actions = 0
+        self.regressions = []
+
+    def percentile(self, q):
+        samples = sorted(self.samples_ms)
+        return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+
+    @property
+    def median_ms(self):
+        return statistics.median(self.samples_ms) if self.samples_ms else None
+
+    @property
+    def alloc_kib(self):
+        return statistics.mean(self.alloc_peak_bytes) / 1024 if self.alloc_peak_bytes else 0.0
+
+    @property
+    def passed(self):
+        return not self.regressions and self.median_ms is not None and self.median_ms <= self.budget_ms
+
+    def to_json(self):
+        return {'median_ms': self.median_ms, 'alloc_kib': self.alloc_kib, 'calls': self.calls}
+
+
+class _Scenario:
+    """一个场景的合成接口和引擎"""
+
+    def __init__(self, sessions, processes, windows, process_churn=False, window_churn=False):
+        self.counter = CallCounter()
+        self.now = 0.0
+        self.process_churn = process_churn
+        self.window_churn = window_churn
+        self.sessions = SyntheticSessionBackend(sessions, self.counter)
+        self.processes = SyntheticProcessApi(processes, self.counter)
+        self.windows = SyntheticWindowApi(windows, self.processes, self.counter)
+        self.control = RecordingControlBackend(on_send=self.on_send)
+        self.engine = MonitorEngine(PLAYER, audio_backend=self.sessions, window_api=self.windows,
+                                    process_api=self.processes, control_backend=self.control,
+                                    clock=lambda: self.now)
+        self.engine.primary.title_tracker = None  # 只测轮询读取标题的路径
+
+    def on_send(self, action):
+        self.counter.add('control.send')
+        self.sessions.player_peak = 0.3 if action == 'play' else 0.0
+
+    def tick(self, index):
+        """准备第 index 次检测的输入，执行检测并推进虚拟时钟"""
+        self.sessions.advance(index)
+        if self.process_churn:
+            self.processes.restart_player()
+        if self.window_churn or self.process_churn:
+            self.windows.move_player_window()
+        self.engine.step()
+        self.now += TICK_SECONDS
+
+
+def run_scenario(name, ticks, budget_ms, repeat=1):
+    """运行一个场景：先统计耗时和接口调用（重复 repeat 遍，取中位数最小的一遍，减少机器负载的干扰），
+    再在 tracemalloc 下重新运行一遍统计内存分配"""
+    params = SCENARIOS[name]
+    result = ScenarioResult(name, ticks, budget_ms)
+
+    for _ in range(repeat):
+        scenario = _Scenario(**params)
+        for i in range(WARMUP_TICKS):
+            scenario.tick(i)
+        scenario.counter.reset()
+        samples = []
+        for i in range(WARMUP_TICKS, WARMUP_TICKS + ticks):
+            start = time.perf_counter()
+            scenario.tick(i)
+            samples.append((time.perf_counter() - start) * 1000)
+        if not result.samples_ms or statistics.median(samples) < result.median_ms:
+            result.samples_ms = samples
+    # 合成接口和虚拟时钟都是确定的，每一遍的调用次数和操作都相同
+    result.calls = {key: value / ticks for key, value in sorted(scenario.counter.calls.items())}
+    result.actions = len(scenario.control.calls)
+
+    # tracemalloc 会明显拖慢运行，单独运行一遍
+    scenario = _Scenario(**params)
+    for i in range(WARMUP_TICKS):
+        scenario.tick(i)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(WARMUP_TICKS, WARMUP_TICKS + min(ticks, ALLOCATION_TICKS)):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            scenario.tick(i)
+            result.alloc_peak_bytes.append(tracemalloc.get_traced_memory()[1] - before)
+        result.retained_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def compare(result, baseline, latency_tolerance=LATENCY_TOLERANCE):
+    """与基准比较，把退化的项目写入 result.regressions"""
+    if baseline is None:
+        return
+    if result.median_ms > baseline['median_ms'] * latency_tolerance:
+        result.regressions.append(f"耗时 {result.median_ms:.3f} ms，基准 {baseline['median_ms']:.3f} ms")
+    if result.alloc_kib > baseline['alloc_kib'] * ALLOCATION_TOLERANCE + 1:
+        result.regressions.append(f"内存分配 {result.alloc_kib:.1f} KiB，基准 {baseline['alloc_kib']:.1f} KiB")
+    for key, value in result.calls.items():
+        base = baseline['calls'].get(key, 0.0)
+        if value > base + CALLS_TOLERANCE:
+            result.regressions.append(f"{key} 每次检测 {value:.2f} 次，基准 {base:.2f} 次")
+
+
+def print_report(results):
+    print(f"{'场景':<16}{'中位数(ms)':>12}{'p95(ms)':>10}{'最大(ms)':>10}{'预算(ms)':>10}"
+          f"{'分配(KiB)':>11}{'留存(KiB)':>11}{'操作':>6}  结果")
+    for result in results:
+        status = '通过' if result.passed else '超出预算'
+        if result.regressions:
+            status = '退化: ' + '；'.join(result.regressions)
+        print(f"{result.name:<16}{result.median_ms:>12.3f}{result.percentile(0.95):>10.3f}"
+              f"{max(result.samples_ms):>10.3f}{result.budget_ms:>10.1f}{result.alloc_kib:>11.1f}"
+              f"{result.retained_bytes / 1024:>11.1f}{result.actions:>6}  {status}")
+        calls = ', '.join(f"{key}={value:.2f}" for key, value in result.calls.items())
+        print(f"{'':<16}每次检测的调用: {calls}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="用合成的会话、进程和窗口接口测试检测循环的性能")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help="只运行指定的场景，可重复")
+    parser.add_argument('--ticks', type=int, default=DEFAULT_TICKS, help="每个场景统计的检测次数")
+    parser.add_argument('--repeat', type=int, default=3, help="每个场景统计耗时的遍数，取中位数最小的一遍")
+    parser.add_argument('--save', metavar='文件', help="把结果保存为基准")
+    parser.add_argument('--compare', metavar='文件', help="与保存的基准比较")
+    parser.add_argument('--latency-tolerance', type=float, default=LATENCY_TOLERANCE,
+                        help="与基准比较时允许的耗时倍数")
+    args = parser.parse_args(argv)
+
+    set_log_level(logging.CRITICAL)  # 日志输出不计入检测耗时
+    baselines = {}
+    if args.compare:
+        try:
+            with open(args.compare, encoding='utf-8') as f:
+                baselines = json.load(f)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"无法读取基准 {args.compare}: {e}")
+
+    results = []
+    for name in args.scenario or SCENARIOS:
+        result = run_scenario(name, args.ticks, TICK_BUDGETS_MS[name], args.repeat)
+        compare(result, baselines.get(name), args.latency_tolerance)
+        results.append(result)
+    print_report(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({result.name: result.to_json() for result in results}, f, ensure_ascii=False, indent=2)
+    return 0 if all(result.passed for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""回放音频活动记录
+
+把 activity_trace 记录文件中每次检测看到的会话峰值和播放器标题重新送进 MonitorEngine，
+使用与实际运行完全相同的判断逻辑（阈值、回差、冷却时间、重试），但不调用任何 Windows 接口，
+时间也按记录中的时间推进。回放得到的控制操作与记录中的操作逐一比较，用来复现现场问题、
+以及在调整 PEAK_THRESHOLD 等参数或修改判断逻辑后检查决策有什么变化。
+记录中的峰值和标题是播放器对当时实际发送的操作的反应，回放的操作第一次与记录不同之后，
+后面的差异只能作为参考。
+回放默认使用记录时的检测参数和程序规则（CONFIG 记录），命令行指定的参数优先；
+文件中每一段（一次运行的记录）用新的引擎回放。
+
+    python headless.py --record trace.bin          # 记录
+    python trace_replay.py dump trace.bin          # 查看记录内容
+    python trace_replay.py replay trace.bin        # 回放并比较操作
+    python trace_replay.py replay trace.bin --rule ignore:process:game.exe
+    python trace_replay.py replay trace.bin --calibrate
+
+回放时操作完全相同返回 0，有差异返回 1。
+"""
+import argparse
+import logging
+import sys
+
+from activity_trace import (TraceReader, ACTION_NAMES, REC_ACTION, REC_CONFIG, REC_CONFIRM, REC_DECISION,
+                            REC_PLAYER, REC_PLAYER_CONFIG, REC_SEGMENT, REC_SESSION, REC_TICK, TICK_CONFIRM)
+from app_log import set_log_level, setup_logging
+from audio_sessions import AudioSessionBackend, AudioSessionInfo
+from media_control import RecordingControlBackend
+from monitor_engine import DetectionSettings, MonitorEngine, NOTIFY_DUCKED
+from player_profiles import RESUME_MODES, RESUME_IF_PAUSED
+
+ACTION_TIME_TOLERANCE = 1e-6  # 比较操作时间时允许的误差（秒）
+
+
+class ReplayAudioBackend(AudioSessionBackend):
+    """返回记录中当前这次检测的会话快照；会话音量只保存在内存中（音量闪避模式）"""
+    name = 'replay'
+    supports_volume = True
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = []
+        self.volumes = {}  # 进程名 -> 音量
+
+    def start_events(self):
+        return False
+
+    def get_sessions(self):
+        return list(self.sessions)
+
+    def get_process_volume(self, process_name):
+        if not any(session.process_name == process_name for session in self.sessions):
+            return None
+        return self.volumes.get(process_name, 1.0)
+
+    def set_process_volume(self, process_name, volume):
+        self.volumes[process_name] = volume
+        return 1
+
+
+class _ReplayProcessIndex:
+    """代替 PlayerProcessIndex，进程是否运行由记录决定"""
+
+    def __init__(self):
+        self.pids = []
+
+    def get_pids(self):
+        return self.pids
+
+    def set_process_name(self, process_name):
+        pass
+
+    def request_scan(self):
+        pass
+
+
+class _ReplayWindowCache:
+    """代替 PlayerWindowCache，窗口标题由记录决定"""
+
+    def __init__(self):
+        self.title = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_title(self, player_pids):
+        return self.title
+
+    def get_window(self, player_pids):
+        return None
+
+    def invalidate(self):
+        pass
+
+
+class ReplayAction:
+    """一次控制操作"""
+    __slots__ = ('time', 'process_name', 'action')
+
+    def __init__(self, time, process_name, action):
+        self.time = time
+        self.process_name = process_name
+        self.action = action
+
+    def __repr__(self):
+        return f"{self.time:.3f}s {self.process_name} {self.action}"
+
+    def same_as(self, other):
+        return (self.process_name == other.process_name and self.action == other.action
+                and abs(self.time - other.time) <= ACTION_TIME_TOLERANCE)
+
+
+class TraceReplay:
+    """把一个记录文件送进新建的 MonitorEngine，每一段记录用一个新的引擎
+
+    默认使用记录中的检测参数和程序规则（没有 CONFIG 记录的旧文件使用引擎的默认值）。
+    session_rules 不为 None 时代替记录中的规则，可以传入不同的规则比较效果；
+    detection（DetectionSettings）不为 None 时代替记录中的检测参数；
+    auto_calibrate 不为 None 时只替换记录中的这一个参数，例如比较开启自动校准阈值后的效果。
+    """
+
+    def __init__(self, path, session_rules=None, detection=None, auto_calibrate=None):
+        self.path = path
+        self.session_rules = session_rules
+        self.detection = detection
+        self.auto_calibrate = auto_calibrate
+        self.now = 0.0
+        self.audio_backend = ReplayAudioBackend()
+        self.engine = None
+        self.config = {}  # 当前这一段记录中的检测参数和程序规则
+        self.recorded = []  # 记录中的操作
+        self.replayed = []  # 回放得到的操作
+        self.recorded_confirmations = 0
+        self.finished_confirmations = 0  # 已经结束的段中回放的确认结果数
+        self.segments = 0
+        self.ticks = 0
+
+    def run(self):
+        """回放整个记录，返回 self"""
+        with TraceReader(self.path) as reader:
+            pending = None
+            for record in reader:
+                if record.kind == REC_TICK:
+                    self._step(pending)
+                    pending = record
+                elif record.kind == REC_SEGMENT:
+                    self._step(pending)
+                    pending = None
+                    self._start_segment()
+                elif record.kind == REC_CONFIG:
+                    self._apply_config(record.ref)
+                elif record.kind == REC_PLAYER_CONFIG:
+                    self._configure_player(record.ref, record.a, record.b, bool(record.flags & 1))
+                elif record.kind == REC_SESSION:
+                    state, exe_path, display_name = record.b
+                    self.audio_backend.sessions.append(
+                        AudioSessionInfo(record.a, record.ref, state, record.value, exe_path, display_name))
+                elif record.kind == REC_PLAYER:
+                    player = self._player(record.ref)
+                    player.index.pids = [0] if record.b else []
+                    player.window_cache.title = record.a
+                elif record.kind == REC_ACTION and record.b and pending is not None:
+                    # 按操作所在的那次检测的时间比较，回放中的操作时间也是检测时间
+                    self.recorded.append(ReplayAction(pending.time, record.ref, ACTION_NAMES.get(record.a, '?')))
+                elif record.kind == REC_CONFIRM:
+                    self.recorded_confirmations += 1
+            self._step(pending)
+        if not self.segments and self.ticks:
+            # 没有分段记录的旧文件整体是一段
+            self.segments = 1
+        return self
+
+    def _start_segment(self):
+        """新的一段记录：时钟和引擎状态都从头开始"""
+        if self.engine is not None:
+            self.finished_confirmations += self.replayed_confirmations
+            self.engine = None
+        self.audio_backend = ReplayAudioBackend()
+        self.config = {}
+        self.segments += 1
+
+    def detection_settings(self):
+        """这一段回放使用的检测参数：命令行指定的优先，其次是记录中的"""
+        if self.detection is not None:
+            return self.detection
+        data = dict(self.config.get('detection') or {})
+        if self.auto_calibrate is not None:
+            data['auto_calibrate'] = self.auto_calibrate
+        return DetectionSettings.from_json(data)
+
+    def rules(self):
+        """这一段回放使用的程序规则，None 表示引擎的默认规则"""
+        if self.session_rules is not None:
+            return self.session_rules
+        return self.config.get('session_rules')
+
+    def _apply_config(self, config):
+        self.config = config if isinstance(config, dict) else {}
+        if self.engine is None:
+            return
+        # 记录中途修改了配置：回放中没有调度线程，直接替换
+        self.engine._apply_detection(self.detection_settings())
+        rules = self.rules()
+        if rules is not None:
+            self.engine.set_session_rules(rules)
+
+    def _ensure_engine(self, process_name):
+        if self.engine is None:
+            self.engine = MonitorEngine(process_name, audio_backend=self.audio_backend,
+                                        control_backend=self._control_backend(process_name),
+                                        session_rules=self.rules(), clock=lambda: self.now,
+                                        detection=self.detection_settings())
+            self.engine.add_listener(self._on_engine_notified)
+            self._prepare(self.engine.primary)
+        return self.engine
+
+    def _on_engine_notified(self, kind, value):
+        if kind == NOTIFY_DUCKED:
+            process_name, ducked = value
+            self.replayed.append(ReplayAction(self.now, process_name, 'duck' if ducked else 'restore'))
+
+    def _control_backend(self, process_name):
+        return RecordingControlBackend(on_send=lambda action: self.replayed.append(
+            ReplayAction(self.now, process_name, action)))
+
+    def _prepare(self, player):
+        player.index = _ReplayProcessIndex()
+        player.window_cache = _ReplayWindowCache()
+        player.title_tracker = None
+
+    def _configure_player(self, process_name, resume, index, duck=False):
+        """按记录的播放器配置建立播放器：序号 0 为主播放器，其他用 add_player 添加"""
+        engine = self._ensure_engine(process_name)
+        if resume not in RESUME_MODES:
+            resume = RESUME_IF_PAUSED
+        if index < len(engine.players):
+            player = engine.players[index]
+            if player.process_name != process_name:
+                engine.reset_player_tracking(player, process_name)
+                player.control_backend = self._control_backend(player.process_name)
+            player.resume = resume
+            player.duck = duck
+            return
+        player = engine.add_player(process_name, resume=resume,
+                                   control_backend=self._control_backend(process_name.strip().lower()), duck=duck)
+        self._prepare(player)
+
+    def _player(self, process_name):
+        engine = self._ensure_engine(process_name)
+        player = engine.players_by_process.get(process_name)
+        if player is None:
+            # 没有配置记录（例如中途开始记录的旧文件）的播放器按附加播放器处理
+            self._configure_player(process_name, RESUME_IF_PAUSED, len(engine.players))
+            player = engine.players_by_process[process_name]
+        return player
+
+    def _step(self, tick):
+        """按记录中的时间执行一次检测"""
+        if tick is None:
+            return
+        if self.engine is not None:
+            self.now = tick.time
+            self.engine.step()
+            self.ticks += 1
+        self.audio_backend.sessions = []
+
+    @property
+    def replayed_confirmations(self):
+        if self.engine is None:
+            return self.finished_confirmations
+        counters = self.engine.metrics.counters
+        return self.finished_confirmations + counters.get('confirmed', 0) + counters.get('confirm_timeouts', 0)
+
+    def differences(self):
+        """记录与回放不同的操作：[(序号, 记录中的操作或None, 回放的操作或None)]"""
+        diffs = []
+        for i in range(max(len(self.recorded), len(self.replayed))):
+            recorded = self.recorded[i] if i < len(self.recorded) else None
+            replayed = self.replayed[i] if i < len(self.replayed) else None
+            if recorded is None or replayed is None or not recorded.same_as(replayed):
+                diffs.append((i, recorded, replayed))
+        return diffs
+
+
+def dump(path, limit=None):
+    """逐条打印记录"""
+    names = {REC_TICK: 'TICK', REC_SESSION: 'SESSION', REC_PLAYER: 'PLAYER', REC_DECISION: 'DECISION',
+             REC_ACTION: 'ACTION', REC_CONFIRM: 'CONFIRM', REC_PLAYER_CONFIG: 'PLAYER_CONFIG', REC_SEGMENT: 'SEGMENT',
+             REC_CONFIG: 'CONFIG'}
+    with TraceReader(path) as reader:
+        print(f"{path}: {len(reader)} 条记录")
+        for i, record in enumerate(reader):
+            if limit is not None and i >= limit:
+                break
+            kind = names.get(record.kind, record.kind)
+            if record.kind == REC_TICK:
+                print(f"{record.time:.3f}s {kind} {'confirm' if record.a == TICK_CONFIRM else 'full'}")
+            elif record.kind == REC_SESSION:
+                state, exe_path, display_name = record.b
+                print(f"  {kind} {record.ref} pid={record.a} state={state} peak={record.value:.6f}"
+                      f"{' path=' + exe_path if exe_path else ''}{' display=' + display_name if display_name else ''}")
+            elif record.kind == REC_PLAYER:
+                print(f"  {kind} {record.ref} running={bool(record.b)} title={record.a!r}")
+            elif record.kind == REC_DECISION:
+                print(f"  {kind} {record.ref} other_playing={bool(record.a)} playing={bool(record.b)}")
+            elif record.kind == REC_ACTION:
+                print(f"  {kind} {record.ref} {ACTION_NAMES.get(record.a, '?')} sent={bool(record.b)} "
+                      f"({record.value * 1000:.1f} ms)")
+            elif record.kind == REC_CONFIRM:
+                print(f"  {kind} {record.ref} {'confirmed' if record.a == 1 else 'timeout'} "
+                      f"({record.value * 1000:.0f} ms)")
+            elif record.kind == REC_PLAYER_CONFIG:
+                print(f"{kind} {record.ref} resume={record.a} index={record.b}{' duck' if record.flags & 1 else ''}")
+            elif record.kind == REC_SEGMENT:
+                print(f"--- {kind} ---")
+            elif record.kind == REC_CONFIG:
+                detection = record.ref.get('detection') or {}
+                print(f"{kind} {' '.join(f'{name}={value}' for name, value in detection.items())}"
+                      f" rules={record.ref.get('session_rules') or []}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="查看或回放音频活动记录")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    dump_parser = subparsers.add_parser("dump", help="打印记录内容")
+    dump_parser.add_argument("trace", help="记录文件")
+    dump_parser.add_argument("--limit", type=int, help="最多打印的记录条数")
+    replay_parser = subparsers.add_parser("replay", help="用当前的判断逻辑回放记录并比较操作")
+    replay_parser.add_argument("trace", help="记录文件")
+    replay_parser.add_argument("--rule", action="append", default=None, metavar="动作:匹配方式:模式[:阈值]",
+                               help="代替记录中的其他程序处理规则，可重复")
+    replay_parser.add_argument("--calibrate", action="store_true", default=None,
+                               help="回放时按学习到的本底噪声自动设置阈值（其他检测参数仍使用记录中的）")
+    replay_parser.add_argument("--verbose", action="store_true", help="输出引擎日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.command == "dump":
+            dump(args.trace, args.limit)
+            return 0
+        if args.verbose:
+            setup_logging(logging.DEBUG, console=True)
+        else:
+            set_log_level(logging.CRITICAL)
+        replay = TraceReplay(args.trace, args.rule, auto_calibrate=args.calibrate).run()
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print(f"回放 {replay.segments} 段 {replay.ticks} 次检测：记录中 {len(replay.recorded)} 次操作，回放 {len(replay.replayed)} 次操作；"
+          f"确认结果 记录 {replay.recorded_confirmations} / 回放 {replay.replayed_confirmations}")
+    diffs = replay.differences()
+    if not diffs:
+        print("操作完全一致")
+        return 0
+    print(f"{len(diffs)} 处操作不同：")
+    for i, recorded, replayed in diffs[:50]:
+        print(f"  #{i}: 记录 {recorded or '-'}  回放 {replayed or '-'}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""音量闪避：用播放器会话的音量代替快捷键暂停
+
+其他程序开始播放时，把播放器会话的音量按曲线渐变降到 DUCK_LEVEL（默认静音），
+停止后再渐变恢复到原来的音量。播放器一直在播放，不需要注入快捷键，也不会因为播放/暂停状态判断错误
+而按反，恢复时没有重新缓冲的停顿。
+
+渐变在引擎的调度线程中按固定步长执行（Windows 上每一步的音量设置再交给音频 COM 线程）；
+渐变期间在 Windows 上把系统定时器精度提高到 1 毫秒，步长才能稳定在 DUCK_STEP_MS 左右，结束后恢复。
+"""
+import math
+import sys
+import threading
+
+DUCK_LEVEL = 0.0  # 闪避时的音量（相对于原来音量的比例，0 为静音）
+DUCK_CURVE = 'smooth'  # 渐变曲线，见 DUCK_CURVES
+DUCK_DOWN_MS = 800  # 降低音量的渐变时长（毫秒）
+DUCK_UP_MS = 200  # 恢复音量的渐变时长（毫秒），0 为立即恢复
+DUCK_STEP_MS = 10  # 渐变的步长（毫秒）
+DB_CURVE_FLOOR = 0.001  # 'db' 曲线按分贝线性变化，音量 0 按 -60 dB 计算，最后一步再设为 0
+
+CURVE_LINEAR = 'linear'  # 音量线性变化
+CURVE_SMOOTH = 'smooth'  # 开始和结束时变化较慢（余弦）
+CURVE_DB = 'db'  # 分贝线性变化，听感上均匀
+DUCK_CURVES = (CURVE_LINEAR, CURVE_SMOOTH, CURVE_DB)
+
+
+def ramp_volume(start, end, progress, curve=CURVE_SMOOTH):
+    """渐变进行到 progress（0.0-1.0）时的音量"""
+    if progress >= 1.0:
+        return end
+    if progress <= 0.0:
+        return start
+    if curve == CURVE_DB:
+        low = max(start, DB_CURVE_FLOOR)
+        high = max(end, DB_CURVE_FLOOR)
+        return low * (high / low) ** progress
+    if curve == CURVE_SMOOTH:
+        progress = (1.0 - math.cos(math.pi * progress)) / 2
+    return start + (end - start) * progress
+
+
+class DuckingSettings:
+    """音量闪避参数，默认值为上面的配置"""
+    __slots__ = ('level', 'curve', 'down_ms', 'up_ms')
+
+    def __init__(self, level=DUCK_LEVEL, curve=DUCK_CURVE, down_ms=DUCK_DOWN_MS, up_ms=DUCK_UP_MS):
+        if curve not in DUCK_CURVES:
+            raise ValueError(f"未知的渐变曲线: {curve}")
+        self.level = level
+        self.curve = curve
+        self.down_ms = down_ms
+        self.up_ms = up_ms
+
+    def __eq__(self, other):
+        return isinstance(other, DuckingSettings) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"DuckingSettings({', '.join(f'{name}={getattr(self, name)}' for name in self.__slots__)})"
+
+
+class HighResolutionTimer:
+    """引用计数的系统定时器精度请求（Windows 的 timeBeginPeriod），其他平台什么都不做"""
+
+    def __init__(self, period_ms=1):
+        self.period_ms = period_ms
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+            if self._users == 1:
+                self._set(True)
+
+    def release(self):
+        with self._lock:
+            if not self._users:
+                return
+            self._users -= 1
+            if not self._users:
+                self._set(False)
+
+    def _set(self, enabled):
+        if sys.platform != 'win32':
+            return
+        import ctypes
+        winmm = ctypes.windll.winmm
+        if enabled:
+            winmm.timeBeginPeriod(self.period_ms)
+        else:
+            winmm.timeEndPeriod(self.period_ms)
+
+
+high_resolution_timer = HighResolutionTimer()
+
+
+class VolumeRamp:
+    """一次音量渐变"""
+    __slots__ = ('start_volume', 'end_volume', 'started', 'duration', 'curve', 'steps')
+
+    def __init__(self, start_volume, end_volume, started, duration, curve):
+        self.start_volume = start_volume
+        self.end_volume = end_volume
+        self.started = started
+        self.duration = duration
+        self.curve = curve
+        self.steps = 0
+
+    def volume(self, now):
+        """返回 (当前应设置的音量, 是否已结束)"""
+        progress = (now - self.started) / self.duration if self.duration > 0 else 1.0
+        return ramp_volume(self.start_volume, self.end_volume, progress, self.curve), progress >= 1.0
+
+
+class VolumeDucker:
+    """渐变降低和恢复一个播放器的会话音量（只在引擎的调度线程中使用）
+
+    backend 是音频会话后端（get_process_volume / set_process_volume），
+    scheduler 是引擎的调度器，on_error(exception) 在设置音量失败时调用。
+    """
+
+    def __init__(self, backend, process_name, scheduler, settings=None, on_error=None, step_ms=DUCK_STEP_MS,
+                 timer=high_resolution_timer):
+        self.backend = backend
+        self.process_name = process_name
+        self.scheduler = scheduler
+        self.settings = settings or DuckingSettings()
+        self.on_error = on_error
+        self.step = step_ms / 1000
+        self.timer = timer
+        self.ducked = False
+        self.restore_volume = None  # 闪避前的音量，降低或恢复音量的过程中不为 None
+        self.ramp = None
+        self._task = None
+
+    @property
+    def ramping(self):
+        return self.ramp is not None
+
+    def duck(self):
+        """开始降低音量，返回是否开始了（播放器没有会话时返回 False）"""
+        if self.ducked:
+            return False
+        current = self.backend.get_process_volume(self.process_name)
+        if current is None:
+            return False
+        if self.restore_volume is None:
+            # 恢复渐变还没结束时保留原来记下的音量
+            self.restore_volume = current
+        self.ducked = True
+        self._start(current, self.restore_volume * self.settings.level, self.settings.down_ms)
+        return True
+
+    def restore(self):
+        """开始恢复音量，返回是否需要恢复"""
+        if not self.ducked:
+            return False
+        self.ducked = False
+        current = self.backend.get_process_volume(self.process_name)
+        if current is None:
+            # 播放器的会话已经不在了，下次出现时是新会话的音量
+            self._finish()
+            self.restore_volume = None
+            return True
+        self._start(current, self.restore_volume, self.settings.up_ms)
+        return True
+
+    def stop(self, restore=True):
+        """取消渐变；restore 为 True 且处于闪避状态时立即恢复原来的音量"""
+        self._finish()
+        if restore and self.restore_volume is not None:
+            try:
+                self.backend.set_process_volume(self.process_name, self.restore_volume)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+        self.ducked = False
+        self.restore_volume = None
+
+    def _start(self, start_volume, end_volume, duration_ms):
+        self._cancel_task()
+        if self.ramp is None:
+            self.timer.acquire()
+        self.ramp = VolumeRamp(start_volume, end_volume, self.scheduler.time(), duration_ms / 1000,
+                               self.settings.curve)
+        self._step()
+
+    def _step(self):
+        """设置这一步的音量并安排下一步（按渐变开始时间计算，不累积延迟）"""
+        self._task = None
+        ramp = self.ramp
+        if ramp is None:
+            return
+        now = self.scheduler.time()
+        volume, done = ramp.volume(now)
+        try:
+            self.backend.set_process_volume(self.process_name, volume)
+        except Exception as e:
+            self._finish()
+            if self.on_error is not None:
+                self.on_error(e)
+            return
+        if done:
+            self._finish()
+            if not self.ducked:
+                self.restore_volume = None
+            return
+        ramp.steps = max(ramp.steps + 1, int((now - ramp.started) / self.step) + 1)
+        self._task = self.scheduler.call_at(ramp.started + ramp.steps * self.step, self._step)
+
+    def _cancel_task(self):
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+
+    def _finish(self):
+        self._cancel_task()
+        if self.ramp is not None:
+            self.ramp = None
+            self.timer.release()
@@ -1,25 +1,153 @@
-from pycaw.pycaw import AudioUtilities, IAudioMeterInformation
-import comtypes
-import time
-import pyautogui
-import psutil
-import win32gui
-import win32process
 import sys
 import os
+import gc
 import math  # 添加math模块导入
+import logging
+import time
+STARTUP_STARTED = time.perf_counter()  # 在导入Qt之前记录，用于统计启动到首帧绘制的耗时
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QLabel, QPushButton, 
-                            QVBoxLayout, QHBoxLayout, QWidget, QTextEdit, 
-                            QCheckBox, QFrame, QLineEdit)  # 添加QLineEdit导入
-from PyQt6.QtCore import QTimer, Qt, QPoint
+                            QVBoxLayout, QHBoxLayout, QWidget, QPlainTextEdit, 
+                            QCheckBox, QFrame, QLineEdit, QMenu, QStyle, QSystemTrayIcon)  # 添加QLineEdit导入
+from PyQt6.QtCore import QEvent, QObject, QTimer, Qt, QPoint, pyqtSignal
 from PyQt6.QtGui import QIcon, QPixmap, QFont, QColor, QPainter, QPen, QCursor
+from app_log import DEFAULT_LOG_FILE, get_logger, setup_logging, set_log_level, shutdown_logging
+from config_store import ConfigStore, parse_hotkey
+from monitor_engine import MonitorEngine, NOTIFY_RUNNING, NOTIFY_TICK_RATE, NOTIFY_METRICS
+
+# 配置部分（检测和控制相关的配置见 monitor_engine.py）
+LOG_RING_CAPACITY = 2000  # 内存中保留的日志条数
+LOG_VIEW_MAX_LINES = 1000  # 日志窗口最多显示的行数
+LOG_VIEW_FLUSH_MS = 250  # 日志窗口批量刷新的间隔（毫秒）
+LOG_FILE = DEFAULT_LOG_FILE  # 日志文件（按大小自动轮转）
+LOG_FILE_MAX_BYTES = 1024 * 1024  # 单个日志文件的大小上限
+LOG_FILE_BACKUP_COUNT = 3  # 保留的旧日志文件个数
+STARTUP_PROBE_ENV = "MUSIC_ALWAYS_PLAY_STARTUP_PROBE"  # 设置后首帧绘制完成即输出启动耗时并退出（startup_bench.py 使用）
+CONFIG_EDIT_DEBOUNCE_MS = 600  # 输入停止这么久后才校验并保存设置（毫秒），按回车或离开输入框时立即保存
+TRAY_RSS_SETTLE_MS = 1000  # 托盘模式下窗口销毁后等这么久再测量内存占用（毫秒）
+TRAY_PROBE_ENV = "MUSIC_ALWAYS_PLAY_TRAY_PROBE"  # 设置后首帧绘制完成即关闭窗口进入托盘模式，输出前后的内存占用并退出（startup_bench.py 使用）
+
+# 主题配色：界面样式表和标题栏图标都从这里取颜色
+THEME_FONT_FAMILY = "PingFang SC, Microsoft YaHei UI, Microsoft YaHei, SimHei, sans-serif"
+THEMES = {
+    'light': {
+        'window_bg': '#F5F5F5', 'title_bar_bg': '#E0E0E0', 'status_bg': '#E8E8E8', 'text': '#333333',
+        'input_bg': '#FFFFFF', 'border': '#CCCCCC', 'scroll_bg': '#F0F0F0', 'scroll_handle': '#CCCCCC',
+        'scroll_hover': '#AAAAAA', 'icon': '#333333',
+    },
+    'dark': {
+        'window_bg': '#2D2D30', 'title_bar_bg': '#1E1E1E', 'status_bg': '#333337', 'text': '#FFFFFF',
+        'input_bg': '#252526', 'border': '#3F3F46', 'scroll_bg': '#2A2A2A', 'scroll_handle': '#555555',
+        'scroll_hover': '#666666', 'icon': None,  # 暗色模式使用按钮自己的图标颜色
+    },
+}
+
+# 样式规则：(选择器, 声明)，声明中的 {颜色名} 按主题替换；
+# 带颜色的规则为每个主题各生成一份，以窗口的动态属性 theme 区分
+STYLE_RULES = (
+    ('*', f"font-family: {THEME_FONT_FAMILY}; font-size: 15px; letter-spacing: 0.3px;"),
+    ('#windowFrame', "background-color: {window_bg}; border-radius: 8px;"),
+    ('#titleBar', "background-color: {title_bar_bg}; border-top-left-radius: 8px; border-top-right-radius: 8px;"),
+    ('#titleLabel', "color: {text}; font-size: 16px; font-weight: bold;"),
+    ('#contentFrame', "background-color: {window_bg}; border-bottom-left-radius: 8px; border-bottom-right-radius: 8px;"),
+    ('#statusFrame', "background-color: {status_bg}; border-radius: 4px; padding: 5px;"),
+    ('QLabel', "color: {text};"),
+    ('QLabel[role="metrics"]', "font-size: 12px; color: #888888;"),  # 状态栏里的检测统计
+    ('QPlainTextEdit', "background-color: {input_bg}; color: {text}; border: 1px solid {border}; border-radius: 4px; "
+                       "font-family: \"Consolas\", \"Microsoft YaHei UI\", monospace; font-size: 14px; line-height: 1.5;"),
+    ('QScrollBar:vertical', "background: {scroll_bg}; width: 12px; margin: 0px;"),
+    ('QScrollBar::handle:vertical', "background: {scroll_handle}; min-height: 20px; border-radius: 6px;"),
+    ('QScrollBar::handle:vertical:hover', "background: {scroll_hover};"),
+    ('QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical', "height: 0px;"),
+    ('QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical', "background: none;"),
+    ('QScrollBar:horizontal', "background: {scroll_bg}; height: 12px; margin: 0px;"),
+    ('QScrollBar::handle:horizontal', "background: {scroll_handle}; min-width: 20px; border-radius: 6px;"),
+    ('QScrollBar::handle:horizontal:hover', "background: {scroll_hover};"),
+    ('QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal', "width: 0px;"),
+    ('QScrollBar::add-page:horizontal, QScrollBar::sub-page:horizontal', "background: none;"),
+    ('QLineEdit', "background-color: {input_bg}; color: {text}; border: 1px solid {border}; border-radius: 4px; "
+                  "padding: 4px 8px; selection-background-color: #0078D7; selection-color: white;"),
+    ('QLineEdit[invalid="true"]', "border: 1px solid #E81123;"),  # 输入的设置未通过校验
+    ('QPushButton', "background-color: #0078D7; color: white; border: none; border-radius: 4px; "
+                    "padding: 8px 16px; font-weight: bold;"),
+    ('QPushButton:hover', "background-color: #1C97EA;"),
+    ('QPushButton:pressed', "background-color: #0063B1;"),
+    ('QCheckBox', "color: {text};"),
+    ('QCheckBox::indicator', "width: 18px; height: 18px; border: 1px solid {border}; border-radius: 3px;"),
+    ('QCheckBox::indicator:checked', "background-color: #0078D7; border: 1px solid #0078D7;"),
+)
+
+_theme_stylesheet = None
+
+
+def resident_memory_mb():
+    """当前进程的常驻内存（MB），无法获取时返回 None；psutil 在第一次测量时才导入"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except (ImportError, OSError):
+        return None
+
+
+def theme_stylesheet():
+    """包含所有主题的样式表，只生成一次；切换主题只需修改窗口的 theme 属性"""
+    global _theme_stylesheet
+    if _theme_stylesheet is None:
+        rules = []
+        for selector, declarations in STYLE_RULES:
+            if '{' not in declarations:
+                rules.append(f"{selector} {{ {declarations} }}")
+                continue
+            for theme, colors in THEMES.items():
+                themed = ', '.join(f'*[theme="{theme}"] {part.strip()}' for part in selector.split(','))
+                rules.append(f"{themed} {{ {declarations.format(**colors)} }}")
+        _theme_stylesheet = "\n".join(rules)
+    return _theme_stylesheet
+
+
+# 太阳图标 8 道光芒的方向（每 45 度一道，取整到 -1/0/1）
+SUN_RAY_DIRECTIONS = tuple((round(math.cos(math.radians(angle))), round(math.sin(math.radians(angle))))
+                           for angle in range(0, 360, 45))
+_title_icon_cache = {}  # (按钮类型, 主题, 图标颜色, 尺寸, 设备像素比) -> QPixmap
+
+
+def title_icon_pixmap(kind, theme, color, width, height, ratio):
+    """标题栏按钮图标，按主题和DPI缓存，重绘时直接贴图"""
+    key = (kind, theme, color, width, height, ratio)
+    pixmap = _title_icon_cache.get(key)
+    if pixmap is not None:
+        return pixmap
+    pixmap = QPixmap(round(width * ratio), round(height * ratio))
+    pixmap.setDevicePixelRatio(ratio)
+    pixmap.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    pen = QPen(QColor(color))
+    pen.setWidth(1)
+    painter.setPen(pen)
+    center_x = width // 2
+    center_y = height // 2
+    if kind == "closeButton":
+        # 绘制X形状
+        painter.drawLine(center_x - 8, center_y - 8, center_x + 8, center_y + 8)
+        painter.drawLine(center_x + 8, center_y - 8, center_x - 8, center_y + 8)
+    elif kind == "minimizeButton":
+        # 绘制-形状
+        painter.drawLine(center_x - 8, center_y, center_x + 8, center_y)
+    elif kind == "themeButton":
+        if theme == 'light':
+            # 绘制月亮图标，再用标题栏背景色画出月亮阴影
+            painter.drawEllipse(center_x - 7, center_y - 7, 14, 14)
+            painter.setBrush(QColor(THEMES[theme]['title_bar_bg']))
+            painter.drawEllipse(center_x - 3, center_y - 9, 12, 12)
+        else:
+            # 绘制太阳图标和光芒
+            painter.drawEllipse(center_x - 5, center_y - 5, 10, 10)
+            for dx, dy in SUN_RAY_DIRECTIONS:
+                painter.drawLine(center_x + 7 * dx, center_y + 7 * dy, center_x + 10 * dx, center_y + 10 * dy)
+    painter.end()
+    _title_icon_cache[key] = pixmap
+    return pixmap
 
-# 配置部分
-# 修改为可配置的音乐播放器设置
-DEFAULT_MUSIC_PLAYER = 'lx-music-desktop.exe'  # 默认音乐播放器进程名
-DEFAULT_HOTKEY = ['ctrl', 'alt', 'p']  # 默认播放/暂停快捷键
-PEAK_THRESHOLD = 0.01  # 声音触发阈值（0.0-1.0）
-VERY_LOW_THRESHOLD = 1e-8  # 极低音量阈值，用于检测暂停状态
 
 # 自定义标题栏按钮
 class TitleBarButton(QPushButton):
@@ -27,6 +155,7 @@ class TitleBarButton(QPushButton):
         super().__init__(parent)
         self.icon_color = icon_color
         self.hover_color = hover_color
+        self.theme = 'dark'  # 由窗口切换主题时设置，重绘时不再向上查找父窗口
         self.setFixedSize(46, 32)
         self.setStyleSheet(f"""
             QPushButton {{
@@ -38,69 +167,24 @@ class TitleBarButton(QPushButton):
             }}
         """)
     
+    def set_theme(self, theme):
+        if theme != self.theme:
+            self.theme = theme
+            self.update()
+    
     def paintEvent(self, event):
         super().paintEvent(event)
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # 获取父窗口的主题模式
-        is_light_mode = False
-        parent = self.parent()
-        while parent:
-            if hasattr(parent, "is_light_mode"):
-                is_light_mode = parent.is_light_mode
-                break
-            parent = parent.parent()
-        
-        # 设置画笔颜色
+        # 悬停时使用白色，否则使用主题的图标颜色
         if self.underMouse():
-            # 悬停时使用白色
-            pen_color = QColor("#FFFFFF")
+            color = "#FFFFFF"
         else:
-            if is_light_mode:
-                # 光模式下使用深色图标
-                pen_color = QColor("#333333")
-            else:
-                # 暗模式下使用浅色图标
-                pen_color = QColor(self.icon_color)
-        
-        pen = QPen(pen_color)
-        pen.setWidth(1)
-        painter.setPen(pen)
-        
-        # 绘制图标
+            color = THEMES[self.theme]['icon'] or self.icon_color
         rect = self.rect()
-        center_x = rect.width() // 2
-        center_y = rect.height() // 2
-
-        # 这里可以根据按钮类型绘制不同的图标
-        if self.objectName() == "closeButton":
-            # 绘制X形状
-            painter.drawLine(center_x - 8, center_y - 8, center_x + 8, center_y + 8)
-            painter.drawLine(center_x + 8, center_y - 8, center_x - 8, center_y + 8)
-        elif self.objectName() == "minimizeButton":
-            # 绘制-形状
-            painter.drawLine(center_x - 8, center_y, center_x + 8, center_y)
-        elif self.objectName() == "themeButton":
-            # 绘制主题切换图标（太阳/月亮）
-            if is_light_mode:
-                # 绘制月亮图标
-                painter.drawEllipse(center_x - 7, center_y - 7, 14, 14)
-                # 绘制月亮阴影
-                painter.setBrush(QColor(self.parent().palette().color(self.parent().backgroundRole())))
-                painter.drawEllipse(center_x - 3, center_y - 9, 12, 12)
-            else:
-                # 绘制太阳图标
-                painter.drawEllipse(center_x - 5, center_y - 5, 10, 10)
-                # 绘制太阳光芒
-                for i in range(8):
-                    angle = i * 45
-                    rad = angle * 3.14159 / 180
-                    x1 = center_x + 7 * round(math.cos(rad))
-                    y1 = center_y + 7 * round(math.sin(rad))
-                    x2 = center_x + 10 * round(math.cos(rad))
-                    y2 = center_y + 10 * round(math.sin(rad))
-                    painter.drawLine(int(x1), int(y1), int(x2), int(y2))
+        pixmap = title_icon_pixmap(self.objectName(), self.theme, color, rect.width(), rect.height(),
+                                   self.devicePixelRatioF())
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, pixmap)
+        painter.end()
         
 # 自定义无边框窗口
 class ModernWindow(QMainWindow):
@@ -112,6 +196,7 @@ class ModernWindow(QMainWindow):
         
         # 主题模式（默认为暗色模式）
         self.is_light_mode = False
+        self._stylesheet_applied = False
         
         # 修改图标加载方式
         try:
@@ -170,282 +255,36 @@ class ModernWindow(QMainWindow):
         self.apply_theme()
     
     def apply_theme(self):
-        """应用当前主题样式"""
-        # 设置字体 - 优化字体渲染设置
-        font_family = "PingFang SC, Microsoft YaHei UI, Microsoft YaHei, SimHei, sans-serif"
-        
-        # 创建应用程序字体
-        app_font = QFont()
-        app_font.setFamily(font_family.split(',')[0].strip())  # 使用第一个字体
-        app_font.setPixelSize(15)  # 将字体大小从13增加到15
-        app_font.setHintingPreference(QFont.HintingPreference.PreferFullHinting)  # 增强字体提示
-        QApplication.setFont(app_font)
-        
-        if self.is_light_mode:
-            # 白天模式
-            self.setStyleSheet(f"""
-                * {{
-                    font-family: {font_family};
-                    font-size: 15px;  /* 将字体大小从13px增加到15px */
-                    letter-spacing: 0.3px;  /* 增加字母间距 */
-                }}
-                #windowFrame {{
-                    background-color: #F5F5F5;
-                    border-radius: 8px;
-                }}
-                #titleBar {{
-                    background-color: #E0E0E0;
-                    border-top-left-radius: 8px;
-                    border-top-right-radius: 8px;
-                }}
-                #titleLabel {{
-                    color: #333333;
-                    font-size: 16px;  /* 将标题字体从14px增加到16px */
-                    font-weight: bold;
-                }}
-                #contentFrame {{
-                    background-color: #F5F5F5;
-                    border-bottom-left-radius: 8px;
-                    border-bottom-right-radius: 8px;
-                }}
-                #statusFrame {{
-                    background-color: #E8E8E8;
-                    border-radius: 4px;
-                    padding: 5px;
-                }}
-                QLabel {{
-                    color: #333333;
-                }}
-                QTextEdit {{
-                    background-color: #FFFFFF;
-                    color: #333333;
-                    border: 1px solid #CCCCCC;
-                    border-radius: 4px;
-                    font-family: "Consolas", "Microsoft YaHei UI", monospace;
-                    font-size: 14px;  /* 将字体大小从12px增加到14px */
-                    line-height: 1.5;
-                }}
-                QScrollBar:vertical {{
-                    background: #F0F0F0;
-                    width: 12px;
-                    margin: 0px;
-                }}
-                QScrollBar::handle:vertical {{
-                    background: #CCCCCC;
-                    min-height: 20px;
-                    border-radius: 6px;
-                }}
-                QScrollBar::handle:vertical:hover {{
-                    background: #AAAAAA;
-                }}
-                QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
-                    height: 0px;
-                }}
-                QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{
-                    background: none;
-                }}
-                QScrollBar:horizontal {{
-                    background: #F0F0F0;
-                    height: 12px;
-                    margin: 0px;
-                }}
-                QScrollBar::handle:horizontal {{
-                    background: #CCCCCC;
-                    min-width: 20px;
-                    border-radius: 6px;
-                }}
-                QScrollBar::handle:horizontal:hover {{
-                    background: #AAAAAA;
-                }}
-                QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {{
-                    width: 0px;
-                }}
-                QScrollBar::add-page:horizontal, QScrollBar::sub-page:horizontal {{
-                    background: none;
-                }}
-                QLineEdit {{
-                    background-color: #FFFFFF;
-                    color: #333333;
-                    border: 1px solid #CCCCCC;
-                    border-radius: 4px;
-                    padding: 4px 8px;
-                    selection-background-color: #0078D7;
-                    selection-color: white;
-                }}
-                QPushButton {{
-                    background-color: #0078D7;
-                    color: white;
-                    border: none;
-                    border-radius: 4px;
-                    padding: 8px 16px;
-                    font-weight: bold;
-                }}
-                QPushButton:hover {{
-                    background-color: #1C97EA;
-                }}
-                QPushButton:pressed {{
-                    background-color: #0063B1;
-                }}
-                QCheckBox {{
-                    color: #333333;
-                }}
-                QCheckBox::indicator {{
-                    width: 18px;
-                    height: 18px;
-                    border: 1px solid #CCCCCC;
-                    border-radius: 3px;
-                }}
-                QCheckBox::indicator:checked {{
-                    background-color: #0078D7;
-                    border: 1px solid #0078D7;
-                }}
-            """)
-            
-            # 更新状态图标颜色
-            if hasattr(self, 'status_icon'):
-                if self.running:
-                    self.status_icon.setStyleSheet("color: #4CAF50; font-size: 16px;")
-                else:
-                    self.status_icon.setStyleSheet("color: #888888; font-size: 16px;")
-        else:
-            # 暗色模式
-            self.setStyleSheet(f"""
-                * {{
-                    font-family: {font_family};
-                    font-size: 15px;  /* 将字体大小从13px增加到15px */
-                    letter-spacing: 0.3px;  /* 增加字母间距 */
-                }}
-                #windowFrame {{
-                    background-color: #2D2D30;
-                    border-radius: 8px;
-                }}
-                #titleBar {{
-                    background-color: #1E1E1E;
-                    border-top-left-radius: 8px;
-                    border-top-right-radius: 8px;
-                }}
-                #titleLabel {{
-                    color: #FFFFFF;
-                    font-size: 16px;  /* 将标题字体从14px增加到16px */
-                    font-weight: bold;
-                }}
-                #contentFrame {{
-                    background-color: #2D2D30;
-                    border-bottom-left-radius: 8px;
-                    border-bottom-right-radius: 8px;
-                }}
-                #statusFrame {{
-                    background-color: #333337;
-                    border-radius: 4px;
-                    padding: 5px;
-                }}
-                QLabel {{
-                    color: #FFFFFF;
-                }}
-                QTextEdit {{
-                    background-color: #252526;
-                    color: #FFFFFF;
-                    border: 1px solid #3F3F46;
-                    border-radius: 4px;
-                    font-family: "Consolas", "Microsoft YaHei UI", monospace;
-                    font-size: 14px;  /* 将字体大小从12px增加到14px */
-                    line-height: 1.5;
-                }}
-                QScrollBar:vertical {{
-                    background: #2A2A2A;
-                    width: 12px;
-                    margin: 0px;
-                }}
-                QScrollBar::handle:vertical {{
-                    background: #555555;
-                    min-height: 20px;
-                    border-radius: 6px;
-                }}
-                QScrollBar::handle:vertical:hover {{
-                    background: #666666;
-                }}
-                QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
-                    height: 0px;
-                }}
-                QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{
-                    background: none;
-                }}
-                QScrollBar:horizontal {{
-                    background: #2A2A2A;
-                    height: 12px;
-                    margin: 0px;
-                }}
-                QScrollBar::handle:horizontal {{
-                    background: #555555;
-                    min-width: 20px;
-                    border-radius: 6px;
-                }}
-                QScrollBar::handle:horizontal:hover {{
-                    background: #666666;
-                }}
-                QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {{
-                    width: 0px;
-                }}
-                QScrollBar::add-page:horizontal, QScrollBar::sub-page:horizontal {{
-                    background: none;
-                }}
-                QLineEdit {{
-                    background-color: #252526;
-                    color: #FFFFFF;
-                    border: 1px solid #3F3F46;
-                    border-radius: 4px;
-                    padding: 4px 8px;
-                    selection-background-color: #0078D7;
-                    selection-color: white;
-                }}
-                QPushButton {{
-                    background-color: #0078D7;
-                    color: white;
-                    border: none;
-                    border-radius: 4px;
-                    padding: 8px 16px;
-                    font-weight: bold;
-                }}
-                QPushButton:hover {{
-                    background-color: #1C97EA;
-                }}
-                QPushButton:pressed {{
-                    background-color: #0063B1;
-                }}
-                QCheckBox {{
-                    color: #FFFFFF;
-                }}
-                QCheckBox::indicator {{
-                    width: 18px;
-                    height: 18px;
-                    border: 1px solid #3F3F46;
-                    border-radius: 3px;
-                }}
-                QCheckBox::indicator:checked {{
-                    background-color: #0078D7;
-                    border: 1px solid #0078D7;
-                }}
-            """)
-            
-            # 更新状态图标颜色
-            if hasattr(self, 'status_icon'):
-                if self.running:
-                    self.status_icon.setStyleSheet("color: #4CAF50; font-size: 16px;")
-                else:
-                    self.status_icon.setStyleSheet("color: #888888; font-size: 16px;")
+        """应用当前主题样式
+
+        样式表只在第一次调用时设置；之后切换主题只修改 theme 动态属性并重新应用已解析的样式，
+        不再重新生成和解析样式表，也不再重设应用程序字体。
+        """
+        theme = 'light' if self.is_light_mode else 'dark'
+        if not self._stylesheet_applied:
+            # 创建应用程序字体 - 优化字体渲染设置
+            app_font = QFont()
+            app_font.setFamily(THEME_FONT_FAMILY.split(',')[0].strip())  # 使用第一个字体
+            app_font.setPixelSize(15)
+            app_font.setHintingPreference(QFont.HintingPreference.PreferFullHinting)  # 增强字体提示
+            QApplication.setFont(app_font)
+            self.setProperty("theme", theme)
+            self.setStyleSheet(theme_stylesheet())
+            self._stylesheet_applied = True
+        elif self.property("theme") != theme:
+            self.setProperty("theme", theme)
+            # 动态属性变化后需要重新应用样式，选择器才会按新属性匹配
+            style = self.style()
+            for widget in [self] + self.findChildren(QWidget):
+                style.unpolish(widget)
+                style.polish(widget)
+        for button in self.findChildren(TitleBarButton):
+            button.set_theme(theme)
     
     def toggle_theme(self):
         """切换主题模式"""
         self.is_light_mode = not self.is_light_mode
         self.apply_theme()
-        
-        # 强制更新标题栏按钮
-        if hasattr(self, 'theme_button'):
-            self.theme_button.update()
-        if hasattr(self, 'minimize_button'):
-            self.minimize_button.update()
-        if hasattr(self, 'close_button'):
-            self.close_button.update()
     
     def create_title_bar(self):
         # 创建标题栏
@@ -525,32 +364,256 @@ class ModernWindow(QMainWindow):
 # 将AudioMonitorApp类移到全局作用域，并删除重复的main函数定义
 
 # 在ModernWindow类之后添加AudioMonitorApp类
-class AudioMonitorApp(ModernWindow):
+class AppController(QObject):
+    """窗口之外的程序状态：配置、监控引擎、日志环形缓冲区和托盘图标
+
+    窗口（AudioMonitorApp）只是它的一个视图。托盘模式下关闭或最小化窗口会销毁整个窗口部件树，
+    监控继续运行，只保留托盘图标和一个简单的状态菜单；再次打开时按引擎状态和日志缓冲区重新创建窗口。
+    """
+    # 引擎的通知来自调度线程，通过信号切换到界面线程处理
+    engine_notified = pyqtSignal(str, object)
+    # 配置文件被外部修改时的通知来自监视线程，同样通过信号切换到界面线程
+    config_changed = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
+        # 日志写入有上限的内存环形缓冲区和轮转的日志文件，窗口定时批量读取新日志
+        self.logger = get_logger()
+        self.log_ring = setup_logging(logging.INFO, LOG_RING_CAPACITY, LOG_FILE,
+                                      LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT)
+        self.debug_log = False
+        
+        # 设置保存在配置文件中，外部修改后自动重新加载
+        self.config_store = ConfigStore()
+        config = self.config_store.load()
+        self.config_store.add_listener(self.config_changed.emit)
+        self.config_changed.connect(self.on_config_changed)
+        
+        # 检测和控制全部由监控引擎完成，窗口和托盘只负责显示和修改设置
+        self.engine = MonitorEngine(config.music_player, config.hotkey, control_kind=config.control,
+                                    session_rules=config.session_rules)
+        self.engine.apply_config(config)
+        self.engine.add_listener(self.engine_notified.emit)
+        self.engine_notified.connect(self.on_engine_notified)
+        
+        # 窗口重建时需要的引擎状态
+        self.monitoring = self.engine.running
+        self.tick_rate = None
+        self.metrics_text = self.engine.metrics.summary()
+        
+        self.window = None
+        self.started = False  # 第一个窗口绘制完成后才按设置自动开始监控
+        self.quitting = False
+        self.tray_icon = None
+        self.tray_menu = None
+        self.tray_actions = {}
+        self.tray_hint_shown = False
+        self.tray_probe = bool(os.environ.get(TRAY_PROBE_ENV))
+        self.window_rss_mb = None  # 最近一次关闭窗口前的内存占用
+        
+        self.log("音频监控系统已启动")
+        self.log(f"当前音乐播放器: {self.engine.music_player}")
+        self.log(f"当前快捷键: {'+'.join(self.engine.music_hotkey)}")
+        self.config_store.start_watching()
+    
+    @property
+    def tray_enabled(self):
+        """关闭或最小化窗口时是否只销毁窗口、缩小到托盘"""
+        return self.tray_probe or (self.config_store.config.tray_mode and self.tray_icon is not None)
+    
+    def log(self, message, level=logging.INFO):
+        """添加日志消息"""
+        self.logger.log(level, message)
+    
+    def set_debug_log(self, enabled):
+        """开启/关闭调试日志"""
+        self.debug_log = enabled
+        set_log_level(logging.DEBUG if enabled else logging.INFO)
+    
+    def status_text(self):
+        if not self.monitoring:
+            return "状态: 未运行"
+        if self.tick_rate is None:
+            return "状态: 运行中"
+        return f"状态: 运行中（每分钟检测 {self.tick_rate} 次）"
+    
+    def toggle_monitoring(self):
+        """切换监控状态"""
+        if self.engine.running:
+            self.engine.stop()
+        else:
+            self.engine.start()
+    
+    def show_window(self):
+        """显示窗口，窗口已经销毁时按当前状态重新创建"""
+        if self.window is None:
+            self.window = AudioMonitorApp(self)
+            self.update_tray()
+        if self.window.isMinimized():
+            self.window.showNormal()
+        else:
+            self.window.show()
+        self.window.raise_()
+        self.window.activateWindow()
+    
+    def on_window_painted(self, window):
+        """窗口首帧绘制完成；只有程序启动时的第一个窗口才按设置自动开始监控"""
+        if self.started:
+            return
+        self.started = True
+        if self.tray_probe:
+            window.close()
+            return
+        if self.config_store.config.auto_start:
+            self.toggle_monitoring()
+    
+    def release_window(self, window):
+        """托盘模式下窗口关闭：窗口部件树随窗口销毁，监控继续；稍后测量并报告托盘模式的内存占用"""
+        if window is not self.window:
+            return
+        self.window = None
+        self.window_rss_mb = resident_memory_mb()
+        if self.tray_icon is not None and not self.tray_hint_shown:
+            self.tray_hint_shown = True
+            self.tray_icon.showMessage("音乐一直放！", "窗口已关闭，监控在托盘中继续运行")
+        QTimer.singleShot(TRAY_RSS_SETTLE_MS, self.report_tray_memory)
+    
+    def report_tray_memory(self):
+        """窗口销毁后释放界面缓存，记录托盘模式的内存占用"""
+        if self.window is not None or self.quitting:
+            return
+        _title_icon_cache.clear()
+        gc.collect()
+        tray_rss_mb = resident_memory_mb()
+        if self.tray_probe:
+            print(f"window_rss_mb={self.window_rss_mb or 0:.1f} tray_rss_mb={tray_rss_mb or 0:.1f}", flush=True)
+            self.quit()
+            return
+        if tray_rss_mb is None or self.window_rss_mb is None:
+            self.log("窗口已关闭，监控在托盘中继续运行")
+        else:
+            self.log(f"窗口已关闭，监控在托盘中继续运行；内存占用 {tray_rss_mb:.1f} MB"
+                     f"（窗口打开时 {self.window_rss_mb:.1f} MB）")
+    
+    def update_tray(self):
+        """按设置创建或移除托盘图标"""
+        wanted = self.config_store.config.tray_mode and QSystemTrayIcon.isSystemTrayAvailable()
+        if wanted and self.tray_icon is None:
+            self.create_tray_icon()
+        elif not wanted and self.tray_icon is not None:
+            self.tray_icon.hide()
+            self.tray_icon.deleteLater()
+            self.tray_icon = None
+            self.tray_menu = None
+            self.tray_actions = {}
+            if self.window is None:
+                # 没有托盘图标时窗口是唯一的入口
+                self.show_window()
+    
+    def create_tray_icon(self):
+        icon = QApplication.windowIcon()
+        if icon.isNull():
+            icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_MediaVolume)
+        self.tray_icon = QSystemTrayIcon(icon, self)
+        menu = QMenu()
+        status = menu.addAction(self.status_text())
+        status.setEnabled(False)
+        memory = menu.addAction("内存占用: -")
+        memory.setEnabled(False)
+        menu.addSeparator()
+        toggle = menu.addAction("开始监控")
+        toggle.triggered.connect(self.toggle_monitoring)
+        menu.addAction("显示窗口").triggered.connect(self.show_window)
+        menu.addSeparator()
+        menu.addAction("退出").triggered.connect(self.quit)
+        menu.aboutToShow.connect(self.update_tray_menu)
+        self.tray_menu = menu  # QSystemTrayIcon 不接管菜单，需要自己保留引用
+        self.tray_actions = {'status': status, 'memory': memory, 'toggle': toggle}
+        self.tray_icon.setContextMenu(menu)
+        self.tray_icon.activated.connect(self.on_tray_activated)
+        self.update_tray_status()
+        self.tray_icon.show()
+    
+    def update_tray_status(self):
+        if self.tray_icon is None:
+            return
+        self.tray_icon.setToolTip(f"音乐一直放！\n{self.status_text()}")
+        self.tray_actions['status'].setText(self.status_text())
+        self.tray_actions['toggle'].setText("停止监控" if self.monitoring else "开始监控")
+    
+    def update_tray_menu(self):
+        """打开托盘菜单时刷新状态和内存占用"""
+        self.update_tray_status()
+        rss_mb = resident_memory_mb()
+        self.tray_actions['memory'].setText("内存占用: -" if rss_mb is None else f"内存占用: {rss_mb:.1f} MB")
+    
+    def on_tray_activated(self, reason):
+        if reason in (QSystemTrayIcon.ActivationReason.Trigger, QSystemTrayIcon.ActivationReason.DoubleClick):
+            self.show_window()
+    
+    def on_engine_notified(self, kind, value):
+        """处理监控引擎的通知（在界面线程中执行），记下状态供重建窗口使用"""
+        if kind == NOTIFY_RUNNING:
+            self.monitoring = value
+            self.tick_rate = None
+        elif kind == NOTIFY_TICK_RATE:
+            if self.engine.running:
+                self.tick_rate = value
+        elif kind == NOTIFY_METRICS:
+            self.metrics_text = value
+        else:
+            return
+        self.update_tray_status()
+        if self.window is not None:
+            self.window.on_engine_notified(kind, value)
+    
+    def on_config_changed(self, config):
+        """配置已保存或从文件重新加载（在界面线程中执行）：交给监控引擎，并同步托盘和窗口"""
+        self.engine.apply_config(config)
+        self.update_tray()
+        if self.window is not None:
+            self.window.sync_config(config)
+    
+    def quit(self):
+        """停止监控、结束调度线程并退出程序"""
+        if self.quitting:
+            return
+        self.quitting = True
+        self.config_store.stop_watching()
+        self.engine.shutdown()
+        if self.tray_icon is not None:
+            self.tray_icon.hide()
+        QApplication.quit()
+
+
+class AudioMonitorApp(ModernWindow):
+    """主窗口：显示 AppController 的状态并修改设置，托盘模式下关闭后整个销毁"""
+
+    def __init__(self, controller):
+        super().__init__()
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.controller = controller
+        self.engine = controller.engine
+        self.config_store = controller.config_store
         # 修改软件标题为"音乐一直放！"
         self.setWindowTitle("音乐一直放！")
         self.setGeometry(100, 100, 600, 450)  # 增加高度以容纳新控件
         
-        # 状态变量
-        self.last_other_playing = False
-        self.last_lx_playing = False
-        self.last_action = None
-        self.consecutive_attempts = 0
-        self.last_action_time = 0
-        self.running = False
-        self.no_volume_count = 0
-        
-        # 音乐播放器设置
-        self.music_player = DEFAULT_MUSIC_PLAYER
-        self.music_hotkey = DEFAULT_HOTKEY
-        
-        # 创建定时器
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.check_audio_status)
+        # 新窗口从日志缓冲区中最早的一条开始显示，之后定时批量读取新日志
+        self.log_ring = controller.log_ring
+        self.log_seq = 0
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.timeout.connect(self.flush_log_view)
+        self.first_paint_seconds = None
         
         # 创建界面
         self.init_ui()
+        self.is_light_mode = self.config_store.config.theme == 'light'
+        self.apply_theme()
+    
+    @property
+    def running(self):
+        return self.engine.running
     
     def init_ui(self):
         layout = QVBoxLayout()
@@ -558,14 +621,16 @@ class AudioMonitorApp(ModernWindow):
         # 状态显示
         self.status_frame = QFrame()
         self.status_frame.setObjectName("statusFrame")
-        status_layout = QHBoxLayout(self.status_frame)
+        status_frame_layout = QVBoxLayout(self.status_frame)
+        status_frame_layout.setContentsMargins(0, 0, 0, 0)
+        status_layout = QHBoxLayout()
+        status_frame_layout.addLayout(status_layout)
         
         status_icon = QLabel("●")
-        status_icon.setStyleSheet("color: #888888; font-size: 16px;")
         status_icon.setFixedWidth(20)
         self.status_icon = status_icon
         
-        self.status_label = QLabel("状态: 未运行")
+        self.status_label = QLabel()
         
         status_layout.addWidget(status_icon)
         status_layout.addWidget(self.status_label)
@@ -578,6 +643,12 @@ class AudioMonitorApp(ModernWindow):
         github_button.clicked.connect(self.open_github)
         status_layout.addWidget(github_button)
         
+        # 性能统计
+        self.metrics_label = QLabel(self.controller.metrics_text)
+        self.metrics_label.setObjectName("metricsLabel")
+        self.metrics_label.setProperty("role", "metrics")
+        status_frame_layout.addWidget(self.metrics_label)
+        
         layout.addWidget(self.status_frame)
         
         # 添加音乐播放器设置区域
@@ -585,12 +656,17 @@ class AudioMonitorApp(ModernWindow):
         settings_frame.setObjectName("settingsFrame")
         settings_layout = QVBoxLayout(settings_frame)
         
+        # 输入框的修改在输入停止后才校验和保存，输入到一半的内容不会交给监控引擎
+        self.player_edit_timer = self.create_edit_timer(self.update_music_player)
+        self.hotkey_edit_timer = self.create_edit_timer(self.update_hotkey)
+        
         # 音乐播放器选择
         player_layout = QHBoxLayout()
         player_label = QLabel("音乐播放器进程名:")
-        self.player_input = QLineEdit(self.music_player)
+        self.player_input = QLineEdit(self.engine.music_player)
         self.player_input.setToolTip("输入音乐播放器的进程名称，例如：lx-music-desktop.exe")
-        self.player_input.textChanged.connect(self.update_music_player)
+        self.player_input.textChanged.connect(self.player_edit_timer.start)
+        self.player_input.editingFinished.connect(self.update_music_player)
         player_layout.addWidget(player_label)
         player_layout.addWidget(self.player_input)
         settings_layout.addLayout(player_layout)
@@ -598,9 +674,10 @@ class AudioMonitorApp(ModernWindow):
         # 快捷键设置
         hotkey_layout = QHBoxLayout()
         hotkey_label = QLabel("播放/暂停快捷键:")
-        self.hotkey_input = QLineEdit('+'.join(self.music_hotkey))
+        self.hotkey_input = QLineEdit('+'.join(self.engine.music_hotkey))
         self.hotkey_input.setToolTip("输入控制音乐播放/暂停的快捷键，例如：ctrl+alt+p")
-        self.hotkey_input.textChanged.connect(self.update_hotkey)
+        self.hotkey_input.textChanged.connect(self.hotkey_edit_timer.start)
+        self.hotkey_input.editingFinished.connect(self.update_hotkey)
         hotkey_layout.addWidget(hotkey_label)
         hotkey_layout.addWidget(self.hotkey_input)
         settings_layout.addLayout(hotkey_layout)
@@ -608,19 +685,38 @@ class AudioMonitorApp(ModernWindow):
         layout.addWidget(settings_frame)
         
         # 日志显示
+        log_header_layout = QHBoxLayout()
         log_label = QLabel("运行日志")
-        layout.addWidget(log_label)
-        
-        self.log_text = QTextEdit()
+        log_header_layout.addWidget(log_label)
+        log_header_layout.addStretch()
+        self.debug_log_checkbox = QCheckBox("显示调试日志")
+        self.debug_log_checkbox.setChecked(self.controller.debug_log)
+        self.debug_log_checkbox.toggled.connect(self.toggle_debug_log)
+        log_header_layout.addWidget(self.debug_log_checkbox)
+        layout.addLayout(log_header_layout)
+        
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
         self.log_text.setMinimumHeight(200)
+        self.log_text.setMaximumBlockCount(LOG_VIEW_MAX_LINES)
         layout.addWidget(self.log_text)
+        self.log_flush_timer.start(LOG_VIEW_FLUSH_MS)
         
         # 自动启动选项
         self.auto_start_checkbox = QCheckBox("程序启动时自动开始监控")
-        self.auto_start_checkbox.setChecked(True)
+        self.auto_start_checkbox.setChecked(self.config_store.config.auto_start)
+        self.auto_start_checkbox.toggled.connect(self.update_auto_start)
         layout.addWidget(self.auto_start_checkbox)
         
+        # 托盘模式选项
+        self.tray_mode_checkbox = QCheckBox("关闭或最小化时缩小到托盘（继续监控）")
+        self.tray_mode_checkbox.setChecked(self.config_store.config.tray_mode)
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray_mode_checkbox.setEnabled(False)
+            self.tray_mode_checkbox.setToolTip("当前系统没有可用的托盘")
+        self.tray_mode_checkbox.toggled.connect(self.update_tray_mode)
+        layout.addWidget(self.tray_mode_checkbox)
+        
         # 控制按钮
         button_layout = QHBoxLayout()
         button_layout.addStretch()
@@ -634,32 +730,110 @@ class AudioMonitorApp(ModernWindow):
         
         # 设置内容布局
         self.content_layout.addLayout(layout)
+        self.update_status()
         
-        # 添加日志
-        self.log("音频监控系统已启动")
-        self.log(f"当前音乐播放器: {self.music_player}")
-        self.log(f"当前快捷键: {'+'.join(self.music_hotkey)}")
-        
-        # 如果选中了自动启动，则启动监控
-        if self.auto_start_checkbox.isChecked():
-            self.toggle_monitoring()
+        # 自动启动在首帧绘制之后进行（见 on_first_paint），窗口不必等监控依赖加载完才显示
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_seconds is None:
+            self.first_paint_seconds = time.perf_counter() - STARTUP_STARTED
+            QTimer.singleShot(0, self.on_first_paint)
+    
+    def on_first_paint(self):
+        """首帧绘制完成后记录启动耗时，并按设置自动开始监控"""
+        if self.controller.started:
+            return  # 重建的窗口
+        self.log(f"界面启动耗时 {self.first_paint_seconds * 1000:.0f} 毫秒", logging.DEBUG)
+        if os.environ.get(STARTUP_PROBE_ENV):
+            print(f"first_paint_ms={self.first_paint_seconds * 1000:.1f}", flush=True)
+            QApplication.quit()
+            return
+        self.controller.on_window_painted(self)
     
-    def update_music_player(self, text):
+    def create_edit_timer(self, callback):
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(CONFIG_EDIT_DEBOUNCE_MS)
+        timer.timeout.connect(callback)
+        return timer
+    
+    def commit_setting(self, widget, timer, **changes):
+        """校验并保存输入框中的设置；未通过校验时标记输入框并在提示中显示原因，配置保持不变"""
+        timer.stop()
+        try:
+            self.config_store.update(**changes)
+        except ValueError as e:
+            self.set_input_invalid(widget, str(e))
+            return
+        self.set_input_invalid(widget, None)
+    
+    def set_input_invalid(self, widget, message):
+        """message 为 None 时恢复输入框原来的样式和提示"""
+        if widget.property("defaultToolTip") is None:
+            widget.setProperty("defaultToolTip", widget.toolTip())
+        widget.setToolTip(message or widget.property("defaultToolTip"))
+        invalid = message is not None
+        if bool(widget.property("invalid")) != invalid:
+            widget.setProperty("invalid", invalid)
+            # 动态属性变化后重新应用样式，invalid 选择器才会生效
+            widget.style().unpolish(widget)
+            widget.style().polish(widget)
+    
+    def update_music_player(self):
         """更新音乐播放器设置"""
-        self.music_player = text.strip()
-        self.log(f"音乐播放器已更新为: {self.music_player}")
+        self.commit_setting(self.player_input, self.player_edit_timer, music_player=self.player_input.text())
     
-    def update_hotkey(self, text):
+    def update_hotkey(self):
         """更新快捷键设置"""
-        keys = [k.strip().lower() for k in text.split('+') if k.strip()]
-        if keys:
-            self.music_hotkey = keys
-            self.log(f"快捷键已更新为: {'+'.join(self.music_hotkey)}")
+        self.commit_setting(self.hotkey_input, self.hotkey_edit_timer,
+                            hotkey=parse_hotkey(self.hotkey_input.text()))
+    
+    def update_auto_start(self, checked):
+        self.config_store.update(auto_start=checked)
+    
+    def update_tray_mode(self, checked):
+        self.config_store.update(tray_mode=checked)
+    
+    def toggle_theme(self):
+        """切换主题模式并保存"""
+        super().toggle_theme()
+        self.config_store.update(theme='light' if self.is_light_mode else 'dark')
+    
+    def sync_config(self, config):
+        """配置已保存或从文件重新加载（在界面线程中执行）：同步界面上的设置"""
+        for widget, timer, text in ((self.player_input, self.player_edit_timer, config.music_player),
+                                    (self.hotkey_input, self.hotkey_edit_timer, '+'.join(config.hotkey))):
+            if widget.text() == text or (widget.hasFocus() and timer.isActive()):
+                continue  # 正在输入的内容不被覆盖
+            widget.blockSignals(True)
+            widget.setText(text)
+            widget.blockSignals(False)
+            self.set_input_invalid(widget, None)
+        for checkbox, checked in ((self.auto_start_checkbox, config.auto_start),
+                                  (self.tray_mode_checkbox, config.tray_mode)):
+            if checkbox.isChecked() != checked:
+                checkbox.blockSignals(True)
+                checkbox.setChecked(checked)
+                checkbox.blockSignals(False)
+        if self.is_light_mode != (config.theme == 'light'):
+            self.is_light_mode = config.theme == 'light'
+            self.apply_theme()
     
-    def log(self, message):
+    def log(self, message, level=logging.INFO):
         """添加日志消息"""
-        timestamp = time.strftime("%H:%M:%S", time.localtime())
-        self.log_text.append(f"[{timestamp}] {message}")
+        self.controller.log(message, level)
+    
+    def toggle_debug_log(self, enabled):
+        """开启/关闭调试日志"""
+        self.controller.set_debug_log(enabled)
+    
+    def flush_log_view(self):
+        """把新的日志批量追加到日志窗口（在界面线程中定时调用）"""
+        self.log_seq, lines = self.log_ring.lines_since(self.log_seq, LOG_VIEW_MAX_LINES)
+        if not lines:
+            return
+        self.log_text.appendPlainText("\n".join(lines))
         # 滚动到底部
         self.log_text.verticalScrollBar().setValue(
             self.log_text.verticalScrollBar().maximum()
@@ -667,164 +841,40 @@ class AudioMonitorApp(ModernWindow):
     
     def toggle_monitoring(self):
         """切换监控状态"""
-        if self.running:
-            self.timer.stop()
-            self.running = False
-            self.start_button.setText("开始监控")
-            self.status_label.setText("状态: 未运行")
-            self.status_icon.setStyleSheet("color: #888888; font-size: 16px;")
-            self.log("监控已停止")
+        self.controller.toggle_monitoring()
+    
+    def update_status(self):
+        """按 AppController 记下的引擎状态刷新状态栏和按钮"""
+        monitoring = self.controller.monitoring
+        self.start_button.setText("停止监控" if monitoring else "开始监控")
+        self.status_label.setText(self.controller.status_text())
+        self.status_icon.setStyleSheet(f"color: {'#4CAF50' if monitoring else '#888888'}; font-size: 16px;")
+    
+    def on_engine_notified(self, kind, value):
+        """处理监控引擎的通知（由 AppController 在界面线程中转发）"""
+        if kind == NOTIFY_METRICS:
+            self.metrics_label.setText(value)
         else:
-            self.timer.start(3000)  # 每3秒检查一次
-            self.running = True
-            self.start_button.setText("停止监控")
-            self.status_label.setText("状态: 运行中")
-            self.status_icon.setStyleSheet("color: #4CAF50; font-size: 16px;")
-            self.log("监控已启动")
-    
-    def 检测LX_Music是否在播放音频(self):
-        """检测音乐播放器是否在播放音频，通过窗口标题和音量判断"""
-        try:
-            # 首先检查音乐播放器进程是否存在
-            music_player_running = False
-            for proc in psutil.process_iter(['pid', 'name']):
-                if proc.info['name'].lower() == self.music_player.lower():
-                    music_player_running = True
-                    break
-            
-            if not music_player_running:
-                self.log(f"音乐播放器进程 {self.music_player} 未运行")
-                return False
-            
-            # 查找音乐播放器窗口
-            music_player_title = ""
-            def callback(hwnd, extra):
-                if win32gui.IsWindowVisible(hwnd):
-                    _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                    try:
-                        process = psutil.Process(pid)
-                        if process.name().lower() == self.music_player.lower():
-                            title = win32gui.GetWindowText(hwnd)
-                            if title:
-                                extra[0] = title
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                return True
-            
-            window_title = [""]  # 使用列表作为可变对象传递结果
-            win32gui.EnumWindows(callback, window_title)
-            music_player_title = window_title[0]
-            
-            self.log(f"音乐播放器窗口标题: '{music_player_title}'")
-            
-            # 使用音量检测作为主要判断方法
-            peak_value = 0.0
-            sessions = AudioUtilities.GetAllSessions()
-            for session in sessions:
-                if session.Process and session.Process.name().lower() == self.music_player.lower():
-                    meter = session._ctl.QueryInterface(IAudioMeterInformation)
-                    peak_value = meter.GetPeakValue()
-                    self.log(f"音乐播放器音量峰值: {peak_value}")
-                    break
-            
-            # 根据音量判断播放状态
-            # 如果音量大于阈值，则认为正在播放
-            if peak_value > PEAK_THRESHOLD:
-                return True
-            # 如果音量极低（接近0但不是0），则认为是暂停状态
-            elif peak_value > 0 and peak_value < VERY_LOW_THRESHOLD:
-                self.log("音乐播放器已暂停（极低音量）")
-                return False
-            
-            # 如果音量检测不确定，则使用窗口标题辅助判断
-            if "- 暂停中" in music_player_title or "- paused" in music_player_title.lower():
-                return False
-            
-            # 如果窗口标题包含歌曲名，且没有明确的暂停标识，则可能在播放
-            is_playing_by_title = bool(music_player_title and not music_player_title.endswith(self.music_player.replace(".exe", "")))
-            
-            # 如果标题判断为播放中，但音量为0，则需要进一步确认
-            if is_playing_by_title and peak_value == 0:
-                self.no_volume_count += 1
-                if self.no_volume_count > 2:  # 连续3次检测
-                    self.log("音乐播放器可能已暂停（无音量）")
-                    return False
-            else:
-                self.no_volume_count = 0
-            
-            return is_playing_by_title
-            
-        except Exception as e:
-            self.log(f"检测音乐播放器状态时出错: {e}")
-            return False
-    
-    def 控制LX_Music(self, action):
-        """控制音乐播放器的播放状态"""
-        if action == 'play' or action == 'pause':
-            self.log(f"发送快捷键 {'+'.join(self.music_hotkey)} 到音乐播放器 ({action})")
-            pyautogui.hotkey(*self.music_hotkey)
-            # 等待一小段时间让操作生效
-            time.sleep(1)
-    
-    def 检测其他程序是否在播放音频(self):
-        """检测其他程序是否在播放音频"""
-        sessions = AudioUtilities.GetAllSessions()
-        for session in sessions:
-            if not session.Process:
-                continue
-            process_name = session.Process.name().lower()
-            if process_name == self.music_player.lower():
-                continue
-            meter = session._ctl.QueryInterface(IAudioMeterInformation)
-            if meter.GetPeakValue() > PEAK_THRESHOLD:
-                return True
-        return False
+            self.update_status()
     
-    def check_audio_status(self):
-        """检查音频状态并执行相应操作"""
-        try:
-            current_time = time.time()
-            other_playing = self.检测其他程序是否在播放音频()
-            lx_playing = self.检测LX_Music是否在播放音频()
-            
-            self.log(f"调试信息 - 其他程序播放状态: {other_playing}, 音乐播放器播放状态: {lx_playing}")
-            
-            # 添加操作冷却时间，避免频繁切换
-            cooldown_passed = (current_time - self.last_action_time) > 5  # 5秒冷却时间
-            
-            # 情况1: 其他程序正在播放，确保LX Music暂停
-            if other_playing:
-                if lx_playing and cooldown_passed:
-                    self.log("检测到其他程序正在播放，暂停音乐播放器")
-                    self.控制LX_Music('pause')
-                    self.last_action = 'pause'
-                    self.last_action_time = current_time
-                self.consecutive_attempts = 0  # 重置连续尝试计数
-            # 情况2: 其他程序不在播放，确保LX Music在播放
-            elif not other_playing and cooldown_passed:
-                # 如果LX Music没有播放，启动它
-                if not lx_playing:
-                    # 添加防止循环触发的逻辑
-                    self.consecutive_attempts += 1
-                    if self.consecutive_attempts <= 3:  # 最多尝试3次
-                        self.log(f"没有检测到任何音频播放，启动音乐播放器 (尝试 {self.consecutive_attempts}/3)")
-                        self.控制LX_Music('play')
-                        self.last_action = 'play'
-                        self.last_action_time = current_time
-                        time.sleep(2)  # 给音乐播放器一些启动时间
-                    else:
-                        self.log("多次尝试启动音乐播放器未成功，暂停尝试")
-                        time.sleep(15)  # 等待更长时间再尝试
-                        self.consecutive_attempts = 0
-                else:
-                    self.consecutive_attempts = 0  # 音乐播放器已经在播放，重置计数
-            
-            # 更新上一次的状态
-            self.last_other_playing = other_playing
-            self.last_lx_playing = lx_playing
-            
-        except Exception as e:
-            self.log(f"发生错误: {e}")
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        # 托盘模式下最小化（标题栏按钮或任务栏）等同于关闭窗口
+        if (event.type() == QEvent.Type.WindowStateChange and self.isMinimized()
+                and self.controller.tray_enabled):
+            QTimer.singleShot(0, self.close)
+    
+    def closeEvent(self, event):
+        """托盘模式下关闭窗口只销毁窗口，监控继续；否则停止监控并退出程序"""
+        for timer, commit in ((self.player_edit_timer, self.update_music_player),
+                              (self.hotkey_edit_timer, self.update_hotkey)):
+            if timer.isActive():
+                commit()  # 保存还在等待的输入
+        if self.controller.tray_enabled and not self.controller.quitting:
+            self.controller.release_window(self)
+        else:
+            self.controller.quit()
+        super().closeEvent(event)
     
     def open_github(self):
         """打开GitHub仓库页面"""
@@ -856,9 +906,13 @@ def main():
     
     # 设置应用程序名称
     app.setApplicationName("音乐一直放！")
-    window = AudioMonitorApp()
-    window.show()
-    sys.exit(app.exec())
+    # 程序只在 AppController.quit() 中退出，托盘模式下关闭最后一个窗口不退出
+    app.setQuitOnLastWindowClosed(False)
+    controller = AppController()
+    controller.show_window()
+    exit_code = app.exec()
+    shutdown_logging()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file